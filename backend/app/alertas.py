@@ -0,0 +1,276 @@
+"""
+Motor de estado dos alertas de eventos.
+
+Um evento fica 'pendente' até entrar na janela de 7 dias, quando passa a
+'disparado'. O estado é calculado em dois momentos:
+
+- na escrita (criação/edição do evento), via `calcular_status_alerta`;
+- na passagem do tempo, por um único UPDATE em lote
+  (`disparar_alertas_pendentes`), executado pelo job de alertas.
+
+As leituras não escrevem nada: usam `filtro_alerta_disparado`, que já
+considera como disparados os pendentes que entraram na janela desde a
+última execução do job.
+
+Os totais usados nos headers de /api/alertas/ativos ficam num cache em
+memória (`contar_alertas` / `contar_alertas_async`), invalidado sempre que um commit altera
+`alerta_status`/`data_evento` de algum evento.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+from typing import Optional
+
+from sqlalchemy import and_, bindparam, case, event, func, inspect, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import models, versoes
+
+JANELA_ALERTA = timedelta(days=7)
+STATUS_ATIVOS = (models.AlertaStatusEnum.pendente, models.AlertaStatusEnum.disparado)
+
+
+def limite_janela(agora: Optional[datetime] = None) -> datetime:
+    """Data limite da janela de alerta (agora + 7 dias, em UTC)."""
+    agora = agora or datetime.now(timezone.utc)
+    return agora + JANELA_ALERTA
+
+
+def _como_utc(valor: datetime) -> datetime:
+    # SQLite devolve datas sem timezone; tratamos como UTC (igual ao banco)
+    if valor.tzinfo is None:
+        return valor.replace(tzinfo=timezone.utc)
+    return valor.astimezone(timezone.utc)
+
+
+def calcular_status_alerta(
+    data_evento: datetime, agora: Optional[datetime] = None
+) -> models.AlertaStatusEnum:
+    """Status de alerta de um evento no momento em que ele é gravado."""
+    if _como_utc(data_evento) <= limite_janela(agora):
+        return models.AlertaStatusEnum.disparado
+    return models.AlertaStatusEnum.pendente
+
+
+def filtro_status_ativos():
+    """
+    `alerta_status IN ('pendente', 'disparado')` com os valores escritos
+    literalmente no SQL: só assim o SQLite consegue usar o índice parcial
+    ix_eventos_ativos_data_evento (com parâmetros "?" ele não usa).
+    """
+    return models.Evento.alerta_status.in_(
+        bindparam("status_ativos", list(STATUS_ATIVOS), expanding=True, literal_execute=True)
+    )
+
+
+def filtro_alerta_disparado(limite: datetime):
+    """
+    Condição SQL para "alerta disparado", incluindo pendentes que já
+    entraram na janela mas ainda não foram atualizados pelo job.
+    """
+    return and_(
+        # Termo redundante, mas casa com o índice parcial
+        # ix_eventos_ativos_data_evento (ordenação por data sem varrer o histórico)
+        filtro_status_ativos(),
+        or_(
+            models.Evento.alerta_status == models.AlertaStatusEnum.disparado,
+            and_(
+                models.Evento.alerta_status == models.AlertaStatusEnum.pendente,
+                models.Evento.data_evento <= limite,
+            ),
+        ),
+    )
+
+
+def status_efetivo(evento: models.Evento, limite: datetime) -> models.AlertaStatusEnum:
+    """Status que o evento tem "agora", sem precisar gravar a transição."""
+    if (
+        evento.alerta_status == models.AlertaStatusEnum.pendente
+        and _como_utc(evento.data_evento) <= limite
+    ):
+        return models.AlertaStatusEnum.disparado
+    return evento.alerta_status
+
+
+def aplicar_status_efetivo(eventos: list[models.Evento], limite: datetime) -> list[models.Evento]:
+    """
+    Ajusta o status dos eventos lidos para o status efetivo, só para a
+    resposta: `set_committed_value` não marca o objeto como alterado, então
+    nada é gravado no banco.
+    """
+    for evento in eventos:
+        set_committed_value(evento, "alerta_status", status_efetivo(evento, limite))
+    return eventos
+
+
+def disparar_alertas_pendentes(db: Session) -> list[int]:
+    """
+    Transição por tempo: marca como 'disparado' todos os pendentes dentro
+    da janela com um único UPDATE e devolve os ids afetados.
+    """
+    condicao = and_(
+        models.Evento.data_evento <= limite_janela(),
+        models.Evento.alerta_status == models.AlertaStatusEnum.pendente,
+    )
+    comando = (
+        update(models.Evento)
+        .where(condicao)
+        .values(alerta_status=models.AlertaStatusEnum.disparado)
+        .execution_options(synchronize_session=False)
+    )
+
+    if db.get_bind().dialect.update_returning:
+        ids = list(db.execute(comando.returning(models.Evento.id)).scalars())
+    else:
+        ids = list(db.execute(select(models.Evento.id).where(condicao)).scalars())
+        if ids:
+            db.execute(comando.where(models.Evento.id.in_(ids)))
+
+    if ids:
+        versoes.tocar(
+            db, processos=select(models.Evento.processo_id).where(models.Evento.id.in_(ids))
+        )
+        marcar_contadores_alterados(db)
+    db.commit()
+    return ids
+
+
+# --- Contadores de alertas (X-Total-Count / X-Week-Count) ---
+
+# O TTL cobre o que a invalidação não enxerga: a janela andando com o
+# relógio e escritas feitas por outros processos (workers/serverless).
+CONTADORES_TTL_SEGUNDOS = float(os.getenv("ALERTAS_CONTADORES_TTL", "30"))
+_CHAVE_SESSAO = "contadores_alerta_alterados"
+
+_contadores_lock = threading.Lock()
+# "geracao" sobe a cada invalidação: uma contagem feita antes de uma
+# invalidação não pode ser guardada depois dela (corrida entre requests)
+_contadores_cache: dict = {"valor": None, "expira_em": 0.0, "geracao": 0}
+
+
+def invalidar_contadores():
+    with _contadores_lock:
+        _contadores_cache["valor"] = None
+        _contadores_cache["expira_em"] = 0.0
+        _contadores_cache["geracao"] += 1
+
+
+def _geracao_contadores() -> int:
+    return _contadores_cache["geracao"]
+
+
+def _contadores_em_cache(agora: float) -> Optional[tuple[int, int]]:
+    with _contadores_lock:
+        if _contadores_cache["valor"] is not None and agora < _contadores_cache["expira_em"]:
+            return _contadores_cache["valor"]
+    return None
+
+
+def _guardar_contadores(agora: float, valor: tuple[int, int], geracao: int):
+    with _contadores_lock:
+        if geracao != _contadores_cache["geracao"]:
+            return  # invalidado enquanto a contagem rodava: o valor pode estar velho
+        _contadores_cache["valor"] = valor
+        _contadores_cache["expira_em"] = agora + CONTADORES_TTL_SEGUNDOS
+
+
+def _consulta_contadores(limite: datetime):
+    # Os dois números numa só query (agregação condicional)
+    return select(
+        func.count(models.Evento.id),
+        func.coalesce(
+            func.sum(case((models.Evento.data_evento <= limite, 1), else_=0)), 0
+        ),
+    ).where(filtro_alerta_disparado(limite))
+
+
+def contar_alertas(db: Session) -> tuple[int, int]:
+    """
+    Retorna (total de alertas disparados, disparados até o fim da janela).
+    Usa o cache quando válido; senão calcula os dois números numa só query.
+    """
+    agora = time.monotonic()
+    valor = _contadores_em_cache(agora)
+    if valor is not None:
+        return valor
+
+    geracao = _geracao_contadores()
+    total, semana = db.execute(_consulta_contadores(limite_janela())).one()
+    valor = (int(total), int(semana))
+    _guardar_contadores(agora, valor, geracao)
+    return valor
+
+
+async def contar_alertas_async(db: AsyncSession) -> tuple[int, int]:
+    """Mesmo que `contar_alertas`, para os endpoints com sessão assíncrona."""
+    agora = time.monotonic()
+    valor = _contadores_em_cache(agora)
+    if valor is not None:
+        return valor
+
+    geracao = _geracao_contadores()
+    total, semana = (await db.execute(_consulta_contadores(limite_janela()))).one()
+    valor = (int(total), int(semana))
+    _guardar_contadores(agora, valor, geracao)
+    return valor
+
+
+def _altera_contadores(obj, removido: bool) -> bool:
+    if isinstance(obj, models.Evento):
+        if removido:
+            return True
+        estado = inspect(obj)
+        if estado.pending:
+            return True
+        return (
+            estado.attrs.alerta_status.history.has_changes()
+            or estado.attrs.data_evento.history.has_changes()
+        )
+    # Apagar preso/processo remove os eventos em cascata
+    return removido and isinstance(obj, (models.Preso, models.Processo))
+
+
+@event.listens_for(Session, "before_flush")
+def _marcar_alteracoes_de_eventos(session, flush_context, instances):
+    if session.info.get(_CHAVE_SESSAO):
+        return
+    removidos = set(session.deleted)
+    for obj in chain(session.new, session.dirty, removidos):
+        if _altera_contadores(obj, obj in removidos):
+            session.info[_CHAVE_SESSAO] = True
+            return
+
+
+def marcar_contadores_alterados(db: Session):
+    """
+    Para UPDATE/DELETE em lote via `db.execute(update(...))`, que não passam
+    pelo flush: invalida os contadores quando a transação for confirmada.
+    (Não usamos o evento do_orm_execute porque qualquer listener nele quebra
+    o selectinload + yield_per do relatório em streaming.)
+    """
+    db.info[_CHAVE_SESSAO] = True
+
+
+def _marcar_alteracoes_em_lote(contexto):
+    # db.query(models.Evento)...update()/delete()
+    if contexto.mapper.class_ is models.Evento:
+        marcar_contadores_alterados(contexto.session)
+
+
+event.listen(Session, "after_bulk_update", _marcar_alteracoes_em_lote)
+event.listen(Session, "after_bulk_delete", _marcar_alteracoes_em_lote)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_apos_commit(session):
+    if session.info.pop(_CHAVE_SESSAO, False):
+        invalidar_contadores()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_marcacao(session):
+    session.info.pop(_CHAVE_SESSAO, None)
@@ -0,0 +1,141 @@
+"""
+Motor de busca por nome de presos.
+
+O filtro antigo (`lower(nome_completo) ILIKE '%nome%'`) não pode usar índice
+nenhum, então cada busca do dashboard varria a tabela inteira. Aqui a busca
+passa a usar a coluna normalizada `presos.nome_busca` (minúsculas, sem
+acentos) e um índice específico de cada banco:
+
+- PostgreSQL: índice GIN com `pg_trgm` sobre `nome_busca`, que atende
+  `LIKE '%termo%'` e permite ordenar por similaridade.
+- SQLite: tabela FTS5 "sombra" (`presos_fts`, tokenizer trigram) mantida
+  em sincronia por triggers, ordenada por `bm25`.
+
+O índice do PostgreSQL e a coluna em bancos existentes vêm da migração
+migrations/versions/0006_busca_nome.py; bancos novos recebem tudo pelo
+`create_all` (ver os eventos de `presos` em app/models.py). O startup só
+verifica se o índice existe. Se não existir (migração pendente, extensão
+indisponível, SQLite sem FTS5), a busca continua funcionando com `LIKE`
+simples sobre `nome_busca`.
+"""
+import logging
+
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import column, table
+
+from . import models
+from .models import normalizar_nome_busca
+
+logger = logging.getLogger(__name__)
+
+# Trigramas só existem para termos com 3+ caracteres
+TAMANHO_MINIMO_TERMO_INDEXADO = 3
+INDICE_TRIGRAM = "ix_presos_nome_busca_trgm"
+
+_presos_fts = table("presos_fts", column("rowid"), column("nome_busca"))
+
+# Triggers que mantêm presos_fts em sincronia com presos
+_TRIGGERS_FTS = (
+    "CREATE TRIGGER IF NOT EXISTS presos_fts_ai AFTER INSERT ON presos BEGIN "
+    "INSERT INTO presos_fts(rowid, nome_busca) VALUES (new.id, new.nome_busca); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS presos_fts_ad AFTER DELETE ON presos BEGIN "
+    "INSERT INTO presos_fts(presos_fts, rowid, nome_busca) "
+    "VALUES ('delete', old.id, old.nome_busca); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS presos_fts_au AFTER UPDATE OF nome_busca ON presos BEGIN "
+    "INSERT INTO presos_fts(presos_fts, rowid, nome_busca) "
+    "VALUES ('delete', old.id, old.nome_busca); "
+    "INSERT INTO presos_fts(rowid, nome_busca) VALUES (new.id, new.nome_busca); "
+    "END",
+)
+
+# Preenchido por configurar_busca(): indica se o índice do banco está disponível
+_indice_disponivel = {"postgresql": False, "sqlite": False}
+
+
+def configurar_busca(engine):
+    """
+    Verifica (sem alterar o banco) se o índice de busca do dialeto em uso
+    existe. Roda no startup; barato o bastante para cada worker.
+    """
+    dialeto = engine.dialect.name
+    if dialeto == "postgresql":
+        consulta = text(
+            "SELECT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :nome"
+        ).bindparams(nome=INDICE_TRIGRAM)
+    elif dialeto == "sqlite":
+        consulta = text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'presos_fts'")
+    else:
+        return
+
+    with engine.connect() as conn:
+        # Um CREATE INDEX CONCURRENTLY interrompido deixa o índice inválido
+        _indice_disponivel[dialeto] = bool(conn.execute(consulta).scalar())
+    if not _indice_disponivel[dialeto]:
+        logger.warning(
+            "Índice de busca por nome ausente (rode `alembic upgrade head`); busca por nome sem índice."
+        )
+
+
+def criar_presos_fts(conn):
+    """
+    Cria no SQLite a tabela FTS5 `presos_fts` e seus triggers (idempotente).
+    Retorna False, sem alterar nada, se o SQLite não tiver FTS5/trigram.
+    """
+    ja_existia = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'presos_fts'")
+    ).first()
+    try:
+        # Um comando que falha no SQLite não desfaz a transação em curso
+        conn.execute(
+            text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS presos_fts USING fts5("
+                "nome_busca, content='presos', content_rowid='id', tokenize='trigram')"
+            )
+        )
+    except OperationalError:
+        logger.warning("FTS5 indisponível no SQLite; busca por nome sem índice.", exc_info=True)
+        return False
+    for trigger in _TRIGGERS_FTS:
+        conn.execute(text(trigger))
+    if not ja_existia:
+        # Tabela recém-criada: indexa os presos que já estavam no banco
+        conn.execute(text("INSERT INTO presos_fts(presos_fts) VALUES ('rebuild')"))
+    return True
+
+
+def aplicar_filtro_nome(query, db, nome: str):
+    """
+    Filtra a query de presos pelo nome (sem diferenciar acentos/maiúsculas)
+    e ordena pela relevância. Retorna a query sem alterações se o termo
+    ficar vazio após a normalização.
+    """
+    termo = normalizar_nome_busca(nome)
+    if not termo:
+        return query
+
+    dialeto = db.get_bind().dialect.name
+    indexavel = len(termo) >= TAMANHO_MINIMO_TERMO_INDEXADO
+
+    if dialeto == "sqlite" and indexavel and _indice_disponivel["sqlite"]:
+        # Frase entre aspas: o trigram do FTS5 faz casamento por substring
+        frase = '"' + termo.replace('"', '""') + '"'
+        correspondencias = (
+            select(
+                _presos_fts.c.rowid.label("preso_id"),
+                func.bm25(literal_column("presos_fts")).label("rank"),
+            )
+            .where(literal_column("presos_fts").op("MATCH")(frase))
+            .subquery()
+        )
+        return query.join(
+            correspondencias, correspondencias.c.preso_id == models.Preso.id
+        ).order_by(correspondencias.c.rank.asc())
+
+    query = query.filter(models.Preso.nome_busca.contains(termo, autoescape=True))
+    if dialeto == "postgresql" and _indice_disponivel["postgresql"]:
+        query = query.order_by(func.word_similarity(termo, models.Preso.nome_busca).desc())
+    return query
@@ -0,0 +1,147 @@
+"""
+Cache do usuário autenticado (principal) usado por `get_current_user`.
+
+Sem o cache, toda rota protegida fazia um SELECT em `users` só para
+conferir `is_active` e `role`. Aqui guardamos um retrato enxuto do usuário
+(`UsuarioAutenticado`, sem o hash da senha), indexado pelo CPF do token,
+com TTL e limite de tamanho (LRU).
+
+A invalidação é automática: qualquer commit que altere ou apague um
+`models.User` (perfil, senha, edição por admin, desativação) remove o CPF
+do cache. O TTL cobre alterações feitas por outros processos/instâncias.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import models
+
+USUARIOS_CACHE_TTL_SEGUNDOS = float(os.getenv("USUARIOS_CACHE_TTL", "60"))
+USUARIOS_CACHE_MAX = int(os.getenv("USUARIOS_CACHE_MAX", "1000"))
+_CHAVE_SESSAO = "cpfs_usuarios_alterados"
+
+
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    """Retrato do usuário logado; serializável com schemas.User."""
+
+    id: int
+    cpf: str
+    nome_completo: str
+    email: Optional[str]
+    role: Optional[str]
+    is_active: bool
+    preferencia_tema: Optional[str]
+
+    @classmethod
+    def de_usuario(cls, user: models.User) -> "UsuarioAutenticado":
+        return cls(
+            id=user.id,
+            cpf=user.cpf,
+            nome_completo=user.nome_completo,
+            email=user.email,
+            role=user.role,
+            is_active=bool(user.is_active),
+            preferencia_tema=user.preferencia_tema,
+        )
+
+
+_lock = threading.Lock()
+_cache: "OrderedDict[str, tuple[UsuarioAutenticado, float]]" = OrderedDict()
+# Incrementada a cada invalidação: um retrato lido do banco antes de uma
+# invalidação não pode ser guardado depois dela (corrida entre requests)
+_geracao = 0
+
+
+def geracao_atual() -> int:
+    return _geracao
+
+
+def obter(cpf: str) -> Optional[UsuarioAutenticado]:
+    agora = time.monotonic()
+    with _lock:
+        item = _cache.get(cpf)
+        if item is None:
+            return None
+        usuario, expira_em = item
+        if agora >= expira_em:
+            del _cache[cpf]
+            return None
+        _cache.move_to_end(cpf)
+        return usuario
+
+
+def guardar(usuario: UsuarioAutenticado, geracao: int):
+    with _lock:
+        if geracao != _geracao:
+            return
+        _cache[usuario.cpf] = (usuario, time.monotonic() + USUARIOS_CACHE_TTL_SEGUNDOS)
+        _cache.move_to_end(usuario.cpf)
+        while len(_cache) > USUARIOS_CACHE_MAX:
+            _cache.popitem(last=False)
+
+
+def invalidar(*cpfs: str):
+    global _geracao
+    with _lock:
+        _geracao += 1
+        for cpf in cpfs:
+            _cache.pop(cpf, None)
+
+
+def limpar():
+    global _geracao
+    with _lock:
+        _geracao += 1
+        _cache.clear()
+
+
+# --- Invalidação automática no commit ---
+
+
+def _cpfs_afetados(user: models.User) -> set:
+    # Inclui o CPF antigo caso o próprio CPF tenha sido alterado
+    historico = inspect(user).attrs.cpf.history
+    return {cpf for cpf in (*historico.deleted, user.cpf) if cpf}
+
+
+@event.listens_for(Session, "before_flush")
+def _marcar_usuarios_alterados(session, flush_context, instances):
+    cpfs = set()
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, models.User):
+            cpfs |= _cpfs_afetados(obj)
+    if cpfs:
+        session.info.setdefault(_CHAVE_SESSAO, set()).update(cpfs)
+
+
+def _marcar_alteracoes_em_lote(contexto):
+    # db.query(models.User)...update()/delete(): não sabemos quais CPFs mudaram
+    if contexto.mapper.class_ is models.User:
+        contexto.session.info.setdefault(_CHAVE_SESSAO, set()).add(None)
+
+
+event.listen(Session, "after_bulk_update", _marcar_alteracoes_em_lote)
+event.listen(Session, "after_bulk_delete", _marcar_alteracoes_em_lote)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_apos_commit(session):
+    cpfs = session.info.pop(_CHAVE_SESSAO, None)
+    if not cpfs:
+        return
+    if None in cpfs:
+        limpar()
+    else:
+        invalidar(*cpfs)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_marcacao(session):
+    session.info.pop(_CHAVE_SESSAO, None)
@@ -0,0 +1,224 @@
+"""
+Compressão das respostas (brotli ou gzip), negociada pelo Accept-Encoding.
+
+Os relatórios e a busca devolvem JSON muito repetitivo (os mesmos nomes de
+campo para cada processo e evento), que comprime 10x ou mais. O middleware:
+
+- escolhe `br` (se o pacote Brotli estiver instalado) ou `gzip`, respeitando
+  os pesos `q` do cliente;
+- só comprime tipos de texto (JSON, NDJSON, CSV...) e respostas com pelo
+  menos COMPRESSAO_MINIMO_BYTES; abaixo disso o ganho não paga o custo;
+- funciona com StreamingResponse: guarda o começo do corpo só até passar do
+  mínimo e daí em diante comprime pedaço a pedaço, sem montar a resposta
+  inteira em memória.
+
+Respostas que já têm Content-Encoding, 204/304 e HEAD passam intactas.
+"""
+import os
+import zlib
+from typing import Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele, só gzip
+    brotli = None
+
+COMPRESSAO_HABILITADA = os.getenv("COMPRESSAO_HABILITADA", "true").lower() in {"1", "true", "yes", "on"}
+COMPRESSAO_MINIMO_BYTES = int(os.getenv("COMPRESSAO_MINIMO_BYTES", "1024"))
+# Níveis pensados para resposta dinâmica: bem mais rápidos que o máximo,
+# com quase a mesma taxa de compressão em JSON
+COMPRESSAO_NIVEL_GZIP = int(os.getenv("COMPRESSAO_NIVEL_GZIP", "5"))
+COMPRESSAO_NIVEL_BROTLI = int(os.getenv("COMPRESSAO_NIVEL_BROTLI", "4"))
+
+# Pedaços maiores que isso são comprimidos numa thread, sem travar o event loop
+TAMANHO_PARA_THREAD = 256 * 1024
+# Em streaming, força a saída do que já foi comprimido a cada tanto de
+# entrada; sem isso o brotli segura tudo até o fim e o cliente só recebe
+# o primeiro byte quando o relatório acabou
+DESCARREGAR_A_CADA_BYTES = 64 * 1024
+
+TIPOS_COMPRIMIVEIS = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def _comprimivel(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    tipo = content_type.split(";", 1)[0].strip().lower()
+    if tipo == "text/event-stream":
+        return False
+    return tipo.startswith("text/") or tipo.endswith("+json") or tipo in TIPOS_COMPRIMIVEIS
+
+
+def escolher_codificacao(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br', 'gzip' ou None, pelo Accept-Encoding (com pesos q)."""
+    if not accept_encoding:
+        return None
+    pesos = {}
+    for item in accept_encoding.split(","):
+        nome, _, parametros = item.strip().partition(";")
+        peso = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                peso = float(parametros[2:])
+            except ValueError:
+                peso = 0.0
+        pesos[nome.strip().lower()] = peso
+
+    disponiveis = ["br", "gzip"] if brotli is not None else ["gzip"]
+    candidatas = [
+        (pesos.get(codificacao, pesos.get("*", 0.0)), -ordem, codificacao)
+        for ordem, codificacao in enumerate(disponiveis)
+    ]
+    peso, _, codificacao = max(candidatas)
+    return codificacao if peso > 0 else None
+
+
+class _Gzip:
+    def __init__(self, nivel: int):
+        self._zlib = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def comprimir(self, dados: bytes, fim: bool, descarregar: bool = False) -> bytes:
+        saida = self._zlib.compress(dados)
+        if fim:
+            saida += self._zlib.flush()
+        elif descarregar:
+            saida += self._zlib.flush(zlib.Z_SYNC_FLUSH)
+        return saida
+
+
+class _Brotli:
+    def __init__(self, nivel: int):
+        self._brotli = brotli.Compressor(quality=nivel)
+
+    def comprimir(self, dados: bytes, fim: bool, descarregar: bool = False) -> bytes:
+        saida = self._brotli.process(dados)
+        if fim:
+            saida += self._brotli.finish()
+        elif descarregar:
+            saida += self._brotli.flush()
+        return saida
+
+
+class CompressaoMiddleware:
+    """Middleware ASGI puro (o BaseHTTPMiddleware montaria o corpo inteiro)."""
+
+    def __init__(
+        self,
+        app,
+        minimo: int = COMPRESSAO_MINIMO_BYTES,
+        nivel_gzip: int = COMPRESSAO_NIVEL_GZIP,
+        nivel_brotli: int = COMPRESSAO_NIVEL_BROTLI,
+    ):
+        self.app = app
+        self.minimo = minimo
+        self.nivel_gzip = nivel_gzip
+        self.nivel_brotli = nivel_brotli
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        codificacao = escolher_codificacao(Headers(scope=scope).get("accept-encoding"))
+        if codificacao is None:
+            await self.app(scope, receive, send)
+            return
+        resposta = _RespostaComprimida(self, codificacao, send)
+        await self.app(scope, receive, resposta.enviar)
+
+    def compressor(self, codificacao: str):
+        if codificacao == "br":
+            return _Brotli(self.nivel_brotli)
+        return _Gzip(self.nivel_gzip)
+
+
+class _RespostaComprimida:
+    """Intercepta as mensagens de uma resposta e comprime o corpo se valer a pena."""
+
+    def __init__(self, middleware: CompressaoMiddleware, codificacao: str, send):
+        self.middleware = middleware
+        self.codificacao = codificacao
+        self.send = send
+        self.inicio = None
+        self.pendente: list[bytes] = []
+        self.tamanho_pendente = 0
+        self.compressor = None
+        self.desde_descarga = 0
+        self.passar_direto = False
+
+    async def enviar(self, mensagem):
+        tipo = mensagem["type"]
+        if tipo == "http.response.start":
+            cabecalhos = Headers(raw=mensagem["headers"])
+            if (
+                mensagem["status"] in (204, 304)
+                or "content-encoding" in cabecalhos
+                or not _comprimivel(cabecalhos.get("content-type"))
+            ):
+                self.passar_direto = True
+                await self.send(mensagem)
+            else:
+                self.inicio = mensagem
+            return
+
+        if self.passar_direto or tipo != "http.response.body":
+            await self.send(mensagem)
+            return
+
+        corpo = mensagem.get("body", b"")
+        mais = mensagem.get("more_body", False)
+
+        if self.compressor is not None:
+            dados = await self._comprimir(corpo, fim=not mais)
+            if dados or not mais:
+                await self.send({"type": "http.response.body", "body": dados, "more_body": mais})
+            return
+
+        # Ainda decidindo: acumula até saber se a resposta passa do mínimo
+        self.pendente.append(corpo)
+        self.tamanho_pendente += len(corpo)
+        if self.tamanho_pendente < self.middleware.minimo:
+            if not mais:
+                # Pequena demais: sai como veio (o Content-Length original vale)
+                await self.send(self.inicio)
+                await self.send({"type": "http.response.body", "body": b"".join(self.pendente)})
+            return
+
+        self.compressor = self.middleware.compressor(self.codificacao)
+        dados = await self._comprimir(b"".join(self.pendente), fim=not mais)
+        self.pendente = []
+        self._ajustar_cabecalhos(None if mais else len(dados))
+        await self.send(self.inicio)
+        if dados or not mais:
+            await self.send({"type": "http.response.body", "body": dados, "more_body": mais})
+
+    async def _comprimir(self, dados: bytes, fim: bool) -> bytes:
+        self.desde_descarga += len(dados)
+        descarregar = self.desde_descarga >= DESCARREGAR_A_CADA_BYTES
+        if descarregar:
+            self.desde_descarga = 0
+        if len(dados) >= TAMANHO_PARA_THREAD:
+            return await anyio.to_thread.run_sync(self.compressor.comprimir, dados, fim, descarregar)
+        return self.compressor.comprimir(dados, fim, descarregar)
+
+    def _ajustar_cabecalhos(self, tamanho: Optional[int]):
+        cabecalhos = MutableHeaders(scope=self.inicio)
+        cabecalhos["Content-Encoding"] = self.codificacao
+        cabecalhos.add_vary_header("Accept-Encoding")
+        if tamanho is None:
+            del cabecalhos["Content-Length"]
+        else:
+            cabecalhos["Content-Length"] = str(tamanho)
+        # O corpo comprimido não é byte a byte o que o ETag forte descrevia
+        etag = cabecalhos.get("etag")
+        if etag and not etag.startswith("W/"):
+            cabecalhos["ETag"] = "W/" + etag
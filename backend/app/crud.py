@@ -1,9 +1,9 @@
 from fastapi import HTTPException
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func  # para usar func.lower
-from datetime import date
+from sqlalchemy import and_, case, func, insert, select, update
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
+from datetime import date, datetime, timezone
 from typing import Optional
-from . import models, schemas
+from . import alertas, busca, models, paginacao, schemas, versoes
 from .security import get_password_hash, verify_password
 
 # --- CRUD de Preso ---
@@ -49,6 +49,87 @@ def get_preso_by_cpf(db: Session, cpf: str):
     return db.query(models.Preso).filter(models.Preso.cpf == cpf).first()
 
 
+def _filtrar_presos(
+    query,
+    db: Session,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+):
+    """Aplica os filtros de busca de presos (compartilhado por busca e relatório)."""
+    # 1. Filtro por Nome (se fornecido) - usa o índice de busca do banco
+    if nome:
+        query = busca.aplicar_filtro_nome(query, db, nome)
+
+    # 2. Filtros de Status e Data da Prisão (se fornecidos)
+    # Usam EXISTS em vez de JOIN + DISTINCT: não duplicam linhas e
+    # permitem ordenar pela relevância do nome.
+    filtros_processo = []
+    if status_processual:
+        filtros_processo.append(models.Processo.status_processual == status_processual)
+    if data_prisao:
+        filtros_processo.append(models.Processo.data_prisao == data_prisao)
+    if filtros_processo:
+        query = query.filter(models.Preso.processos.any(and_(*filtros_processo)))
+
+    return query
+
+
+def consulta_pagina_presos(
+    db,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    apos: Optional[tuple] = None,
+):
+    """
+    Página de presos da busca, com processos e eventos via selectinload.
+
+    Os filtros de processo são EXISTS (ver `_filtrar_presos`), então a
+    consulta principal devolve uma linha por preso e o OFFSET/LIMIT conta
+    presos, não linhas de join. Processos e eventos vêm depois em uma
+    consulta por nível (`WHERE preso_id IN (ids da página)`), sem o produto
+    presos x processos x eventos de um joinedload.
+    """
+    query = select(models.Preso).options(
+        selectinload(models.Preso.processos).selectinload(models.Processo.eventos)
+    )
+    query = _filtrar_presos(query, db, nome, status_processual, data_prisao)
+    return _paginar_presos(query, skip, limit, apos)
+
+
+def consulta_colunas_pagina_presos(
+    db,
+    colunas,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    apos: Optional[tuple] = None,
+):
+    """
+    Mesma página de `consulta_pagina_presos`, mas só com as `colunas` do
+    preso (sem objetos ORM): (id, versao) para o ETag, colunas do schema
+    para app/leitura.py.
+    """
+    query = select(*colunas)
+    query = _filtrar_presos(query, db, nome, status_processual, data_prisao)
+    return _paginar_presos(query, skip, limit, apos)
+
+
+def _paginar_presos(query, skip: int, limit: int, apos: Optional[tuple]):
+    """
+    Ordem (nome_completo, id). Sem cursor, a relevância da busca por nome
+    (se houver) vem antes; com cursor (`apos`), vale só a ordem do keyset.
+    """
+    if apos is not None:
+        query = query.order_by(None)
+    return paginacao.aplicar_cursor(query, "presos", apos).offset(skip).limit(limit)
+
+
 def search_presos(
     db: Session,
     nome: Optional[str] = None,
@@ -56,39 +137,103 @@ def search_presos(
     data_prisao: Optional[date] = None,
     skip: int = 0,
     limit: int = 100,
+    apos: Optional[tuple] = None,
 ):
     """
     Busca presos por múltiplos critérios.
-    Todos os filtros são opcionais.
+    Todos os filtros são opcionais. Com `nome`, os resultados vêm
+    ordenados pela relevância da busca (ver app/busca.py).
     """
-    # Query base com OUTER JOIN para também incluir presos sem processo, com sub-joinedload para eventos
-    query = (
-        db.query(models.Preso)
-        .outerjoin(models.Processo)
-        .options(joinedload(models.Preso.processos).joinedload(models.Processo.eventos))
-    )
+    query = consulta_pagina_presos(db, nome, status_processual, data_prisao, skip, limit, apos)
+    return db.execute(query).scalars().all()
 
-    # 1. Filtro por Nome (se fornecido)
-    if nome:
-        query_nome = f"%{nome.lower()}%"
-        query = query.filter(func.lower(models.Preso.nome_completo).ilike(query_nome))
 
-    # 2. Filtro por Status (se fornecido)
-    if status_processual:
-        query = query.filter(models.Processo.status_processual == status_processual)
+def consultas_resumo_presos(
+    db,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    apos: Optional[tuple] = None,
+):
+    """
+    Consultas da listagem resumida: (página, total).
 
-    # 3. Filtro por Data da Prisão (se fornecida)
-    if data_prisao:
-        query = query.filter(models.Processo.data_prisao == data_prisao)
+    A página traz só as colunas da tabela do dashboard: o preso, o primeiro
+    processo (menor id, o mesmo que a tela mostrava) e os agregados por
+    preso calculados no banco (quantidade de processos e próximo evento
+    ativo). As subconsultas correlacionadas só rodam para as linhas da
+    página, então o custo não cresce com o histórico de eventos.
+    """
+    # Alias nas subconsultas: a consulta externa também junta `processos`
+    processo = aliased(models.Processo)
+    primeiro_processo_id = (
+        select(func.min(processo.id))
+        .where(processo.preso_id == models.Preso.id)
+        .correlate(models.Preso)
+        .scalar_subquery()
+    )
+    total_processos = (
+        select(func.count(processo.id))
+        .where(processo.preso_id == models.Preso.id)
+        .correlate(models.Preso)
+        .scalar_subquery()
+    )
+    proximo_evento = (
+        select(func.min(models.Evento.data_evento))
+        .join(processo, processo.id == models.Evento.processo_id)
+        .where(
+            processo.preso_id == models.Preso.id,
+            models.Evento.data_evento >= datetime.now(timezone.utc),
+            alertas.filtro_status_ativos(),
+        )
+        .correlate(models.Preso)
+        .scalar_subquery()
+    )
 
-    # Aplica distinct para evitar duplicidade por JOIN, ordenação e paginação
-    return (
-        query.distinct()
-        .order_by(models.Preso.nome_completo.asc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    filtrados = _filtrar_presos(select(models.Preso.id), db, nome, status_processual, data_prisao)
+    consulta_total = select(func.count()).select_from(filtrados.order_by(None).subquery())
+
+    pagina = (
+        select(
+            models.Preso.id,
+            models.Preso.nome_completo,
+            models.Preso.cpf,
+            total_processos.label("total_processos"),
+            proximo_evento.label("proximo_evento"),
+            models.Processo.id.label("processo_id"),
+            models.Processo.numero_processo,
+            models.Processo.status_processual,
+            models.Processo.tipo_prisao,
+            models.Processo.data_prisao,
+            models.Processo.local_segregacao,
+        )
+        .outerjoin(models.Processo, models.Processo.id == primeiro_processo_id)
     )
+    pagina = _filtrar_presos(pagina, db, nome, status_processual, data_prisao)
+    return _paginar_presos(pagina, skip, limit, apos), consulta_total
+
+
+def montar_resumo_preso(linha) -> dict:
+    processo = None
+    if linha.processo_id is not None:
+        processo = {
+            "id": linha.processo_id,
+            "numero_processo": linha.numero_processo,
+            "status_processual": linha.status_processual,
+            "tipo_prisao": linha.tipo_prisao,
+            "data_prisao": linha.data_prisao,
+            "local_segregacao": linha.local_segregacao,
+        }
+    return {
+        "id": linha.id,
+        "nome_completo": linha.nome_completo,
+        "cpf": linha.cpf,
+        "processo_principal": processo,
+        "total_processos": linha.total_processos,
+        "proximo_evento": linha.proximo_evento,
+    }
 
 
 def create_preso(db: Session, preso: schemas.PresoCreate):
@@ -119,19 +264,36 @@ def create_processo(db: Session, processo: schemas.ProcessoCreate, preso_id: int
 
 
 def create_evento(db: Session, evento: schemas.EventoCreate, processo_id: int):
-    db_evento = models.Evento(**evento.model_dump(), processo_id=processo_id)
+    db_evento = models.Evento(
+        **evento.model_dump(),
+        processo_id=processo_id,
+        # O status do alerta já nasce calculado (janela de 7 dias)
+        alerta_status=alertas.calcular_status_alerta(evento.data_evento),
+    )
     db.add(db_evento)
     db.commit()
     db.refresh(db_evento)
     return db_evento
 
-def update_evento(db: Session, evento_id: int, evento_update: schemas.EventoCreate):
+def update_evento(
+    db: Session,
+    evento_id: int,
+    evento_update: schemas.EventoCreate,
+    versao_esperada: Optional[int] = None,
+):
     db_evento = db.query(models.Evento).filter(models.Evento.id == evento_id).first()
     if not db_evento:
         return None
+    versoes.exigir_versao(db, models.Evento, evento_id, versao_esperada)
     update_data = evento_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_evento, key, value)
+    # Mudou a data: recalcula o alerta (eventos concluídos não mudam)
+    if (
+        "data_evento" in update_data
+        and db_evento.alerta_status != models.AlertaStatusEnum.concluido
+    ):
+        db_evento.alerta_status = alertas.calcular_status_alerta(db_evento.data_evento)
     db.commit()
     db.refresh(db_evento)
     return db_evento
@@ -145,6 +307,135 @@ def delete_evento(db: Session, evento_id: int):
     return db_evento
 
 
+def _ids_existentes(db: Session, coluna, ids: set) -> set:
+    if not ids:
+        return set()
+    return set(db.execute(select(coluna).where(coluna.in_(ids))).scalars())
+
+
+def aplicar_lote_eventos(db: Session, lote: schemas.EventoLoteRequest):
+    """
+    Cria, edita e muda o status de vários eventos numa única transação.
+
+    Retorna (resultado, faltando): se algum processo/evento referenciado não
+    existir, nada é gravado e `faltando` lista os ids ausentes.
+
+    Tudo é feito com comandos em lote: um INSERT (executemany) para as
+    criações, um UPDATE por chave primária para as edições, um UPDATE por
+    status de destino e uma única reconciliação do alerta para os eventos
+    cuja data mudou. Os contadores de alerta são invalidados uma vez só,
+    no commit.
+    """
+    faltando = {
+        "processos": sorted(
+            {item.processo_id for item in lote.criar}
+            - _ids_existentes(db, models.Processo.id, {item.processo_id for item in lote.criar})
+        ),
+        "eventos": sorted(
+            ({item.id for item in lote.atualizar} | {item.id for item in lote.status})
+            - _ids_existentes(
+                db,
+                models.Evento.id,
+                {item.id for item in lote.atualizar} | {item.id for item in lote.status},
+            )
+        ),
+    }
+    if faltando["processos"] or faltando["eventos"]:
+        return None, faltando
+
+    # Mesmo "agora" para o lote inteiro
+    agora = datetime.now(timezone.utc)
+    ids_criados = []
+    if lote.criar:
+        # No PostgreSQL vira INSERT ... VALUES (...), (...) RETURNING em poucos
+        # lotes; o SQLite não tem sentinela para RETURNING ordenado e executa
+        # linha a linha (ainda na mesma transação)
+        ids_criados = list(
+            db.execute(
+                insert(models.Evento).returning(models.Evento.id, sort_by_parameter_order=True),
+                [
+                    {
+                        **item.model_dump(),
+                        "alerta_status": alertas.calcular_status_alerta(item.data_evento, agora),
+                    }
+                    for item in lote.criar
+                ],
+            ).scalars()
+        )
+
+    # Edições: uma linha por evento (repetições do mesmo id são mescladas)
+    edicoes: dict[int, dict] = {}
+    for item in lote.atualizar:
+        dados = {
+            chave: valor
+            for chave, valor in item.model_dump(exclude_unset=True, exclude={"id"}).items()
+            # data e tipo são obrigatórios no evento; só a descrição pode ser apagada
+            if valor is not None or chave == "descricao"
+        }
+        edicoes.setdefault(item.id, {}).update(dados)
+    linhas = [{"id": evento_id, **dados} for evento_id, dados in edicoes.items() if dados]
+    if linhas:
+        db.execute(update(models.Evento).execution_options(synchronize_session=False), linhas)
+
+    # Mudou a data: recalcula o alerta de todos esses eventos num só UPDATE
+    # (concluídos não mudam, igual à edição individual)
+    datas_alteradas = [evento_id for evento_id, dados in edicoes.items() if "data_evento" in dados]
+    if datas_alteradas:
+        db.execute(
+            update(models.Evento)
+            .where(
+                models.Evento.id.in_(datas_alteradas),
+                models.Evento.alerta_status != models.AlertaStatusEnum.concluido,
+            )
+            .values(
+                alerta_status=case(
+                    (
+                        models.Evento.data_evento <= alertas.limite_janela(agora),
+                        models.AlertaStatusEnum.disparado,
+                    ),
+                    else_=models.AlertaStatusEnum.pendente,
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    # Transições de status: um UPDATE por status de destino (a última vence)
+    destinos: dict[int, models.AlertaStatusEnum] = {}
+    for item in lote.status:
+        destinos[item.id] = item.status
+    for novo_status in set(destinos.values()):
+        ids = [evento_id for evento_id, destino in destinos.items() if destino == novo_status]
+        db.execute(
+            update(models.Evento)
+            .where(models.Evento.id.in_(ids))
+            .values(alerta_status=novo_status)
+            .execution_options(synchronize_session=False)
+        )
+
+    alterados = sorted(set(edicoes) | set(destinos))
+    versoes.tocar(
+        db,
+        processos=select(models.Evento.processo_id).where(
+            models.Evento.id.in_(ids_criados + alterados)
+        ),
+    )
+    alertas.marcar_contadores_alterados(db)
+    db.commit()
+
+    eventos = {
+        evento.id: evento
+        for evento in db.execute(
+            select(models.Evento)
+            .where(models.Evento.id.in_(ids_criados + alterados))
+            .execution_options(populate_existing=True)
+        ).scalars()
+    }
+    return {
+        "criados": [eventos[evento_id] for evento_id in ids_criados],
+        "atualizados": [eventos[evento_id] for evento_id in alterados],
+    }, None
+
+
 # ... (imports existentes) ...
 
 # (CRUD de Preso, Processo, Evento, User... continuam aqui)
@@ -197,11 +488,20 @@ def update_user_by_admin(db: Session, user_id: int, user_in: schemas.UserUpdate)
     return update_user_profile(db=db, db_user=db_user, user_in=user_in)
 
 
-def update_preso(db: Session, preso_id: int, preso_update: schemas.PresoCreate):
-    """Atualiza os dados de um preso."""
+def update_preso(
+    db: Session,
+    preso_id: int,
+    preso_update: schemas.PresoCreate,
+    versao_esperada: Optional[int] = None,
+):
+    """
+    Atualiza os dados de um preso. Com `versao_esperada` (If-Match), falha
+    com 412 se a ficha mudou desde que o cliente a leu.
+    """
     db_preso = db.query(models.Preso).filter(models.Preso.id == preso_id).first()
     if not db_preso:
         return None
+    versoes.exigir_versao(db, models.Preso, preso_id, versao_esperada)
 
     # Pega os dados do schema Pydantic e os converte para um dict
     update_data = preso_update.model_dump(exclude_unset=True)
@@ -216,7 +516,10 @@ def update_preso(db: Session, preso_id: int, preso_update: schemas.PresoCreate):
 
 
 def update_processo(
-    db: Session, processo_id: int, processo_update: schemas.ProcessoCreate
+    db: Session,
+    processo_id: int,
+    processo_update: schemas.ProcessoCreate,
+    versao_esperada: Optional[int] = None,
 ):
     """Atualiza os dados de um processo."""
     db_processo = (
@@ -224,6 +527,7 @@ def update_processo(
     )
     if not db_processo:
         return None
+    versoes.exigir_versao(db, models.Processo, processo_id, versao_esperada)
 
     update_data = processo_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
@@ -280,9 +584,10 @@ def update_user_password(db: Session, db_user: models.User, nova_senha: str):
     return db_user
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    """Lista todos os usuários."""
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, apos: Optional[tuple] = None):
+    """Lista todos os usuários (por id; `apos` é o cursor da página anterior)."""
+    query = paginacao.aplicar_cursor(db.query(models.User), "usuarios", apos)
+    return query.offset(skip).limit(limit).all()
 
 
 def get_user_notification_preference(db: Session, user_id: int):
@@ -0,0 +1,151 @@
+"""
+Versões assíncronas das consultas de leitura mais acessadas (busca,
+detalhe do preso e alertas), usadas com `get_async_db`.
+
+Com AsyncSession não existe lazy load: tudo que a resposta serializa
+precisa vir carregado na própria consulta (selectinload). As fichas
+completas de presos vêm sem ORM, pelas consultas de app/leitura.py.
+"""
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import alertas, leitura, models, paginacao
+from .crud import consulta_colunas_pagina_presos, consultas_resumo_presos
+from .security import get_password_hash_async
+
+
+async def get_user_by_cpf(db: AsyncSession, cpf: str):
+    resultado = await db.execute(select(models.User).where(models.User.cpf == cpf))
+    return resultado.scalars().first()
+
+
+async def update_user_password(db: AsyncSession, db_user: models.User, nova_senha: str):
+    """Atualiza o hash da senha sem bloquear o event loop com o bcrypt."""
+    db_user.hashed_password = await get_password_hash_async(nova_senha)
+    await db.commit()
+    return db_user
+
+
+async def versao_preso(db: AsyncSession, preso_id: int) -> Optional[int]:
+    """Só a versão do preso (para conferir o ETag), ou None se ele não existe."""
+    return await db.scalar(select(models.Preso.versao).where(models.Preso.id == preso_id))
+
+
+async def _completar(db: AsyncSession, presos: list[dict]) -> list[dict]:
+    """Processos e eventos das fichas (ver `leitura._completar`)."""
+    if not presos:
+        return presos
+    linhas_processos = []
+    for consulta in leitura.consultas_processos([preso["id"] for preso in presos]):
+        linhas_processos.extend((await db.execute(consulta)).all())
+    eventos_por_processo = leitura.anexar_processos(presos, linhas_processos)
+    for consulta in leitura.consultas_eventos(list(eventos_por_processo)):
+        leitura.anexar_eventos(eventos_por_processo, (await db.execute(consulta)).all())
+    return presos
+
+
+async def preso_detalhado(db: AsyncSession, preso_id: int) -> Optional[dict]:
+    """Ficha completa do preso como dict de PresoDetalhe (sem ORM)."""
+    resultado = await db.execute(
+        select(*leitura.COLUNAS_PRESO).where(models.Preso.id == preso_id)
+    )
+    presos = leitura.novos_presos(resultado.all())
+    return (await _completar(db, presos))[0] if presos else None
+
+
+async def presos_detalhados(
+    db: AsyncSession,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    apos: Optional[tuple] = None,
+) -> list[dict]:
+    """Mesmos filtros e ordenação de `crud.search_presos`, como dicts de PresoDetalhe."""
+    resultado = await db.execute(
+        leitura.consulta_presos(db, nome, status_processual, data_prisao, skip, limit, apos)
+    )
+    return await _completar(db, leitura.novos_presos(resultado.all()))
+
+
+async def versoes_pagina_presos(
+    db: AsyncSession,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    apos: Optional[tuple] = None,
+) -> list[tuple[int, int]]:
+    """(id, versao) dos presos da mesma página de `presos_detalhados`."""
+    resultado = await db.execute(
+        consulta_colunas_pagina_presos(
+            db,
+            (models.Preso.id, models.Preso.versao),
+            nome,
+            status_processual,
+            data_prisao,
+            skip,
+            limit,
+            apos,
+        )
+    )
+    return [tuple(linha) for linha in resultado.all()]
+
+
+async def resumo_presos(
+    db: AsyncSession,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    apos: Optional[tuple] = None,
+):
+    """
+    Listagem resumida paginada (ver `crud.consultas_resumo_presos`).
+    Retorna (total, linhas); `montar_resumo_preso` converte cada linha.
+    """
+    pagina, consulta_total = consultas_resumo_presos(
+        db, nome, status_processual, data_prisao, skip, limit, apos
+    )
+    total = (await db.execute(consulta_total)).scalar_one()
+    linhas = (await db.execute(pagina)).all() if total > skip else []
+    return total, linhas
+
+
+async def listar_proximos_alertas(db: AsyncSession, limit: int = 50):
+    resultado = await db.execute(
+        select(models.Evento)
+        .where(alertas.filtro_status_ativos())
+        .order_by(models.Evento.data_evento.asc())
+        .limit(limit)
+    )
+    return resultado.scalars().all()
+
+
+async def listar_alertas_ativos(
+    db: AsyncSession,
+    limite: datetime,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    apos: Optional[tuple] = None,
+):
+    query = (
+        select(models.Evento)
+        .options(selectinload(models.Evento.processo).selectinload(models.Processo.preso))
+        .where(alertas.filtro_alerta_disparado(limite))
+    )
+    # Ordem (data_evento, id), a mesma do índice parcial; `apos` é o cursor
+    query = paginacao.aplicar_cursor(query, "alertas", apos)
+    if skip:
+        query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    resultado = await db.execute(query)
+    return resultado.scalars().all()
@@ -1,8 +1,12 @@
 import os
+from uuid import uuid4
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import ArgumentError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 
 # 1. Carrega as variáveis de ambiente do arquivo .env
 #    Isso vai procurar por um arquivo .env na pasta 'backend/' e carregá-lo.
@@ -32,9 +36,72 @@ else:
     print("--- INICIANDO COM BANCO DE DADOS POSTGRESQL (PRODUÇÃO) ---")
 
 
+# 3.1 Perfis de pool de conexões (DB_POOL_PROFILE)
+#   - server: processo de longa duração (uvicorn no Docker/Railway). QueuePool
+#     com tamanho fixo, pre_ping (descarta conexões derrubadas pelo Neon) e
+#     recycle antes do timeout de ociosidade do servidor.
+#   - serverless: função do Vercel (api/index.py). Cada instância fria criaria
+#     um pool próprio e esgotaria as conexões do Neon em rajadas; com NullPool
+#     a conexão é aberta e devolvida a cada request (use o host "-pooler").
+#   - pgbouncer: atrás de um PgBouncer em modo transaction. Pool pequeno e sem
+#     cache de prepared statements no asyncpg (não sobrevive à troca de backend).
+# DB_POOL_SIZE e DB_MAX_OVERFLOW são o total de cada worker, dividido entre o
+# engine síncrono e o assíncrono (o síncrono fica com a metade arredondada para
+# baixo, mínimo de 1 conexão fixa em cada). Por worker, no máximo:
+#   - server: DB_POOL_SIZE + DB_MAX_OVERFLOW conexões (padrão 5 + 10 = 15);
+#   - pgbouncer: até 2 + 2 = 4 conexões com o PgBouncer;
+#   - serverless: uma conexão por request em andamento.
+# No banco, multiplique pelo número de workers (e instâncias).
+# Sem DB_POOL_PROFILE, usa "serverless" quando roda no Vercel e "server" fora dele.
+# No SQLite os perfis não se aplicam (fica o pool padrão do SQLAlchemy).
+POOL_PROFILES = ("server", "serverless", "pgbouncer")
+DB_POOL_PROFILE = (
+    os.getenv("DB_POOL_PROFILE", "").strip().lower()
+    or ("serverless" if os.getenv("VERCEL") else "server")
+)
+if DB_POOL_PROFILE not in POOL_PROFILES:
+    raise RuntimeError(
+        f"DB_POOL_PROFILE inválido: '{DB_POOL_PROFILE}'. Use: {', '.join(POOL_PROFILES)}"
+    )
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def _parte_do_engine(total: int, sincrono: bool, minimo: int) -> int:
+    """Parte do total do worker que cabe a um dos dois engines."""
+    metade = total // 2
+    return max(metade if sincrono else total - metade, minimo)
+
+
+def _opcoes_pool(profile: str, sincrono: bool) -> dict:
+    """Argumentos de create_engine (sincrono=True) ou create_async_engine para o perfil."""
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        return {}
+    if profile == "serverless":
+        return {"poolclass": NullPool}
+    if profile == "pgbouncer":
+        pool_size, max_overflow = min(DB_POOL_SIZE, 2), min(DB_MAX_OVERFLOW, 2)
+        recycle = min(DB_POOL_RECYCLE, 300)
+    else:
+        pool_size, max_overflow = DB_POOL_SIZE, DB_MAX_OVERFLOW
+        recycle = DB_POOL_RECYCLE
+    return {
+        "pool_size": _parte_do_engine(pool_size, sincrono, 1),
+        "max_overflow": _parte_do_engine(max_overflow, sincrono, 0),
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": recycle,
+        "pool_pre_ping": True,
+    }
+
+
+if not SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    print(f"--- POOL DE CONEXÕES: perfil '{DB_POOL_PROFILE}' ---")
+
 try:
     engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args=connect_args
+        SQLALCHEMY_DATABASE_URL, connect_args=connect_args, **_opcoes_pool(DB_POOL_PROFILE, sincrono=True)
     )
 except ArgumentError as exc:
     raise RuntimeError(
@@ -52,4 +119,65 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# 4. Engine assíncrono (asyncpg no PostgreSQL, aiosqlite no SQLite).
+#    Usado pelos endpoints de leitura mais acessados (busca, detalhe, alertas),
+#    que assim não ocupam uma thread do threadpool enquanto esperam o banco.
+def _montar_url_async(url_sync: str):
+    url = make_url(url_sync)
+    async_connect_args = {}
+    if url.drivername.startswith("sqlite"):
+        url = url.set(drivername="sqlite+aiosqlite")
+    elif url.drivername.startswith("postgresql"):
+        # asyncpg não entende sslmode/channel_binding da URL (padrão libpq)
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode and sslmode != "disable":
+            async_connect_args["ssl"] = "require" if sslmode in {"allow", "prefer", "require"} else True
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+        if DB_POOL_PROFILE in {"serverless", "pgbouncer"}:
+            # PgBouncer (e o pooler do Neon) em modo transaction não mantém
+            # prepared statements entre transações
+            async_connect_args["statement_cache_size"] = 0
+            async_connect_args["prepared_statement_cache_size"] = 0
+            async_connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    return url, async_connect_args
+
+
+ASYNC_DATABASE_URL, async_connect_args = _montar_url_async(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, connect_args=async_connect_args, **_opcoes_pool(DB_POOL_PROFILE, sincrono=False)
+)
+
+# expire_on_commit=False: em modo async não há lazy load depois do commit
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _estatisticas_do_pool(pool) -> dict:
+    dados = {"classe": type(pool).__name__, "status": pool.status()}
+    # NullPool/StaticPool não têm contadores
+    for nome in ("size", "checkedin", "checkedout", "overflow"):
+        metodo = getattr(pool, nome, None)
+        if callable(metodo):
+            dados[nome] = metodo()
+    return dados
+
+
+def estatisticas_pool() -> dict:
+    """Situação atual dos pools (sync e async) para diagnóstico."""
+    return {
+        "perfil": DB_POOL_PROFILE,
+        "dialeto": engine.dialect.name,
+        "sync": _estatisticas_do_pool(engine.pool),
+        "async": _estatisticas_do_pool(async_engine.sync_engine.pool),
+    }
@@ -0,0 +1,120 @@
+"""
+Exportação em streaming do relatório completo (NDJSON e CSV).
+
+Os presos chegam em lotes (`leitura.iterar_presos`, dicts com os campos de
+PresoDetalhe) e cada um é serializado e enviado em seguida, então o consumo
+de memória fica constante independente do tamanho do relatório.
+"""
+import csv
+import io
+from typing import Iterable, Iterator
+
+from . import respostas, schemas
+
+# Mesmo padrão do CSV exportado pelo frontend (Excel pt-BR): BOM + ';'
+CSV_BOM = "\ufeff"
+CSV_DELIMITADOR = ";"
+COLUNAS_PRESO = [
+    "preso_id",
+    "nome_completo",
+    "cpf",
+    "nome_da_mae",
+    "data_nascimento",
+    "criado_em",
+]
+COLUNAS_PROCESSO = [
+    "processo_id",
+    "numero_processo",
+    "status_processual",
+    "tipo_prisao",
+    "data_prisao",
+    "local_segregacao",
+    "numero_da_guia",
+    "tipo_guia",
+]
+COLUNAS_EVENTO = [
+    "evento_id",
+    "data_evento",
+    "tipo_evento",
+    "alerta_status",
+    "descricao",
+]
+CSV_CABECALHO = COLUNAS_PRESO + COLUNAS_PROCESSO + COLUNAS_EVENTO
+
+
+def gerar_ndjson(presos: Iterable[dict]) -> Iterator[bytes]:
+    """Uma linha JSON (PresoDetalhe) por preso."""
+    for preso in presos:
+        yield respostas.serializar(schemas.PresoDetalhe, preso) + b"\n"
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ""
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    if hasattr(valor, "value"):  # Enums
+        return valor.value
+    return valor
+
+
+def gerar_csv(presos: Iterable[dict]) -> Iterator[str]:
+    """
+    CSV "achatado": uma linha por evento, repetindo os dados do preso e do
+    processo. Presos sem processo (ou processos sem evento) geram uma linha
+    com as colunas filhas vazias.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=CSV_DELIMITADOR)
+
+    def _descarregar() -> str:
+        conteudo = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return conteudo
+
+    writer.writerow(CSV_CABECALHO)
+    yield CSV_BOM + _descarregar()
+
+    for preso in presos:
+        dados_preso = [
+            preso["id"],
+            preso["nome_completo"],
+            preso["cpf"],
+            preso["nome_da_mae"],
+            preso["data_nascimento"],
+            preso["criado_em"],
+        ]
+        if not preso["processos"]:
+            writer.writerow(
+                [_valor_csv(v) for v in dados_preso]
+                + [""] * (len(COLUNAS_PROCESSO) + len(COLUNAS_EVENTO))
+            )
+        for processo in preso["processos"]:
+            dados_processo = [
+                processo["id"],
+                processo["numero_processo"],
+                processo["status_processual"],
+                processo["tipo_prisao"],
+                processo["data_prisao"],
+                processo["local_segregacao"],
+                processo["numero_da_guia"],
+                processo["tipo_guia"],
+            ]
+            if not processo["eventos"]:
+                writer.writerow(
+                    [_valor_csv(v) for v in dados_preso + dados_processo]
+                    + [""] * len(COLUNAS_EVENTO)
+                )
+            for evento in processo["eventos"]:
+                dados_evento = [
+                    evento["id"],
+                    evento["data_evento"],
+                    evento["tipo_evento"],
+                    evento["alerta_status"],
+                    evento["descricao"],
+                ]
+                writer.writerow(
+                    [_valor_csv(v) for v in dados_preso + dados_processo + dados_evento]
+                )
+        yield _descarregar()
@@ -0,0 +1,380 @@
+"""
+Importação em massa de presos e processos (CSV ou NDJSON).
+
+O arquivo é lido em streaming e processado em lotes de `IMPORTACAO_LOTE`
+registros, cada lote numa transação:
+
+1. valida cada linha com os schemas (PresoCreate/ProcessoCreate); linhas
+   inválidas entram no relatório de erros e não derrubam o lote;
+2. agrupa por CPF (deduplicação dentro do arquivo) e busca de uma vez os
+   CPFs que já existem no banco; processos desses presos são anexados ao
+   cadastro existente, ignorando números de processo que ele já tem;
+3. insere os presos novos com um único INSERT em lote (executemany com
+   RETURNING para obter os ids) e os processos com COPY no PostgreSQL
+   (psycopg2) ou INSERT em lote nos demais bancos.
+
+Se o lote falhar no banco (ex.: CPF inserido por outra sessão no meio do
+caminho), ele é refeito preso a preso, com SAVEPOINT, para isolar só os
+registros problemáticos.
+
+Formatos aceitos (uma linha = um processo):
+- CSV com cabeçalho, separado por ';' (mesmo formato do relatório
+  exportado) ou ','. Colunas desconhecidas são ignoradas.
+- NDJSON com o mesmo formato "achatado" ou com o formato do cadastro
+  completo: {"preso": {...}, "processos": [{...}, ...]}.
+Presos sem CPF não têm como ser deduplicados: cada linha cria um preso
+(use o formato aninhado do NDJSON para mandar vários processos).
+"""
+import csv
+import io
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import models, schemas, versoes
+
+logger = logging.getLogger(__name__)
+
+IMPORTACAO_LOTE = int(os.getenv("IMPORTACAO_LOTE", "1000"))
+# Limite de erros detalhados no relatório (os demais só são contados)
+IMPORTACAO_MAX_ERROS = int(os.getenv("IMPORTACAO_MAX_ERROS", "1000"))
+
+CAMPOS_PRESO = list(schemas.PresoCreate.model_fields)
+CAMPOS_PROCESSO = list(schemas.ProcessoCreate.model_fields)
+
+
+@dataclass
+class RelatorioImportacao:
+    linhas: int = 0
+    presos_criados: int = 0
+    presos_existentes: int = 0
+    processos_criados: int = 0
+    processos_duplicados: int = 0
+    linhas_com_erro: int = 0
+    erros: list = field(default_factory=list)
+
+    def registrar_erro(self, linha: int, erro: str):
+        self.linhas_com_erro += 1
+        if len(self.erros) < IMPORTACAO_MAX_ERROS:
+            self.erros.append({"linha": linha, "erro": erro})
+
+    def como_dict(self) -> dict:
+        return {
+            "linhas": self.linhas,
+            "presos_criados": self.presos_criados,
+            "presos_existentes": self.presos_existentes,
+            "processos_criados": self.processos_criados,
+            "processos_duplicados": self.processos_duplicados,
+            "linhas_com_erro": self.linhas_com_erro,
+            "erros": self.erros,
+            "erros_omitidos": max(0, self.linhas_com_erro - len(self.erros)),
+        }
+
+
+@dataclass
+class _PresoImportado:
+    dados: dict
+    linha: int
+    processos: list = field(default_factory=list)  # (linha, dados do processo)
+
+
+# --- Leitura dos arquivos ---
+
+
+def _normalizar_cpf(cpf: Any) -> Optional[str]:
+    digitos = re.sub(r"\D", "", str(cpf or ""))
+    return digitos or None
+
+
+def _normalizar_data(valor: Any) -> Any:
+    # Aceita também o formato brasileiro dd/mm/aaaa
+    if isinstance(valor, str):
+        texto = valor.strip()
+        if not texto:
+            return None
+        data_br = re.match(r"^(\d{2})/(\d{2})/(\d{4})$", texto)
+        if data_br:
+            return f"{data_br.group(3)}-{data_br.group(2)}-{data_br.group(1)}"
+        return texto
+    return valor
+
+
+def _vazio_para_none(dados: dict) -> dict:
+    return {chave: (None if valor == "" else valor) for chave, valor in dados.items()}
+
+
+def ler_csv(arquivo: Iterable[str]) -> Iterator[tuple[int, dict]]:
+    linhas = iter(arquivo)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+    cabecalho = cabecalho.lstrip("﻿")
+    delimitador = ";" if cabecalho.count(";") >= cabecalho.count(",") else ","
+    colunas = next(csv.reader([cabecalho], delimiter=delimitador))
+    leitor = csv.DictReader(linhas, fieldnames=[c.strip() for c in colunas], delimiter=delimitador)
+    for numero, registro in enumerate(leitor, start=2):
+        registro.pop(None, None)  # colunas extras sem cabeçalho
+        yield numero, _vazio_para_none(registro)
+
+
+def ler_ndjson(arquivo: Iterable[str]) -> Iterator[tuple[int, Any]]:
+    for numero, linha in enumerate(arquivo, start=1):
+        linha = linha.strip().lstrip("﻿")
+        if not linha:
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except json.JSONDecodeError as exc:
+            yield numero, ValueError(f"JSON inválido: {exc.msg}")
+
+
+def _explodir_registro(numero: int, registro: Any) -> Iterator[tuple[int, dict, Optional[dict]]]:
+    """Converte um registro (achatado ou aninhado) em pares (preso, processo)."""
+    if isinstance(registro, Exception):
+        raise registro
+    if not isinstance(registro, dict):
+        raise ValueError("Registro deve ser um objeto JSON.")
+    if isinstance(registro.get("preso"), dict):
+        preso = registro["preso"]
+        processos = registro.get("processos") or []
+        if not processos:
+            yield numero, preso, None
+        for processo in processos:
+            yield numero, preso, processo
+        return
+    processo = {campo: registro.get(campo) for campo in CAMPOS_PROCESSO}
+    yield numero, registro, (processo if processo.get("numero_processo") else None)
+
+
+def _validar(numero: int, registro: Any):
+    itens = []
+    for linha, preso, processo in _explodir_registro(numero, registro):
+        dados_preso = {campo: preso.get(campo) for campo in CAMPOS_PRESO}
+        dados_preso["cpf"] = _normalizar_cpf(dados_preso["cpf"])
+        if dados_preso["cpf"] is not None and len(dados_preso["cpf"]) != 11:
+            raise ValueError("CPF inválido. Informe 11 dígitos.")
+        dados_preso["data_nascimento"] = _normalizar_data(dados_preso["data_nascimento"])
+        preso_validado = schemas.PresoCreate(**dados_preso).model_dump()
+
+        processo_validado = None
+        if processo is not None:
+            dados_processo = {campo: processo.get(campo) for campo in CAMPOS_PROCESSO}
+            dados_processo["data_prisao"] = _normalizar_data(dados_processo["data_prisao"])
+            processo_validado = schemas.ProcessoCreate(**dados_processo).model_dump()
+        itens.append((linha, preso_validado, processo_validado))
+    return itens
+
+
+def _mensagem_validacao(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in erro['loc']) or 'registro'}: {erro['msg']}" for erro in exc.errors()
+    )
+
+
+# --- Gravação ---
+
+
+def _copiar_processos_pg(db: Session, linhas: list[dict]):
+    """COPY ... FROM STDIN (psycopg2): bem mais rápido que INSERT para muitas linhas."""
+    colunas = CAMPOS_PROCESSO + ["preso_id"]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for linha in linhas:
+        escritor.writerow(["\\N" if linha.get(c) is None else linha[c] for c in colunas])
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY processos ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _inserir_processos(db: Session, linhas: list[dict]):
+    if not linhas:
+        return
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2":
+        _copiar_processos_pg(db, linhas)
+    else:
+        db.execute(insert(models.Processo), linhas)
+
+
+def _inserir_presos(db: Session, presos: list[_PresoImportado]) -> list[int]:
+    if not presos:
+        return []
+    # executemany com RETURNING (insertmanyvalues): ids na mesma ordem dos parâmetros
+    resultado = db.execute(
+        insert(models.Preso).returning(models.Preso.id, sort_by_parameter_order=True),
+        [preso.dados for preso in presos],
+    )
+    return list(resultado.scalars())
+
+
+def _gravar_grupos(db: Session, grupos: list[_PresoImportado], relatorio: RelatorioImportacao):
+    """Grava um conjunto de presos (e processos) na transação atual."""
+    cpfs = [grupo.dados["cpf"] for grupo in grupos if grupo.dados["cpf"]]
+    existentes: dict[str, int] = {}
+    if cpfs:
+        existentes = dict(
+            db.execute(
+                select(models.Preso.cpf, models.Preso.id).where(models.Preso.cpf.in_(cpfs))
+            ).all()
+        )
+
+    novos = [grupo for grupo in grupos if grupo.dados["cpf"] not in existentes]
+    ids_novos = _inserir_presos(db, novos)
+
+    preso_ids = {}
+    for grupo, preso_id in zip(novos, ids_novos):
+        preso_ids[id(grupo)] = preso_id
+    for grupo in grupos:
+        if grupo.dados["cpf"] in existentes:
+            preso_ids[id(grupo)] = existentes[grupo.dados["cpf"]]
+
+    # Processos que os presos já existentes já têm (mesmo número) são ignorados
+    ja_cadastrados = set()
+    pares = [
+        (existentes[grupo.dados["cpf"]], processo["numero_processo"])
+        for grupo in grupos
+        if grupo.dados["cpf"] in existentes
+        for _, processo in grupo.processos
+    ]
+    if pares:
+        ja_cadastrados = set(
+            db.execute(
+                select(models.Processo.preso_id, models.Processo.numero_processo).where(
+                    tuple_(models.Processo.preso_id, models.Processo.numero_processo).in_(pares)
+                )
+            ).all()
+        )
+
+    processos = []
+    duplicados = 0
+    for grupo in grupos:
+        preso_id = preso_ids[id(grupo)]
+        for _, processo in grupo.processos:
+            if (preso_id, processo["numero_processo"]) in ja_cadastrados:
+                duplicados += 1
+                continue
+            processos.append({**processo, "preso_id": preso_id})
+    _inserir_processos(db, processos)
+    # Presos que já existiam e ganharam processos mudaram de versão (ETag)
+    versoes.tocar(db, presos={linha["preso_id"] for linha in processos} & set(existentes.values()))
+
+    relatorio.presos_criados += len(novos)
+    relatorio.presos_existentes += len(grupos) - len(novos)
+    relatorio.processos_criados += len(processos)
+    relatorio.processos_duplicados += duplicados
+
+
+def _agrupar(
+    registros: list[tuple[int, Any]], relatorio: RelatorioImportacao
+) -> list[_PresoImportado]:
+    """Valida o lote e junta as linhas do mesmo CPF num só preso."""
+    grupos: list[_PresoImportado] = []
+    por_cpf: dict[str, _PresoImportado] = {}
+    for numero, registro in registros:
+        relatorio.linhas += 1
+        try:
+            itens = _validar(numero, registro)
+        except ValidationError as exc:
+            relatorio.registrar_erro(numero, _mensagem_validacao(exc))
+            continue
+        except ValueError as exc:
+            relatorio.registrar_erro(numero, str(exc))
+            continue
+
+        for linha, preso, processo in itens:
+            cpf = preso["cpf"]
+            grupo = por_cpf.get(cpf) if cpf else None
+            if grupo is None:
+                grupo = _PresoImportado(dados=preso, linha=linha)
+                grupos.append(grupo)
+                if cpf:
+                    por_cpf[cpf] = grupo
+            if processo is not None:
+                # Mesmo processo repetido no arquivo (ex.: relatório com uma linha por evento)
+                if any(p["numero_processo"] == processo["numero_processo"] for _, p in grupo.processos):
+                    relatorio.processos_duplicados += 1
+                    continue
+                grupo.processos.append((linha, processo))
+    return grupos
+
+
+def _somar_contagens(relatorio: RelatorioImportacao, parcial: RelatorioImportacao):
+    relatorio.presos_criados += parcial.presos_criados
+    relatorio.presos_existentes += parcial.presos_existentes
+    relatorio.processos_criados += parcial.processos_criados
+    relatorio.processos_duplicados += parcial.processos_duplicados
+
+
+def _gravar_lote(db: Session, grupos: list[_PresoImportado], relatorio: RelatorioImportacao):
+    # As contagens só entram no relatório depois do commit
+    parcial = RelatorioImportacao()
+    try:
+        _gravar_grupos(db, grupos, parcial)
+        db.commit()
+        _somar_contagens(relatorio, parcial)
+        return
+    except SQLAlchemyError:
+        db.rollback()
+        logger.warning("Lote da importação falhou; refazendo preso a preso.", exc_info=True)
+
+    # Plano B: um SAVEPOINT por preso, para isolar só os registros com erro
+    gravados = RelatorioImportacao()
+    for grupo in grupos:
+        parcial = RelatorioImportacao()
+        try:
+            with db.begin_nested():
+                _gravar_grupos(db, [grupo], parcial)
+        except SQLAlchemyError as exc:
+            erro = getattr(exc, "orig", exc)
+            relatorio.registrar_erro(grupo.linha, f"Erro ao gravar no banco: {erro}")
+            continue
+        _somar_contagens(gravados, parcial)
+    db.commit()
+    _somar_contagens(relatorio, gravados)
+
+
+def importar(
+    db: Session, arquivo: Iterable[str], formato: str, tamanho_lote: int = IMPORTACAO_LOTE
+) -> RelatorioImportacao:
+    """Importa um arquivo CSV/NDJSON (iterável de linhas de texto)."""
+    if formato == "csv":
+        registros = ler_csv(arquivo)
+    elif formato == "ndjson":
+        registros = ler_ndjson(arquivo)
+    else:
+        raise ValueError("Formato inválido. Use 'csv' ou 'ndjson'.")
+
+    relatorio = RelatorioImportacao()
+    while True:
+        lote = list(islice(registros, tamanho_lote))
+        if not lote:
+            break
+        grupos = _agrupar(lote, relatorio)
+        if grupos:
+            _gravar_lote(db, grupos, relatorio)
+    return relatorio
+
+
+def detectar_formato(nome_arquivo: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    nome = (nome_arquivo or "").lower()
+    tipo = (content_type or "").lower()
+    if nome.endswith(".csv") or "csv" in tipo:
+        return "csv"
+    if nome.endswith((".ndjson", ".jsonl")) or "ndjson" in tipo or "jsonl" in tipo:
+        return "ndjson"
+    return None
@@ -1,3 +1,9 @@
-from .service import consultar_processo_externo, consultar_cpf_externo
+from .cache import metricas_cache
+from .service import consultar_processo_externo, consultar_processos_em_lote, consultar_cpf_externo
 
-__all__ = ["consultar_processo_externo", "consultar_cpf_externo"]
+__all__ = [
+    "consultar_processo_externo",
+    "consultar_processos_em_lote",
+    "consultar_cpf_externo",
+    "metricas_cache",
+]
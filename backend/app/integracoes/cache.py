@@ -0,0 +1,257 @@
+"""
+Cache dos resultados das integrações externas (DataJud, PJe, CPF).
+
+- TTL configurável para resultados encontrados e um TTL curto para
+  "não encontrado", para não martelar a fonte com o mesmo número logo em
+  seguida. Timeouts e falhas não são guardados.
+- Single-flight: requisições simultâneas para a mesma chave esperam a
+  primeira terminar e reaproveitam o resultado (uma só chamada externa).
+- Backends plugáveis (INTEGRACOES_CACHE_BACKEND):
+    memoria  -> LRU em memória, por processo (padrão);
+    banco    -> tabela `integracoes_cache` (SQLite/PostgreSQL), compartilhada
+                entre instâncias (útil no serverless);
+    desligado -> sem cache (single-flight continua ativo).
+- Métricas de acerto/erro por fonte em `metricas_cache()`.
+"""
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+
+from .. import models
+from ..database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+INTEGRACOES_CACHE_BACKEND = os.getenv("INTEGRACOES_CACHE_BACKEND", "memoria").strip().lower()
+INTEGRACOES_CACHE_TTL = float(os.getenv("INTEGRACOES_CACHE_TTL", "600"))
+INTEGRACOES_CACHE_TTL_NEGATIVO = float(os.getenv("INTEGRACOES_CACHE_TTL_NEGATIVO", "60"))
+INTEGRACOES_CACHE_MAX = int(os.getenv("INTEGRACOES_CACHE_MAX", "2000"))
+# Quanto um pedido espera pelo resultado de outro pedido igual em andamento
+ESPERA_SINGLE_FLIGHT = 30.0
+
+
+class CacheMemoria:
+    """LRU com expiração por item."""
+
+    def __init__(self, max_itens: int):
+        self.max_itens = max_itens
+        self._itens: "OrderedDict[str, tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: str):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if time.monotonic() >= expira_em:
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return copy.deepcopy(valor)
+
+    def guardar(self, chave: str, valor, ttl: float):
+        with self._lock:
+            self._itens[chave] = (copy.deepcopy(valor), time.monotonic() + ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+class CacheBanco:
+    """Tabela `integracoes_cache`; o valor é guardado em JSON."""
+
+    # A cada N gravações, apaga as entradas vencidas
+    LIMPEZA_A_CADA = 200
+
+    def __init__(self):
+        self._gravacoes = 0
+
+    @staticmethod
+    def _agora():
+        return datetime.now(timezone.utc)
+
+    def obter(self, chave: str):
+        with SessionLocal() as db:
+            item = db.get(models.IntegracaoCache, chave)
+            if item is None:
+                return None
+            expira_em = item.expira_em
+            if expira_em.tzinfo is None:  # SQLite devolve sem timezone
+                expira_em = expira_em.replace(tzinfo=timezone.utc)
+            if expira_em <= self._agora():
+                return None
+            return json.loads(item.valor)
+
+    def guardar(self, chave: str, valor, ttl: float):
+        expira_em = self._agora() + timedelta(seconds=ttl)
+        with SessionLocal() as db:
+            db.merge(
+                models.IntegracaoCache(
+                    chave=chave, valor=json.dumps(valor, default=str), expira_em=expira_em
+                )
+            )
+            try:
+                db.commit()
+            except IntegrityError:
+                # Outra instância gravou a mesma chave ao mesmo tempo
+                db.rollback()
+            self._gravacoes += 1
+            if self._gravacoes % self.LIMPEZA_A_CADA == 0:
+                db.execute(
+                    delete(models.IntegracaoCache).where(
+                        models.IntegracaoCache.expira_em <= self._agora()
+                    )
+                )
+                db.commit()
+
+    def limpar(self):
+        with SessionLocal() as db:
+            db.execute(delete(models.IntegracaoCache))
+            db.commit()
+
+
+def _criar_backend():
+    if INTEGRACOES_CACHE_BACKEND == "banco":
+        return CacheBanco()
+    if INTEGRACOES_CACHE_BACKEND == "desligado":
+        return None
+    if INTEGRACOES_CACHE_BACKEND != "memoria":
+        logger.warning(
+            "INTEGRACOES_CACHE_BACKEND inválido (%s); usando 'memoria'.", INTEGRACOES_CACHE_BACKEND
+        )
+    return CacheMemoria(INTEGRACOES_CACHE_MAX)
+
+
+_backend = _criar_backend()
+
+# --- Single-flight ---
+
+
+class _Voo:
+    """Consulta em andamento para uma chave; os demais pedidos esperam nela."""
+
+    def __init__(self):
+        self.concluido = threading.Event()
+        self.valor: Optional[dict] = None
+
+
+_em_andamento: dict[str, _Voo] = {}
+_em_andamento_lock = threading.Lock()
+
+# --- Métricas (por fonte = prefixo da chave) ---
+
+_metricas_lock = threading.Lock()
+_metricas: dict[str, dict[str, int]] = {}
+
+
+def _contar(chave: str, campo: str):
+    fonte = chave.split(":", 1)[0]
+    with _metricas_lock:
+        contadores = _metricas.setdefault(
+            fonte,
+            {"acertos": 0, "acertos_negativos": 0, "faltas": 0, "aguardou_outro_pedido": 0, "erros_backend": 0},
+        )
+        contadores[campo] += 1
+
+
+def metricas_cache() -> dict:
+    with _metricas_lock:
+        por_fonte = {fonte: dict(valores) for fonte, valores in _metricas.items()}
+    for valores in por_fonte.values():
+        consultas = valores["acertos"] + valores["faltas"]
+        valores["taxa_acerto"] = round(valores["acertos"] / consultas, 3) if consultas else None
+    return {
+        "backend": INTEGRACOES_CACHE_BACKEND,
+        "ttl_segundos": INTEGRACOES_CACHE_TTL,
+        "ttl_negativo_segundos": INTEGRACOES_CACHE_TTL_NEGATIVO,
+        "fontes": por_fonte,
+    }
+
+
+def _ler(chave: str):
+    if _backend is None:
+        return None
+    try:
+        return _backend.obter(chave)
+    except Exception:
+        _contar(chave, "erros_backend")
+        logger.warning("Falha ao ler o cache de integrações (%s)", chave, exc_info=True)
+        return None
+
+
+def _gravar(chave: str, valor, ttl: float):
+    if _backend is None or ttl <= 0:
+        return
+    try:
+        _backend.guardar(chave, valor, ttl)
+    except Exception:
+        _contar(chave, "erros_backend")
+        logger.warning("Falha ao gravar o cache de integrações (%s)", chave, exc_info=True)
+
+
+def obter_ou_consultar(
+    chave: str,
+    consultar: Callable[[], dict],
+    negativo: Callable[[dict], bool],
+    espera_maxima: Optional[float] = None,
+) -> dict:
+    """
+    Retorna o resultado em cache para `chave` ou chama `consultar()`.
+    Resultados com `sucesso` usam o TTL normal; os que `negativo(resultado)`
+    considera negativos usam o TTL curto; os demais (erros) não são guardados.
+    """
+    valor = _ler(chave)
+    if valor is not None:
+        _contar(chave, "acertos")
+        if not valor.get("sucesso"):
+            _contar(chave, "acertos_negativos")
+        return valor
+
+    with _em_andamento_lock:
+        voo = _em_andamento.get(chave)
+        lider = voo is None
+        if lider:
+            voo = _em_andamento[chave] = _Voo()
+
+    if not lider:
+        # Outro pedido já está consultando esta chave: espera o resultado dele
+        espera = ESPERA_SINGLE_FLIGHT if espera_maxima is None else max(espera_maxima, 0)
+        if voo.concluido.wait(espera) and voo.valor is not None:
+            _contar(chave, "aguardou_outro_pedido")
+            return copy.deepcopy(voo.valor)
+        # O outro pedido falhou ou demorou demais: consulta direto
+        _contar(chave, "faltas")
+        return consultar()
+
+    _contar(chave, "faltas")
+    try:
+        valor = consultar()
+        voo.valor = valor
+        if valor.get("sucesso"):
+            _gravar(chave, valor, INTEGRACOES_CACHE_TTL)
+        elif negativo(valor):
+            _gravar(chave, valor, INTEGRACOES_CACHE_TTL_NEGATIVO)
+        return copy.deepcopy(valor)
+    finally:
+        with _em_andamento_lock:
+            _em_andamento.pop(chave, None)
+        voo.concluido.set()
+
+
+def limpar_cache():
+    if _backend is not None:
+        _backend.limpar()
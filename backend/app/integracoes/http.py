@@ -0,0 +1,84 @@
+"""
+Clientes HTTP persistentes das integrações externas.
+
+Cada fonte (datajud, pje, cpf) tem a sua `requests.Session` com pool de
+conexões próprio: as consultas reaproveitam a conexão TCP/TLS aberta em vez
+de negociar uma nova a cada chamada, e uma fonte lenta não ocupa as
+conexões das outras. Cada chamada entra no histograma de latência por
+fonte do /metrics (app/metricas.py).
+"""
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..metricas import observar_integracao
+
+INTEGRACOES_POOL_CONEXOES = int(os.getenv("INTEGRACOES_POOL_CONEXOES", "10"))
+# (conexão, leitura) em segundos
+INTEGRACOES_TIMEOUT_CONEXAO = float(os.getenv("INTEGRACOES_TIMEOUT_CONEXAO", "3"))
+INTEGRACOES_TIMEOUT_LEITURA = float(os.getenv("INTEGRACOES_TIMEOUT_LEITURA", "10"))
+
+_sessoes: dict[str, requests.Session] = {}
+_sessoes_lock = threading.Lock()
+
+
+class _SessaoMedida(requests.Session):
+    """Session que registra a duração de cada chamada (com o corpo) por fonte."""
+
+    def __init__(self, fonte: str):
+        super().__init__()
+        self.fonte = fonte
+
+    def request(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        resultado = "erro"
+        try:
+            resposta = super().request(*args, **kwargs)
+            resultado = f"{resposta.status_code // 100}xx"
+            return resposta
+        except requests.Timeout:
+            resultado = "timeout"
+            raise
+        finally:
+            observar_integracao(self.fonte, resultado, time.perf_counter() - inicio)
+
+
+def _criar_sessao(fonte: str) -> requests.Session:
+    sessao = _SessaoMedida(fonte)
+    adaptador = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=INTEGRACOES_POOL_CONEXOES,
+        pool_block=False,
+        max_retries=0,
+    )
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    return sessao
+
+
+def obter_sessao(fonte: str) -> requests.Session:
+    sessao = _sessoes.get(fonte)
+    if sessao is None:
+        with _sessoes_lock:
+            sessao = _sessoes.get(fonte)
+            if sessao is None:
+                sessao = _sessoes[fonte] = _criar_sessao(fonte)
+    return sessao
+
+
+def timeout_requisicao(restante: float | None = None) -> tuple[float, float]:
+    """Timeout (conexão, leitura), limitado pelo tempo que resta do prazo total."""
+    if restante is None:
+        return (INTEGRACOES_TIMEOUT_CONEXAO, INTEGRACOES_TIMEOUT_LEITURA)
+    restante = max(restante, 0.1)
+    return (min(INTEGRACOES_TIMEOUT_CONEXAO, restante), min(INTEGRACOES_TIMEOUT_LEITURA, restante))
+
+
+def fechar_sessoes():
+    with _sessoes_lock:
+        for sessao in _sessoes.values():
+            sessao.close()
+        _sessoes.clear()
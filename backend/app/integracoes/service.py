@@ -1,9 +1,57 @@
 import os
 import re
-from typing import Any
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Iterable, Iterator
 
 import requests
 
+from ..limites import LimitadorTaxa
+from .cache import obter_ou_consultar
+from .http import obter_sessao, timeout_requisicao
+
+# Fontes de processo: variáveis de ambiente (URL, token) de cada uma
+FONTES_PROCESSO = {
+    "datajud": ("DATAJUD_API_URL", "DATAJUD_API_TOKEN"),
+    "pje": ("PJE_API_URL", "PJE_API_TOKEN"),
+}
+MENSAGEM_PROCESSO_NAO_ENCONTRADO = "Processo não encontrado na fonte consultada."
+MENSAGEM_TIMEOUT_PROCESSO = "Timeout na consulta à fonte externa."
+MENSAGEM_CPF_NAO_ENCONTRADO = "CPF não encontrado na fonte consultada."
+MENSAGEM_TIMEOUT_CPF = "Timeout na consulta de CPF."
+MENSAGEM_LIMITE_FONTE = "Limite de requisições da fonte atingido; tente novamente mais tarde."
+# Resultados negativos que vão para o cache com TTL curto: só o "não
+# encontrado" (404). Timeout não entra: o timeout da requisição encolhe com o
+# prazo de quem chamou (ex.: depois de esperar na fila da fonte), e uma
+# chamada sem tempo deixaria a chave "negativa" para todo mundo.
+_MENSAGENS_NEGATIVAS = {
+    MENSAGEM_PROCESSO_NAO_ENCONTRADO,
+    MENSAGEM_CPF_NAO_ENCONTRADO,
+}
+
+# Prazo total da consulta a todas as fontes, em segundos
+INTEGRACOES_PRAZO_TOTAL = float(os.getenv("INTEGRACOES_PRAZO_TOTAL", "12"))
+
+# As fontes das consultas avulsas são consultadas em paralelo neste pool
+# (compartilhado entre requests; cada lote usa um pool próprio)
+_executor_fontes = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INTEGRACOES_WORKERS", "8")), thread_name_prefix="integracoes"
+)
+
+# Proteção das fontes externas (vale para consultas avulsas e em lote):
+# no máximo N chamadas simultâneas e M chamadas por minuto por fonte.
+# Acertos de cache não contam.
+INTEGRACOES_CONCORRENCIA_POR_FONTE = int(os.getenv("INTEGRACOES_CONCORRENCIA_POR_FONTE", "4"))
+INTEGRACOES_LIMITE_POR_MINUTO = int(os.getenv("INTEGRACOES_LIMITE_POR_MINUTO", "120"))
+_semaforos_fontes = {
+    fonte: threading.BoundedSemaphore(INTEGRACOES_CONCORRENCIA_POR_FONTE) for fonte in FONTES_PROCESSO
+}
+_limite_fontes = LimitadorTaxa(INTEGRACOES_LIMITE_POR_MINUTO, 60)
+
+# Consulta em lote: quantos números são processados ao mesmo tempo
+INTEGRACOES_LOTE_WORKERS = int(os.getenv("INTEGRACOES_LOTE_WORKERS", "8"))
+
 
 def _normalizar_numero_processo(numero: str) -> str:
     return re.sub(r"\D", "", numero or "")
@@ -29,6 +77,17 @@ def _normalizar_data_nascimento(valor: Any) -> str | None:
     return None
 
 
+def _aguardar_vez_da_fonte(fonte: str, prazo: float | None) -> bool:
+    """Espera uma ficha do limite por minuto da fonte, sem passar do prazo."""
+    while True:
+        espera = _limite_fontes.consumir(fonte)
+        if espera is None:
+            return True
+        if prazo is not None and time.monotonic() + espera > prazo:
+            return False
+        time.sleep(espera)
+
+
 def _consultar_fonte(
     *,
     fonte: str,
@@ -36,6 +95,7 @@ def _consultar_fonte(
     token: str | None,
     numero_processo: str,
     tribunal: str | None,
+    prazo: float | None = None,
 ) -> dict[str, Any]:
     if not base_url:
         return {
@@ -54,13 +114,31 @@ def _consultar_fonte(
     if tribunal:
         params["tribunal"] = tribunal
 
+    semaforo = _semaforos_fontes[fonte]
+    restante = None if prazo is None else max(prazo - time.monotonic(), 0)
+    if not semaforo.acquire(timeout=restante):
+        return {"fonte": fonte, "sucesso": False, "mensagem": MENSAGEM_LIMITE_FONTE, "dados": None}
+    try:
+        if not _aguardar_vez_da_fonte(fonte, prazo):
+            return {"fonte": fonte, "sucesso": False, "mensagem": MENSAGEM_LIMITE_FONTE, "dados": None}
+        return _requisitar_fonte(fonte, url, headers, params, prazo)
+    finally:
+        semaforo.release()
+
+
+def _requisitar_fonte(
+    fonte: str, url: str, headers: dict[str, str], params: dict[str, str], prazo: float | None
+) -> dict[str, Any]:
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        restante = None if prazo is None else prazo - time.monotonic()
+        response = obter_sessao(fonte).get(
+            url, headers=headers, params=params, timeout=timeout_requisicao(restante)
+        )
         if response.status_code == 404:
             return {
                 "fonte": fonte,
                 "sucesso": False,
-                "mensagem": "Processo não encontrado na fonte consultada.",
+                "mensagem": MENSAGEM_PROCESSO_NAO_ENCONTRADO,
                 "dados": None,
             }
 
@@ -77,7 +155,7 @@ def _consultar_fonte(
         return {
             "fonte": fonte,
             "sucesso": False,
-            "mensagem": "Timeout na consulta à fonte externa.",
+            "mensagem": MENSAGEM_TIMEOUT_PROCESSO,
             "dados": None,
         }
     except requests.RequestException as exc:
@@ -89,54 +167,199 @@ def _consultar_fonte(
         }
 
 
+def _resultado_negativo(resultado: dict[str, Any]) -> bool:
+    return resultado.get("mensagem") in _MENSAGENS_NEGATIVAS
+
+
+def _consultar_fonte_em_cache(
+    *,
+    fonte: str,
+    base_url: str | None,
+    token: str | None,
+    numero_processo: str,
+    tribunal: str | None,
+    prazo: float | None = None,
+) -> dict[str, Any]:
+    return obter_ou_consultar(
+        f"{fonte}:{numero_processo}:{tribunal or '*'}",
+        lambda: _consultar_fonte(
+            fonte=fonte,
+            base_url=base_url,
+            token=token,
+            numero_processo=numero_processo,
+            tribunal=tribunal,
+            prazo=prazo,
+        ),
+        _resultado_negativo,
+        espera_maxima=None if prazo is None else prazo - time.monotonic(),
+    )
+
+
+def _resultado_nao_concluido(fonte: str, mensagem: str) -> dict[str, Any]:
+    return {"fonte": fonte, "sucesso": False, "mensagem": mensagem, "dados": None}
+
+
 def consultar_processo_externo(
     numero_processo: str,
     fontes: list[str],
     tribunal: str | None = None,
+    aguardar_todas: bool = False,
+    prazo_total: float | None = None,
+    executor: ThreadPoolExecutor | None = None,
 ) -> dict[str, Any]:
+    """
+    Consulta as `fontes` em paralelo no `executor` (padrão: o pool das
+    consultas avulsas), com prazo total de `prazo_total` segundos (padrão
+    INTEGRACOES_PRAZO_TOTAL).
+
+    Sem `aguardar_todas`, retorna assim que uma fonte devolve dados
+    (`melhor_resultado`); as fontes que ainda não responderam são
+    canceladas (se nem começaram) ou deixadas terminar em segundo plano.
+    """
     numero_normalizado = _normalizar_numero_processo(numero_processo)
 
     if len(numero_normalizado) < 7:
         raise ValueError("Número de processo inválido.")
 
-    resultados: list[dict[str, Any]] = []
-
-    for fonte in fontes:
-        if fonte == "datajud":
-            resultados.append(
-                _consultar_fonte(
-                    fonte="datajud",
-                    base_url=os.getenv("DATAJUD_API_URL"),
-                    token=os.getenv("DATAJUD_API_TOKEN"),
-                    numero_processo=numero_normalizado,
-                    tribunal=tribunal,
-                )
-            )
-        elif fonte == "pje":
-            resultados.append(
-                _consultar_fonte(
-                    fonte="pje",
-                    base_url=os.getenv("PJE_API_URL"),
-                    token=os.getenv("PJE_API_TOKEN"),
-                    numero_processo=numero_normalizado,
-                    tribunal=tribunal,
-                )
-            )
-
-    melhor_resultado = next((r["dados"] for r in resultados if r["sucesso"] and r.get("dados")), None)
+    prazo = time.monotonic() + (prazo_total or INTEGRACOES_PRAZO_TOTAL)
+    fontes_validas = [fonte for fonte in dict.fromkeys(fontes) if fonte in FONTES_PROCESSO]
+
+    executor = executor or _executor_fontes
+    futuros = {
+        executor.submit(
+            _consultar_fonte_em_cache,
+            fonte=fonte,
+            base_url=os.getenv(FONTES_PROCESSO[fonte][0]),
+            token=os.getenv(FONTES_PROCESSO[fonte][1]),
+            numero_processo=numero_normalizado,
+            tribunal=tribunal,
+            prazo=prazo,
+        ): fonte
+        for fonte in fontes_validas
+    }
+
+    por_fonte: dict[str, dict[str, Any]] = {}
+    melhor_resultado = None
+    pendentes = set(futuros)
+    while pendentes:
+        restante = prazo - time.monotonic()
+        if restante <= 0:
+            break
+        concluidos, pendentes = wait(pendentes, timeout=restante, return_when=FIRST_COMPLETED)
+        for futuro in concluidos:
+            resultado = futuro.result()
+            por_fonte[futuros[futuro]] = resultado
+            if melhor_resultado is None and resultado["sucesso"] and resultado.get("dados"):
+                melhor_resultado = resultado["dados"]
+        if melhor_resultado is not None and not aguardar_todas:
+            break
+
+    for futuro in pendentes:
+        futuro.cancel()
+        fonte = futuros[futuro]
+        if melhor_resultado is not None and not aguardar_todas:
+            mensagem = "Consulta interrompida: resultado já obtido em outra fonte."
+        else:
+            mensagem = "Prazo total da consulta esgotado."
+        por_fonte[fonte] = _resultado_nao_concluido(fonte, mensagem)
 
     return {
         "numero_processo": numero_normalizado,
-        "resultados": resultados,
+        # Mantém a ordem das fontes pedidas, não a ordem de chegada
+        "resultados": [por_fonte[fonte] for fonte in fontes_validas],
         "melhor_resultado": melhor_resultado,
     }
 
 
+def consultar_processos_em_lote(
+    numeros_processo: Iterable[str],
+    fontes: list[str],
+    tribunal: str | None = None,
+    aguardar_todas: bool = False,
+) -> Iterator[dict[str, Any]]:
+    """
+    Consulta vários processos e devolve cada resultado assim que fica pronto
+    (ordem de conclusão, não a de entrada). No máximo INTEGRACOES_LOTE_WORKERS
+    números ficam em andamento; os limites por fonte de `_consultar_fonte`
+    continuam valendo. Números repetidos (após normalizar) são consultados
+    uma vez; números inválidos voltam com `erro`.
+
+    As fontes do lote rodam em um pool próprio, dimensionado pela
+    concorrência permitida por fonte: as threads que esperam a vez da fonte
+    (semáforo, limite por minuto) ou que seguem rodando depois de
+    interrompidas não ocupam o pool das consultas avulsas.
+    """
+    pendentes_entrada = iter(dict.fromkeys(numeros_processo))
+    vistos: set[str] = set()
+    em_andamento = {}
+
+    fontes_lote = [fonte for fonte in dict.fromkeys(fontes) if fonte in FONTES_PROCESSO]
+    executor_fontes = ThreadPoolExecutor(
+        max_workers=max(INTEGRACOES_CONCORRENCIA_POR_FONTE * len(fontes_lote), 1),
+        thread_name_prefix="integracoes-lote-fontes",
+    )
+
+    try:
+        with ThreadPoolExecutor(
+            max_workers=INTEGRACOES_LOTE_WORKERS, thread_name_prefix="integracoes-lote"
+        ) as executor:
+
+            def _preencher() -> Iterator[dict[str, Any]]:
+                # Agenda números até encher a janela; inválidos já voltam como resultado
+                while len(em_andamento) < INTEGRACOES_LOTE_WORKERS:
+                    numero = next(pendentes_entrada, None)
+                    if numero is None:
+                        return
+                    normalizado = _normalizar_numero_processo(numero)
+                    if len(normalizado) < 7:
+                        yield {"numero_processo": numero, "erro": "Número de processo inválido."}
+                        continue
+                    if normalizado in vistos:
+                        continue
+                    vistos.add(normalizado)
+                    futuro = executor.submit(
+                        consultar_processo_externo,
+                        normalizado,
+                        fontes,
+                        tribunal,
+                        aguardar_todas,
+                        executor=executor_fontes,
+                    )
+                    em_andamento[futuro] = normalizado
+
+            try:
+                yield from _preencher()
+                while em_andamento:
+                    concluidos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+                    for futuro in concluidos:
+                        numero = em_andamento.pop(futuro)
+                        try:
+                            yield futuro.result()
+                        except Exception:
+                            yield {"numero_processo": numero, "erro": "Falha inesperada na consulta."}
+                    yield from _preencher()
+            finally:
+                # Cliente desconectou (ou erro): não agenda mais nada
+                for futuro in em_andamento:
+                    futuro.cancel()
+    finally:
+        # As fontes interrompidas terminam em segundo plano (dentro do prazo)
+        executor_fontes.shutdown(wait=False)
+
+
 def consultar_cpf_externo(cpf: str) -> dict[str, Any]:
     cpf_normalizado = _normalizar_cpf(cpf)
     if len(cpf_normalizado) != 11:
         raise ValueError("CPF inválido. Informe 11 dígitos.")
 
+    return obter_ou_consultar(
+        f"cpf:{cpf_normalizado}",
+        lambda: _consultar_cpf(cpf_normalizado),
+        _resultado_negativo,
+    )
+
+
+def _consultar_cpf(cpf_normalizado: str) -> dict[str, Any]:
     base_url = os.getenv("CPF_API_URL")
     token = os.getenv("CPF_API_TOKEN")
 
@@ -154,12 +377,12 @@ def consultar_cpf_externo(cpf: str) -> dict[str, Any]:
         headers["Authorization"] = f"Bearer {token}"
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = obter_sessao("cpf").get(url, headers=headers, timeout=timeout_requisicao())
         if response.status_code == 404:
             return {
                 "cpf": cpf_normalizado,
                 "sucesso": False,
-                "mensagem": "CPF não encontrado na fonte consultada.",
+                "mensagem": MENSAGEM_CPF_NAO_ENCONTRADO,
                 "dados": None,
             }
 
@@ -190,7 +413,7 @@ def consultar_cpf_externo(cpf: str) -> dict[str, Any]:
         return {
             "cpf": cpf_normalizado,
             "sucesso": False,
-            "mensagem": "Timeout na consulta de CPF.",
+            "mensagem": MENSAGEM_TIMEOUT_CPF,
             "dados": None,
         }
     except requests.RequestException as exc:
@@ -0,0 +1,168 @@
+"""
+Leitura sem ORM das fichas completas de presos (PresoDetalhe).
+
+A busca, o detalhe e o relatório só leem: não precisam de objetos ORM,
+identity map nem do controle de relacionamentos, que custam mais que a
+própria consulta quando a página tem milhares de processos e eventos. Aqui
+são três SELECTs do Core só com as colunas dos schemas:
+
+    presos da página            (filtros e paginação de crud.py)
+    processos WHERE preso_id IN (ids da página)
+    eventos   WHERE processo_id IN (ids desses processos)
+
+e as linhas planas viram a estrutura aninhada numa passada, agrupando por
+id. O resultado são dicts com os mesmos campos de `schemas.PresoDetalhe`,
+prontos para `respostas.json_rapido` / `exportacao`.
+
+As versões async (AsyncSession) ficam em crud_async.py, com as mesmas
+consultas.
+"""
+from datetime import date
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import crud, models, paginacao, schemas
+
+# IN com no máximo isso de ids por consulta (limite de parâmetros do
+# SQLite/asyncpg); páginas maiores viram mais de uma consulta por nível
+IDS_POR_CONSULTA = 1000
+
+
+def _colunas(modelo, schema):
+    # Só as colunas que o schema de resposta usa, na ordem dele
+    tabela = modelo.__table__.c
+    return tuple(tabela[nome] for nome in schema.model_fields if nome in tabela)
+
+
+COLUNAS_PRESO = _colunas(models.Preso, schemas.Preso)
+COLUNAS_PROCESSO = _colunas(models.Processo, schemas.Processo)
+COLUNAS_EVENTO = _colunas(models.Evento, schemas.Evento)
+
+
+def _em_partes(ids: list) -> Iterator[list]:
+    for inicio in range(0, len(ids), IDS_POR_CONSULTA):
+        yield ids[inicio : inicio + IDS_POR_CONSULTA]
+
+
+def consulta_presos(
+    db,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    apos: Optional[tuple] = None,
+):
+    """Página de presos (mesmos filtros e ordem de `crud.search_presos`), só colunas."""
+    return crud.consulta_colunas_pagina_presos(
+        db, COLUNAS_PRESO, nome, status_processual, data_prisao, skip, limit, apos
+    )
+
+
+def consultas_processos(preso_ids: list) -> list:
+    return [
+        select(*COLUNAS_PROCESSO)
+        .where(models.Processo.preso_id.in_(parte))
+        .order_by(models.Processo.preso_id, models.Processo.id)
+        for parte in _em_partes(preso_ids)
+    ]
+
+
+def consultas_eventos(processo_ids: list) -> list:
+    return [
+        select(*COLUNAS_EVENTO)
+        .where(models.Evento.processo_id.in_(parte))
+        .order_by(models.Evento.processo_id, models.Evento.id)
+        for parte in _em_partes(processo_ids)
+    ]
+
+
+def novos_presos(linhas_presos) -> list[dict]:
+    return [{**linha._asdict(), "processos": []} for linha in linhas_presos]
+
+
+def anexar_processos(presos: list[dict], linhas_processos) -> dict[int, list]:
+    """Põe cada processo no seu preso; devolve {processo_id: lista de eventos}."""
+    processos_por_preso = {preso["id"]: preso["processos"] for preso in presos}
+    eventos_por_processo = {}
+    for linha in linhas_processos:
+        processo = {**linha._asdict(), "eventos": []}
+        eventos_por_processo[processo["id"]] = processo["eventos"]
+        processos_por_preso[processo["preso_id"]].append(processo)
+    return eventos_por_processo
+
+
+def anexar_eventos(eventos_por_processo: dict[int, list], linhas_eventos):
+    for linha in linhas_eventos:
+        eventos_por_processo[linha.processo_id].append(linha._asdict())
+
+
+def _completar(db: Session, presos: list[dict]) -> list[dict]:
+    if not presos:
+        return presos
+    eventos_por_processo = anexar_processos(
+        presos,
+        (
+            linha
+            for consulta in consultas_processos([preso["id"] for preso in presos])
+            for linha in db.execute(consulta)
+        ),
+    )
+    anexar_eventos(
+        eventos_por_processo,
+        (
+            linha
+            for consulta in consultas_eventos(list(eventos_por_processo))
+            for linha in db.execute(consulta)
+        ),
+    )
+    return presos
+
+
+def presos_detalhados(
+    db: Session,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+    skip: int = 0,
+    limit: int = 100,
+    apos: Optional[tuple] = None,
+) -> list[dict]:
+    """Página da busca como dicts de PresoDetalhe."""
+    consulta = consulta_presos(db, nome, status_processual, data_prisao, skip, limit, apos)
+    return _completar(db, novos_presos(db.execute(consulta)))
+
+
+def preso_detalhado(db: Session, preso_id: int) -> Optional[dict]:
+    presos = novos_presos(db.execute(select(*COLUNAS_PRESO).where(models.Preso.id == preso_id)))
+    return _completar(db, presos)[0] if presos else None
+
+
+def iterar_presos(
+    db: Session,
+    nome: Optional[str] = None,
+    status_processual: Optional[str] = None,
+    data_prisao: Optional[date] = None,
+    tamanho_lote: int = 500,
+) -> Iterator[dict]:
+    """
+    Percorre TODOS os presos que casam com os filtros, em lotes de
+    `tamanho_lote` por (nome_completo, id), para o relatório em streaming.
+    Cada lote é uma página por cursor (keyset): a memória fica limitada a
+    um lote e nenhum cursor fica aberto no banco entre um lote e outro.
+    """
+    apos = None
+    while True:
+        consulta = consulta_presos(
+            db, nome, status_processual, data_prisao, limit=tamanho_lote, apos=apos
+        )
+        # Só a ordem do keyset desde o primeiro lote (sem a relevância do nome)
+        consulta = paginacao.aplicar_cursor(consulta.order_by(None), "presos", None)
+        lote = _completar(db, novos_presos(db.execute(consulta)))
+        yield from lote
+        if len(lote) < tamanho_lote:
+            return
+        ultimo = lote[-1]
+        apos = tuple(ultimo[coluna.key] for coluna in paginacao.COLUNAS_POR_LISTAGEM["presos"])
@@ -0,0 +1,78 @@
+"""
+Limitação de taxa em memória (token bucket) por chave.
+
+Cada chave (CPF, IP...) tem um balde com `capacidade` fichas que se
+recarrega continuamente a `capacidade / janela_segundos` fichas por
+segundo. Cada tentativa consome uma ficha; sem fichas, a tentativa é
+recusada e o chamador recebe quantos segundos faltam para a próxima.
+
+O estado é por processo: em várias instâncias (serverless) o limite vale
+por instância, o que ainda basta para proteger a CPU de cada uma.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+# Quantos proxies confiáveis ficam na frente da aplicação, cada um
+# acrescentando o IP de quem o chamou ao fim de X-Forwarded-For.
+# 0 (padrão): conexão direta, o header é ignorado (o cliente escolhe o valor).
+PROXIES_CONFIAVEIS = int(os.getenv("PROXIES_CONFIAVEIS", "0"))
+
+
+class LimitadorTaxa:
+    def __init__(self, capacidade: int, janela_segundos: float, max_chaves: int = 10000):
+        self.capacidade = float(capacidade)
+        self.taxa = self.capacidade / janela_segundos
+        self.max_chaves = max_chaves
+        self._baldes: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, chave: str, fichas: float = 1.0) -> Optional[float]:
+        """
+        Tenta consumir `fichas` do balde da chave. Retorna None se passou,
+        ou os segundos de espera sugeridos (Retry-After) se foi recusada.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            disponivel, atualizado_em = self._baldes.get(chave, (self.capacidade, agora))
+            disponivel = min(self.capacidade, disponivel + (agora - atualizado_em) * self.taxa)
+            if disponivel < fichas:
+                self._baldes[chave] = (disponivel, agora)
+                return (fichas - disponivel) / self.taxa
+            self._baldes[chave] = (disponivel - fichas, agora)
+            if len(self._baldes) > self.max_chaves:
+                self._descartar_cheios(agora)
+        return None
+
+    def _descartar_cheios(self, agora: float):
+        # Baldes que já se recarregaram por completo equivalem a chaves novas
+        cheios = [
+            chave
+            for chave, (disponivel, atualizado_em) in self._baldes.items()
+            if disponivel + (agora - atualizado_em) * self.taxa >= self.capacidade
+        ]
+        for chave in cheios:
+            del self._baldes[chave]
+        # Ainda acima do limite (ataque com muitas chaves): descarta as mais antigas
+        excesso = len(self._baldes) - self.max_chaves
+        if excesso > 0:
+            for chave in list(self._baldes)[:excesso]:
+                del self._baldes[chave]
+
+
+def ip_do_cliente(request) -> str:
+    """
+    IP de origem da requisição. Sem PROXIES_CONFIAVEIS é o IP da conexão.
+    Com N proxies confiáveis, é o N-ésimo item de X-Forwarded-For contando
+    da direita: os itens à esquerda dele vieram do cliente e não valem como
+    chave de limite (bastaria mandar um valor novo a cada tentativa).
+    """
+    direto = request.client.host if request.client else "desconhecido"
+    if PROXIES_CONFIAVEIS <= 0:
+        return direto
+    saltos = [item.strip() for item in request.headers.get("x-forwarded-for", "").split(",") if item.strip()]
+    if len(saltos) < PROXIES_CONFIAVEIS:
+        # Chegou por fora da cadeia de proxies esperada
+        return direto
+    return saltos[-PROXIES_CONFIAVEIS]
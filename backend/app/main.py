@@ -1,34 +1,81 @@
 from datetime import date
+import io
+import json
 import logging
 import os
 import secrets
-from . import crud, models, schemas
-from .database import SessionLocal, engine, get_db
-from fastapi import FastAPI, Depends, HTTPException, status, Query, Request, Response
+from . import (
+    alertas,
+    busca,
+    cache_usuarios,
+    crud,
+    crud_async,
+    exportacao,
+    importacao,
+    leitura,
+    metricas,
+    models,
+    paginacao,
+    perfil_consultas,
+    respostas,
+    schemas,
+    sincronizacao,
+    versoes,
+)
+from .cache_usuarios import UsuarioAutenticado
+from .compressao import COMPRESSAO_HABILITADA, CompressaoMiddleware
+from .database import SessionLocal, async_engine, engine, estatisticas_pool, get_async_db, get_db
+from fastapi import FastAPI, Depends, File, Header, HTTPException, status, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 from pydantic import BaseModel
-from datetime import timedelta, datetime, timezone
-from .security import create_access_token, verify_password, ACCESS_TOKEN_EXPIRE_MINUTES, decode_access_token
+from datetime import timedelta, datetime
+from .security import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    SenhaSobrecarregadaError,
+    create_access_token,
+    decode_access_token,
+    metricas_senhas,
+    verify_password_async,
+)
+from .limites import LimitadorTaxa, ip_do_cliente
 from apscheduler.schedulers.background import BackgroundScheduler
-from .integracoes import consultar_processo_externo, consultar_cpf_externo
+from .integracoes import (
+    consultar_cpf_externo,
+    consultar_processo_externo,
+    consultar_processos_em_lote,
+    metricas_cache,
+)
 from .notifications import send_email_alerts
 
 # Esta linha é crucial! Ela cria as tabelas no seu banco de dados
 # com base no que definimos em models.py
 models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Sistema de Controle de Presos")
+# Detecta os índices de busca por nome (pg_trgm no PostgreSQL, FTS5 no SQLite)
+busca.configurar_busca(engine)
+# Contagem/duração das consultas e situação dos pools para o /metrics
+metricas.configurar_metricas(engine, async_engine)
+# Perfil de consultas por requisição / detector de N+1 (PERFIL_CONSULTAS)
+perfil_consultas.configurar_perfil(engine, async_engine)
+
+# JSONRapido: json.dumps trocado pelo encoder do pydantic-core em todas as respostas
+app = FastAPI(title="Sistema de Controle de Presos", default_response_class=respostas.JSONRapido)
 logger = logging.getLogger(__name__)
 AUTH_COOKIE_NAME = "access_token"
 CSRF_COOKIE_NAME = "csrf_token"
 IS_PRODUCTION = os.getenv("APP_ENV", os.getenv("ENVIRONMENT", "development")).lower() in {"production", "prod"}
 COOKIE_SAMESITE = "none" if IS_PRODUCTION else "lax"
 
+# Tentativas de login por janela (token bucket), por CPF e por IP
+LOGIN_JANELA_SEGUNDOS = float(os.getenv("LOGIN_JANELA_SEGUNDOS", "60"))
+limite_login_cpf = LimitadorTaxa(int(os.getenv("LOGIN_TENTATIVAS_POR_CPF", "5")), LOGIN_JANELA_SEGUNDOS)
+limite_login_ip = LimitadorTaxa(int(os.getenv("LOGIN_TENTATIVAS_POR_IP", "20")), LOGIN_JANELA_SEGUNDOS)
+
 
 def _validar_cron_secret(request: Request):
     cron_secret = os.getenv("CRON_SECRET")
@@ -53,6 +100,18 @@ def _validar_cron_secret(request: Request):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Não autorizado para execução do job.")
 
 
+def _cabecalhos_etag(etag: str) -> dict:
+    # private: a resposta depende do usuário; no-cache: sempre revalidar
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def _nao_modificado(etag: str, if_none_match: Optional[str]) -> Optional[Response]:
+    """304 se o cliente já tem esta versão (If-None-Match), senão None."""
+    if versoes.confere_if_none_match(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_cabecalhos_etag(etag))
+    return None
+
+
 def _bootstrap_admin_if_configured():
     auto_bootstrap = os.getenv("AUTO_BOOTSTRAP_ADMIN", "false").lower() in {"1", "true", "yes", "on"}
     if not auto_bootstrap:
@@ -129,12 +188,20 @@ app.add_middleware(
     allow_credentials=True,    # Permite cookies/tokens (autenticação)
     allow_methods=["*"],       # Permite todos os métodos (GET, POST, etc)
     allow_headers=["*"],       # Permite todos os cabeçalhos (como 'Authorization')
+    # Headers de paginação e de versão que o frontend lê
+    expose_headers=["X-Total-Count", "X-Week-Count", "X-Next-Cursor", "ETag"],
 )
 # --- FIM DA CONFIGURAÇÃO DO CORS ---
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token", auto_error=False)
 
 
+@app.exception_handler(SenhaSobrecarregadaError)
+async def senha_sobrecarregada_handler(request: Request, exc: SenhaSobrecarregadaError):
+    # Fila do bcrypt cheia: melhor recusar rápido do que travar a API inteira
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
 @app.get("/", include_in_schema=False)
 def root_redirect_to_docs():
     return RedirectResponse(url="/docs")
@@ -166,13 +233,27 @@ async def csrf_protection_middleware(request: Request, call_next):
         response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
     return response
 
+
+if perfil_consultas.PERFIL_CONSULTAS != "desligado":
+    app.add_middleware(perfil_consultas.PerfilConsultasMiddleware)
+
+# Por último = mais externo: comprime a resposta já com todos os headers
+if COMPRESSAO_HABILITADA:
+    app.add_middleware(CompressaoMiddleware)
+# ...exceto pelas métricas, que medem a requisição inteira (compressão inclusa)
+if metricas.METRICAS_HABILITADAS:
+    app.add_middleware(metricas.MetricasMiddleware)
+
+
 async def get_current_user(
     request: Request,
     token: Optional[str] = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-):
+) -> UsuarioAutenticado:
     """
     Dependência para obter o usuário logado a partir do token.
+    Retorna um retrato do usuário (sem o hash da senha) vindo do cache;
+    rotas que alteram o próprio usuário carregam o registro com crud.get_user.
     """
     access_token = token
     if not access_token:
@@ -195,20 +276,26 @@ async def get_current_user(
             detail="Token inválido",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = crud.get_user_by_cpf(db, cpf=cpf)
+    # Caminho quente: o usuário costuma estar no cache e a rota não toca em `users`
+    user = cache_usuarios.obter(cpf)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuário não encontrado",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        geracao = cache_usuarios.geracao_atual()
+        db_user = crud.get_user_by_cpf(db, cpf=cpf)
+        if db_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Usuário não encontrado",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user = UsuarioAutenticado.de_usuario(db_user)
+        cache_usuarios.guardar(user, geracao)
     if not user.is_active:
          raise HTTPException(status_code=400, detail="Usuário inativo")
     return user
 
 # --- 1. ADICIONE ESTA NOVA FUNÇÃO (dependência de admin) ---
 # (Coloque-a logo após a função 'get_current_user')
-def get_current_admin_user(current_user: models.User = Depends(get_current_user)):
+def get_current_admin_user(current_user: UsuarioAutenticado = Depends(get_current_user)):
     """
     Verifica se o usuário logado é um admin.
     Se não for, levanta um erro 403 (Forbidden).
@@ -224,7 +311,7 @@ def get_current_admin_user(current_user: models.User = Depends(get_current_user)
 def create_new_user(
     user: schemas.UserCreate, 
     db: Session = Depends(get_db),
-    admin_user: models.User = Depends(get_current_admin_user) # <-- NOVA LINHA
+    admin_user: UsuarioAutenticado = Depends(get_current_admin_user) # <-- NOVA LINHA
 ):
     """
     Cria um novo usuário. (Protegido - Apenas Admins)
@@ -235,20 +322,35 @@ def create_new_user(
     return crud.create_user(db=db, user=user)
 
 @app.post("/api/token", response_model=schemas.Token, tags=["Autenticação"])
-def login_for_access_token(
+async def login_for_access_token(
+    request: Request,
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Endpoint de Login. Recebe CPF (no campo 'username') e Senha.
     Retorna um Token JWT.
     """
+    # Controle de admissão antes do bcrypt: limita tentativas por IP e por CPF
+    for limitador, chave in (
+        (limite_login_ip, ip_do_cliente(request)),
+        (limite_login_cpf, form_data.username),
+    ):
+        espera = limitador.consumir(chave)
+        if espera is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Muitas tentativas de login. Aguarde e tente novamente.",
+                headers={"Retry-After": str(max(1, round(espera)))},
+            )
+
     # O form_data usa 'username', vamos usá-lo para o nosso 'cpf'
-    user = crud.get_user_by_cpf(db, cpf=form_data.username)
+    user = await crud_async.get_user_by_cpf(db, cpf=form_data.username)
     
     # Verifica se o usuário existe e se a senha está correta
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # (o bcrypt roda no pool dedicado, fora do event loop)
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="CPF ou senha incorretos",
@@ -313,7 +415,7 @@ def get_csrf_token(request: Request, response: Response):
 def create_preso_e_processo(
     cadastro: schemas.PresoCadastroCompleto,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user) # <-- ROTA PROTEGIDA
+    current_user: UsuarioAutenticado = Depends(get_current_user) # <-- ROTA PROTEGIDA
 ):
     """
     Cria um novo preso e seus processos iniciais.
@@ -335,7 +437,7 @@ def create_preso_e_processo(
 def create_preso(
     preso: schemas.PresoCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     # Verifica se o CPF já existe
     if preso.cpf:
@@ -344,32 +446,169 @@ def create_preso(
             raise HTTPException(status_code=400, detail="CPF já cadastrado")
     return crud.create_preso(db=db, preso=preso)
 
-@app.get("/api/presos/search/", response_model=List[schemas.PresoDetalhe], tags=["Presos"])
-def search_presos_endpoint( # Mudei o nome da função para evitar conflito
+@app.post("/api/importacao/presos", tags=["Presos"])
+def importar_presos_endpoint(
+    arquivo: UploadFile = File(...),
+    formato: Optional[Literal["csv", "ndjson"]] = Query(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user), # Protegido
+    current_admin: UsuarioAutenticado = Depends(get_current_admin_user)
+):
+    """
+    Importação em massa (CSV ou NDJSON, uma linha por processo). Linhas com
+    erro vão para o relatório e não impedem a gravação das demais.
+    O formato é deduzido da extensão do arquivo quando não informado.
+    """
+    formato = formato or importacao.detectar_formato(arquivo.filename, arquivo.content_type)
+    if formato is None:
+        raise HTTPException(status_code=400, detail="Formato não reconhecido. Informe formato=csv ou formato=ndjson.")
+
+    # Lê o upload linha a linha (o arquivo já está em disco/memória temporária)
+    linhas = io.TextIOWrapper(arquivo.file, encoding="utf-8-sig", newline="")
+    try:
+        relatorio = importacao.importar(db, linhas, formato)
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="O arquivo deve estar em UTF-8.")
+    finally:
+        linhas.detach()
+    logger.info(
+        "Importação por %s: %s linhas, %s presos criados, %s processos criados, %s erros",
+        current_admin.cpf,
+        relatorio.linhas,
+        relatorio.presos_criados,
+        relatorio.processos_criados,
+        relatorio.linhas_com_erro,
+    )
+    return relatorio.como_dict()
+
+@app.get(
+    "/api/presos/search/",
+    response_model=Union[List[schemas.PresoDetalhe], schemas.PresoResumoPagina],
+    tags=["Presos"],
+)
+async def search_presos_endpoint( # Mudei o nome da função para evitar conflito
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user), # Protegido
     # --- NOVOS PARÂMETROS DE CONSULTA ---
     nome: Optional[str] = None,
     status_processual: Optional[str] = None,
-    data_prisao: Optional[date] = None
+    data_prisao: Optional[date] = None,
+    modo: Literal["completo", "resumo"] = "completo",
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
 ):
-    presos = crud.search_presos(
-        db=db,
+    """
+    `modo=completo` (padrão): lista de presos com processos e eventos.
+    `modo=resumo`: página com só as colunas da tabela do dashboard, o
+    primeiro processo e agregados por preso, mais o `total` para a paginação.
+
+    Paginação por cursor: passe o `next_cursor` da página anterior (no corpo
+    em `modo=resumo`, no header X-Next-Cursor no modo completo). Com `nome`
+    a primeira página vem por relevância e não gera cursor; use `skip`.
+
+    No modo completo a resposta tem ETag (ids e versões dos presos da
+    página); com If-None-Match igual devolve 304 sem carregar processos e
+    eventos. O resumo não tem ETag: `proximo_evento` depende do relógio.
+    """
+    apos = paginacao.ler_cursor("presos", cursor, skip)
+    gera_cursor = not nome or apos is not None
+
+    if modo == "resumo":
+        total, linhas = await crud_async.resumo_presos(
+            db=db,
+            nome=nome,
+            status_processual=status_processual,
+            data_prisao=data_prisao,
+            skip=skip,
+            limit=limit,
+            apos=apos,
+        )
+        return respostas.json_rapido(
+            schemas.PresoResumoPagina,
+            {
+                "total": total,
+                "skip": skip,
+                "limit": limit,
+                "itens": [crud.montar_resumo_preso(linha) for linha in linhas],
+                "next_cursor": paginacao.proximo_cursor("presos", linhas, limit) if gera_cursor else None,
+            },
+        )
+
+    filtros = dict(
         nome=nome,
         status_processual=status_processual,
-        data_prisao=data_prisao
+        data_prisao=data_prisao,
+        skip=skip,
+        limit=limit,
+        apos=apos,
+    )
+    if if_none_match:
+        # Só ids e versões: se o cliente já tem esta página, nem carrega o resto
+        pares = await crud_async.versoes_pagina_presos(db=db, **filtros)
+        nao_modificado = _nao_modificado(versoes.etag_lista("presos", pares), if_none_match)
+        if nao_modificado:
+            return nao_modificado
+
+    presos = await crud_async.presos_detalhados(db=db, **filtros)
+    proximo = paginacao.proximo_cursor("presos", presos, limit) if gera_cursor else None
+    if proximo:
+        response.headers["X-Next-Cursor"] = proximo
+    response.headers.update(
+        _cabecalhos_etag(versoes.etag_lista("presos", [(p["id"], p["versao"]) for p in presos]))
     )
-    return presos
+    return respostas.json_rapido(List[schemas.PresoDetalhe], presos, headers=response.headers)
+
+def _stream_relatorio_completo(formato, nome, status_processual, data_prisao):
+    """
+    Gera o relatório em streaming. Usa uma sessão própria porque o corpo é
+    enviado depois que o endpoint retorna (a sessão do Depends já foi fechada).
+    """
+    db: Session = SessionLocal()
+    try:
+        presos = leitura.iterar_presos(
+            db=db,
+            nome=nome,
+            status_processual=status_processual,
+            data_prisao=data_prisao,
+        )
+        if formato == "csv":
+            yield from exportacao.gerar_csv(presos)
+        else:
+            yield from exportacao.gerar_ndjson(presos)
+    finally:
+        db.close()
+
 
 @app.get("/api/relatorios/completo", response_model=List[schemas.PresoDetalhe], tags=["Relatórios"])
 def get_relatorio_completo(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
     nome: Optional[str] = None,
     status_processual: Optional[str] = None,
     data_prisao: Optional[date] = None,
+    formato: Literal["json", "ndjson", "csv"] = "json",
 ):
-    return crud.search_presos(
+    """
+    Relatório completo (presos + processos + eventos).
+    `formato=json` mantém a resposta em array (limitada a 10000 presos);
+    `ndjson` e `csv` são enviados em streaming, sem limite de registros.
+    """
+    if formato == "ndjson":
+        return StreamingResponse(
+            _stream_relatorio_completo(formato, nome, status_processual, data_prisao),
+            media_type="application/x-ndjson",
+        )
+    if formato == "csv":
+        return StreamingResponse(
+            _stream_relatorio_completo(formato, nome, status_processual, data_prisao),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="relatorio_completo.csv"'},
+        )
+
+    presos = leitura.presos_detalhados(
         db=db,
         nome=nome,
         status_processual=status_processual,
@@ -377,18 +616,37 @@ def get_relatorio_completo(
         skip=0,
         limit=10000,
     )
+    return respostas.json_rapido(List[schemas.PresoDetalhe], presos)
 
 @app.get("/api/presos/{preso_id}", response_model=schemas.PresoDetalhe, tags=["Presos"])
-def read_preso_details(
+async def read_preso_details(
     preso_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None),
 ):
+    """
+    Ficha completa do preso, com ETag. `presos.versao` muda com qualquer
+    alteração no preso, nos processos ou nos eventos (ver app/versoes.py),
+    então o If-None-Match é conferido sem carregar os filhos.
+    """
+    # A versão é lida antes dos dados: se algo mudar no meio, o ETag fica
+    # mais velho que o corpo e a próxima revalidação traz tudo de novo
+    versao = await crud_async.versao_preso(db, preso_id=preso_id)
+    if versao is None:
+        raise HTTPException(status_code=404, detail="Preso não encontrado")
+    etag = versoes.etag("preso", preso_id, versao)
+    nao_modificado = _nao_modificado(etag, if_none_match)
+    if nao_modificado:
+        return nao_modificado
+
     # Critério de sucesso: "...vê todas as informações principais"
-    db_preso = crud.get_preso(db, preso_id=preso_id)
+    db_preso = await crud_async.preso_detalhado(db, preso_id=preso_id)
     if db_preso is None:
         raise HTTPException(status_code=404, detail="Preso não encontrado")
-    return db_preso
+    response.headers.update(_cabecalhos_etag(etag))
+    return respostas.json_rapido(schemas.PresoDetalhe, db_preso, headers=response.headers)
 
 # --- Endpoints de Processo ---
 
@@ -397,7 +655,7 @@ def create_processo_for_preso(
     preso_id: int,
     processo: schemas.ProcessoCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     # (Poderia checar se o preso_id existe primeiro, mas o FK do banco já vai barrar)
     return crud.create_processo(db=db, processo=processo, preso_id=preso_id)
@@ -409,86 +667,90 @@ def create_evento_for_processo(
     processo_id: int, 
     evento: schemas.EventoCreate, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user) # <-- ADICIONE A PROTEÇÃO
+    current_user: UsuarioAutenticado = Depends(get_current_user) # <-- ADICIONE A PROTEÇÃO
 ):
     # (Opcional: checar se o usuário tem permissão para este processo)
-    novo_evento = crud.create_evento(db=db, evento=evento, processo_id=processo_id)
-    _sincronizar_alertas_status(db)
-    db.refresh(novo_evento)
-    return novo_evento
+    return crud.create_evento(db=db, evento=evento, processo_id=processo_id)
 
 @app.put("/api/eventos/{evento_id}", response_model=schemas.Evento, tags=["Eventos"])
 def update_evento(
     evento_id: int, 
     evento_update: schemas.EventoCreate, 
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+    if_match: Optional[str] = Header(None),
 ):
-    db_evento = crud.update_evento(db=db, evento_id=evento_id, evento_update=evento_update)
+    """Com If-Match (ETag do evento), responde 412 se ele mudou nesse meio tempo."""
+    db_evento = crud.update_evento(
+        db=db,
+        evento_id=evento_id,
+        evento_update=evento_update,
+        versao_esperada=versoes.versao_do_if_match(if_match, "evento", evento_id),
+    )
     if not db_evento:
         raise HTTPException(status_code=404, detail="Evento não encontrado")
-    _sincronizar_alertas_status(db)
+    response.headers["ETag"] = versoes.etag("evento", db_evento.id, db_evento.versao)
     return db_evento
 
 @app.delete("/api/eventos/{evento_id}", status_code=204, tags=["Eventos"])
 def delete_evento(
     evento_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     db_evento = crud.delete_evento(db=db, evento_id=evento_id)
     if not db_evento:
         raise HTTPException(status_code=404, detail="Evento não encontrado")
-    _sincronizar_alertas_status(db)
     return None
 
+@app.post("/api/eventos/lote", response_model=schemas.EventoLoteResultado, tags=["Eventos"])
+def aplicar_lote_eventos(
+    lote: schemas.EventoLoteRequest,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user)
+):
+    """
+    Cria, edita e altera o status de vários eventos de uma vez, numa única
+    transação: ou tudo é gravado, ou nada. Ordem de aplicação: criações,
+    edições e, por último, as mudanças de status.
+    """
+    if not (lote.criar or lote.atualizar or lote.status):
+        raise HTTPException(status_code=400, detail="Nenhuma operação informada.")
+    try:
+        resultado, faltando = crud.aplicar_lote_eventos(db, lote)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Dados inválidos ou conflitantes no lote de eventos.")
+    if faltando:
+        raise HTTPException(
+            status_code=404,
+            detail={"mensagem": "Processos ou eventos não encontrados. Nada foi gravado.", **faltando},
+        )
+    return resultado
+
 # --- Endpoint de Alerta (O MVP do seu sistema de alertas) ---
 # (A lógica de background ainda não está aqui, mas o endpoint de consulta está)
 
 @app.get("/api/alertas/proximos", response_model=List[schemas.Evento], tags=["Alertas"])
-def get_proximos_alertas(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+async def get_proximos_alertas(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     """
     Retorna todos os eventos com status 'pendente' ou 'disparado'
     que ainda não aconteceram, ordenados pelo mais próximo.
     """
-    _sincronizar_alertas_status(db)
-    agora = datetime.now(timezone.utc)
-    eventos = db.query(models.Evento).filter(
-        models.Evento.alerta_status.in_([models.AlertaStatusEnum.pendente, models.AlertaStatusEnum.disparado])
-    ).order_by(models.Evento.data_evento.asc()).limit(50).all()
-    
-    return eventos
-
-# --- LÓGICA DO JOB AGENDADO (ROBÔ) ---
-
-
-def _sincronizar_alertas_status(db: Session) -> list[models.Evento]:
-    """
-    Atualiza eventos pendentes para 'disparado' quando estiverem
-    dentro da janela de 7 dias.
-    """
-    agora = datetime.now(timezone.utc)
-    limite_dias = agora + timedelta(days=7)
+    eventos = await crud_async.listar_proximos_alertas(db, limit=50)
 
-    eventos_para_alertar = db.query(models.Evento).options(
-        joinedload(models.Evento.processo).joinedload(models.Processo.preso)
-    ).filter(
-        models.Evento.data_evento <= limite_dias,
-        models.Evento.alerta_status == models.AlertaStatusEnum.pendente
-    ).all()
+    return respostas.json_rapido(
+        List[schemas.Evento], alertas.aplicar_status_efetivo(eventos, alertas.limite_janela())
+    )
 
-    if not eventos_para_alertar:
-        return []
+# --- LÓGICA DO JOB AGENDADO (ROBÔ) ---
 
-    for evento in eventos_para_alertar:
-        evento.alerta_status = models.AlertaStatusEnum.disparado
-
-    db.commit()
-    return eventos_para_alertar
 
+@metricas.cronometrar_job("alertas")
 def check_alertas_job():
     """
     Função que o Scheduler rodará.
@@ -513,15 +775,16 @@ def check_alertas_job():
 
     except Exception:
         logger.exception("Erro no job de alertas")
+        metricas.JOB_FALHAS.inc(job="alertas")
         db.rollback()
     finally:
         db.close()
 
 
 def executar_job_alertas(db: Session) -> dict:
-    eventos_para_alertar = _sincronizar_alertas_status(db)
+    ids_disparados = alertas.disparar_alertas_pendentes(db)
 
-    if not eventos_para_alertar:
+    if not ids_disparados:
         return {
             "alertas_disparados": 0,
             "emails_enviados": 0,
@@ -534,9 +797,15 @@ def executar_job_alertas(db: Session) -> dict:
     email_status = "nao_configurado_ou_sem_destinatarios"
     emails_enviados = 0
     if destinatarios:
-        total_alertas = len(eventos_para_alertar)
+        total_alertas = len(ids_disparados)
+        eventos_preview = db.query(models.Evento).options(
+            joinedload(models.Evento.processo).joinedload(models.Processo.preso)
+        ).filter(
+            models.Evento.id.in_(ids_disparados[:20])
+        ).order_by(models.Evento.data_evento.asc()).all()
+
         alertas_preview = []
-        for evento in eventos_para_alertar[:20]:
+        for evento in eventos_preview:
             numero_processo = evento.processo.numero_processo if evento.processo else "-"
             nome_preso = "-"
             if evento.processo and evento.processo.preso:
@@ -569,7 +838,7 @@ def executar_job_alertas(db: Session) -> dict:
             email_status = "falha_envio"
 
     return {
-        "alertas_disparados": len(eventos_para_alertar),
+        "alertas_disparados": len(ids_disparados),
         "emails_enviados": emails_enviados,
         "email_status": email_status,
     }
@@ -596,6 +865,40 @@ def executar_job_alertas_endpoint(
         raise HTTPException(status_code=500, detail="Falha ao executar job de alertas.")
 
 
+@metricas.cronometrar_job("sincronizacao_processos")
+def sincronizar_processos_job():
+    """Job agendado: sincroniza o status dos processos com DataJud/PJe."""
+    logger.info("Rodando sincronização de processos com as fontes externas")
+    db: Session = SessionLocal()
+    try:
+        resultado = sincronizacao.sincronizar_processos(db)
+        logger.info("Sincronização de processos: %s", resultado)
+    except Exception:
+        logger.exception("Erro na sincronização de processos")
+        metricas.JOB_FALHAS.inc(job="sincronizacao_processos")
+    finally:
+        db.close()
+
+
+@app.post("/api/jobs/sincronizar-processos", tags=["Jobs"])
+def sincronizar_processos_endpoint(
+    request: Request,
+    tempo_maximo: float = Query(default=50, ge=1, le=3600),
+    db: Session = Depends(get_db),
+):
+    """
+    Sincroniza processos por até `tempo_maximo` segundos (para cron externo,
+    ex.: Vercel). Se não terminar, a próxima chamada continua de onde parou.
+    """
+    _validar_cron_secret(request)
+
+    try:
+        return sincronizacao.sincronizar_processos(db, tempo_maximo=tempo_maximo)
+    except Exception:
+        logger.exception("Erro ao executar sincronização de processos por endpoint")
+        raise HTTPException(status_code=500, detail="Falha ao sincronizar processos.")
+
+
 @app.on_event("startup")
 def start_scheduler():
     """
@@ -614,6 +917,17 @@ def start_scheduler():
     
     # (Opcional: Rodar o job agora mesmo para teste)
     scheduler.add_job(check_alertas_job, 'date', run_date=datetime.now() + timedelta(seconds=5))
+
+    # Sincronização com DataJud/PJe de madrugada (só se alguma fonte estiver configurada)
+    if sincronizacao.fontes_configuradas():
+        scheduler.add_job(
+            sincronizar_processos_job,
+            'cron',
+            hour=int(os.getenv("SINCRONIZACAO_HORA", "2")),
+            minute=0,
+            max_instances=1,
+            coalesce=True,
+        )
     
     scheduler.start()
     print("Scheduler de Alertas iniciado. Job rodará diariamente às 08:00.")
@@ -623,47 +937,38 @@ def start_scheduler():
 
 # --- NOVO ENDPOINT DE ALERTAS ATIVOS ---
 @app.get("/api/alertas/ativos", response_model=List[schemas.EventoAlerta], tags=["Alertas"])
-def get_alertas_ativos(
+async def get_alertas_ativos(
     response: Response,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user), # Protegido
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user), # Protegido
     skip: int = Query(default=0, ge=0, le=100000),
-    limit: Optional[int] = Query(default=None, ge=1, le=100)
+    limit: Optional[int] = Query(default=None, ge=1, le=100),
+    cursor: Optional[str] = None,
 ):
     """
     Retorna todos os eventos que foram "disparados" e ainda não venceram.
+    Com `limit`, a próxima página vem pelo cursor do header X-Next-Cursor.
     """
-    _sincronizar_alertas_status(db)
-    agora = datetime.now(timezone.utc)
-    
-    base_query = db.query(models.Evento).filter(
-        models.Evento.alerta_status == models.AlertaStatusEnum.disparado
-    )
+    apos = paginacao.ler_cursor("alertas", cursor, skip)
+    limite_semana = alertas.limite_janela()
 
-    total_alertas = base_query.count()
-    limite_semana = agora + timedelta(days=7)
-    total_semana = base_query.filter(models.Evento.data_evento <= limite_semana).count()
+    # Totais vêm do cache de contadores (invalidado a cada escrita em eventos)
+    total_alertas, total_semana = await alertas.contar_alertas_async(db)
 
     response.headers["X-Total-Count"] = str(total_alertas)
     response.headers["X-Week-Count"] = str(total_semana)
 
-    query = db.query(models.Evento).options(
-        joinedload(models.Evento.processo).joinedload(models.Processo.preso)
-    ).filter(
-        models.Evento.alerta_status == models.AlertaStatusEnum.disparado
-    ).order_by(
-        models.Evento.data_evento.asc()
+    eventos = await crud_async.listar_alertas_ativos(
+        db, limite_semana, skip=skip, limit=limit, apos=apos
+    )
+    proximo = paginacao.proximo_cursor("alertas", eventos, limit)
+    if proximo:
+        response.headers["X-Next-Cursor"] = proximo
+    return respostas.json_rapido(
+        List[schemas.EventoAlerta],
+        alertas.aplicar_status_efetivo(eventos, limite_semana),
+        headers=response.headers,
     )
-
-    if skip:
-        query = query.offset(skip)
-    
-    # --- 2. APLIQUE O LIMITE SE ELE FOR FORNECIDO ---
-    if limit is not None:
-        query = query.limit(limit)
-    
-    alertas = query.all()
-    return alertas
 
 # --- Novo Schema para o request ---
 class EventoStatusUpdate(BaseModel):
@@ -674,11 +979,14 @@ class EventoStatusUpdate(BaseModel):
 def update_evento_status(
     evento_id: int,
     status_update: EventoStatusUpdate,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user) # Protegido
+    current_user: UsuarioAutenticado = Depends(get_current_user), # Protegido
+    if_match: Optional[str] = Header(None),
 ):
     """
     Atualiza o status de um evento (ex: de 'disparado' para 'concluido').
+    Aceita If-Match como o PUT do evento.
     """
     db_evento = db.query(models.Evento).filter(models.Evento.id == evento_id).first()
     
@@ -686,10 +994,14 @@ def update_evento_status(
         raise HTTPException(status_code=404, detail="Evento não encontrado")
     
     # (Opcional: verificar se o 'current_user' tem permissão para este evento)
+    versoes.exigir_versao(
+        db, models.Evento, evento_id, versoes.versao_do_if_match(if_match, "evento", evento_id)
+    )
 
     db_evento.alerta_status = status_update.status
     db.commit()
     db.refresh(db_evento)
+    response.headers["ETag"] = versoes.etag("evento", db_evento.id, db_evento.versao)
     return db_evento
 
 # --- NOVOS ENDPOINTS DE UPDATE (PUT) E DELETE ---
@@ -698,13 +1010,24 @@ def update_evento_status(
 def update_preso_endpoint(
     preso_id: int,
     preso_update: schemas.PresoCreate,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user) # Protegido
+    current_user: UsuarioAutenticado = Depends(get_current_user), # Protegido
+    if_match: Optional[str] = Header(None),
 ):
-    """Atualiza os dados de um preso."""
-    db_preso = crud.update_preso(db, preso_id=preso_id, preso_update=preso_update)
+    """
+    Atualiza os dados de um preso. Com If-Match (o ETag de GET
+    /api/presos/{id}), responde 412 se a ficha mudou desde a leitura.
+    """
+    db_preso = crud.update_preso(
+        db,
+        preso_id=preso_id,
+        preso_update=preso_update,
+        versao_esperada=versoes.versao_do_if_match(if_match, "preso", preso_id),
+    )
     if db_preso is None:
         raise HTTPException(status_code=404, detail="Preso não encontrado")
+    response.headers["ETag"] = versoes.etag("preso", db_preso.id, db_preso.versao)
     return db_preso
 
 
@@ -712,13 +1035,21 @@ def update_preso_endpoint(
 def update_processo_endpoint(
     processo_id: int,
     processo_update: schemas.ProcessoCreate,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user) # Protegido
+    current_user: UsuarioAutenticado = Depends(get_current_user), # Protegido
+    if_match: Optional[str] = Header(None),
 ):
-    """Atualiza os dados de um processo."""
-    db_processo = crud.update_processo(db, processo_id=processo_id, processo_update=processo_update)
+    """Atualiza os dados de um processo (If-Match opcional, como no preso)."""
+    db_processo = crud.update_processo(
+        db,
+        processo_id=processo_id,
+        processo_update=processo_update,
+        versao_esperada=versoes.versao_do_if_match(if_match, "processo", processo_id),
+    )
     if db_processo is None:
         raise HTTPException(status_code=404, detail="Processo não encontrado")
+    response.headers["ETag"] = versoes.etag("processo", db_processo.id, db_processo.versao)
     return db_processo
 
 
@@ -726,7 +1057,7 @@ def update_processo_endpoint(
 def delete_preso_endpoint(
     preso_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user) # Protegido
+    current_user: UsuarioAutenticado = Depends(get_current_user) # Protegido
 ):
     """Deleta um preso e todos os seus dados associados."""
     db_preso = crud.delete_preso(db, preso_id=preso_id)
@@ -736,7 +1067,7 @@ def delete_preso_endpoint(
 
 @app.get("/api/users/me", response_model=schemas.User, tags=["Usuário"])
 def read_users_me(
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     """Retorna os dados do usuário logado."""
     return current_user
@@ -745,7 +1076,7 @@ def read_users_me(
 @app.get("/api/users/me/notificacoes", response_model=schemas.UserNotificationPreference, tags=["Usuário"])
 def read_users_me_notifications(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     """Retorna preferências de notificação do usuário logado."""
     pref = crud.get_user_notification_preference(db=db, user_id=current_user.id)
@@ -758,7 +1089,7 @@ def read_users_me_notifications(
 def update_users_me_notifications(
     payload: schemas.UserNotificationPreferenceUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     """Atualiza preferências de notificação do usuário logado."""
     return crud.upsert_user_notification_preference(
@@ -772,21 +1103,23 @@ def update_users_me_notifications(
 def update_users_me(
     user_in: schemas.UserUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     """Atualiza o nome e/ou email do usuário logado."""
-    return crud.update_user_profile(db=db, db_user=current_user, user_in=user_in)
+    db_user = crud.get_user(db, user_id=current_user.id)
+    return crud.update_user_profile(db=db, db_user=db_user, user_in=user_in)
 
 
 @app.put("/api/users/me/password", tags=["Usuário"])
-def change_users_me_password(
+async def change_users_me_password(
     password_data: schemas.PasswordChange,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     """Muda a senha do usuário logado."""
-    # 1. Verifica se a senha antiga está correta
-    if not verify_password(password_data.senha_antiga, current_user.hashed_password):
+    # 1. Verifica se a senha antiga está correta (o hash não fica no cache)
+    db_user = await db.get(models.User, current_user.id)
+    if not await verify_password_async(password_data.senha_antiga, db_user.hashed_password):
         raise HTTPException(status_code=400, detail="Senha antiga incorreta.")
     
     # 2. (Opcional) Verifica a força da nova senha
@@ -794,7 +1127,7 @@ def change_users_me_password(
          raise HTTPException(status_code=400, detail="Nova senha deve ter pelo menos 8 caracteres.")
     
     # 3. Atualiza a senha
-    crud.update_user_password(db=db, db_user=current_user, nova_senha=password_data.nova_senha)
+    await crud_async.update_user_password(db=db, db_user=db_user, nova_senha=password_data.nova_senha)
     return {"message": "Senha atualizada com sucesso."}
 
 # --- NOVO ENDPOINT DE LISTAR USUÁRIOS ---
@@ -803,16 +1136,22 @@ def read_users(
     response: Response,
     skip: int = Query(default=0, ge=0, le=10000),
     limit: int = Query(default=100, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    admin_user: models.User = Depends(get_current_admin_user) # Protegido
+    admin_user: UsuarioAutenticado = Depends(get_current_admin_user) # Protegido
 ):
     """
     Retorna uma lista de todos os usuários. (Apenas Admins)
+    A próxima página também pode vir pelo cursor do header X-Next-Cursor.
     """
+    apos = paginacao.ler_cursor("usuarios", cursor, skip)
     total_users = db.query(models.User).count()
     response.headers["X-Total-Count"] = str(total_users)
-    users = crud.get_users(db, skip=skip, limit=limit)
-    return users
+    users = crud.get_users(db, skip=skip, limit=limit, apos=apos)
+    proximo = paginacao.proximo_cursor("usuarios", users, limit)
+    if proximo:
+        response.headers["X-Next-Cursor"] = proximo
+    return respostas.json_rapido(List[schemas.User], users, headers=response.headers)
 
 
 # --- NOVO ENDPOINT DE RESET DE SENHA (ADMIN) ---
@@ -821,7 +1160,7 @@ def admin_reset_user_password(
     user_id: int,
     password_data: schemas.AdminPasswordReset,
     db: Session = Depends(get_db),
-    admin_user: models.User = Depends(get_current_admin_user) # Protegido
+    admin_user: UsuarioAutenticado = Depends(get_current_admin_user) # Protegido
 ):
     """
     Permite que um admin defina uma nova senha para qualquer usuário.
@@ -849,7 +1188,7 @@ def update_user_by_admin_endpoint(
     user_id: int,
     user_in: schemas.UserUpdate, # O schema só permite mudar nome, email e tema
     db: Session = Depends(get_db),
-    admin_user: models.User = Depends(get_current_admin_user) # Protegido
+    admin_user: UsuarioAutenticado = Depends(get_current_admin_user) # Protegido
 ):
     """
     Permite que um admin atualize nome, email ou tema de um usuário.
@@ -864,6 +1203,65 @@ def update_user_by_admin_endpoint(
         raise HTTPException(status_code=500, detail="Não foi possível atualizar o usuário no momento.")
 
 
+def verificar_token_metricas(request: Request):
+    """Exige `Authorization: Bearer <METRICAS_TOKEN>` (scrape do Prometheus)."""
+    auth_header = request.headers.get("Authorization", "")
+    token = auth_header[len("Bearer "):].strip() if auth_header.startswith("Bearer ") else ""
+    if not secrets.compare_digest(token, metricas.METRICAS_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de métricas inválido.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+# As métricas expõem o tráfego por rota, os status, os pools e as falhas dos
+# jobs: com METRICAS_TOKEN o /metrics exige o token; sem ele, só admins
+# logados, e em produção o endpoint nem é registrado (404).
+if metricas.METRICAS_TOKEN:
+    protecao_metricas = verificar_token_metricas
+elif IS_PRODUCTION:
+    protecao_metricas = None
+    if metricas.METRICAS_HABILITADAS:
+        logger.warning("METRICAS_TOKEN não definido em produção: GET /metrics desativado.")
+else:
+    protecao_metricas = get_current_admin_user
+
+if metricas.METRICAS_HABILITADAS and protecao_metricas is not None:
+
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(protecao_metricas)])
+    async def get_metricas():
+        """Métricas no formato do Prometheus (ver app/metricas.py)."""
+        return Response(metricas.gerar_texto(), media_type=metricas.TIPO_CONTEUDO)
+
+
+@app.get("/api/admin/pool", tags=["Diagnóstico"])
+def get_pool_stats(admin_user: UsuarioAutenticado = Depends(get_current_admin_user)):
+    """Perfil e uso atual do pool de conexões do banco. (Apenas Admins)"""
+    return estatisticas_pool()
+
+
+@app.get("/api/admin/perfil-consultas", tags=["Diagnóstico"])
+def get_perfil_consultas(admin_user: UsuarioAutenticado = Depends(get_current_admin_user)):
+    """
+    Consultas SQL das últimas requisições perfiladas (PERFIL_CONSULTAS), com
+    as formas repetidas (possível N+1) e as mais demoradas. (Apenas Admins)
+    """
+    return perfil_consultas.perfis_recentes()
+
+
+@app.get("/api/admin/senhas", tags=["Diagnóstico"])
+def get_password_pool_stats(admin_user: UsuarioAutenticado = Depends(get_current_admin_user)):
+    """Ocupação e fila do pool de bcrypt (hash/verificação de senhas). (Apenas Admins)"""
+    return metricas_senhas()
+
+
+@app.get("/api/admin/integracoes/cache", tags=["Diagnóstico"])
+def get_integration_cache_stats(admin_user: UsuarioAutenticado = Depends(get_current_admin_user)):
+    """Acertos/faltas do cache das integrações externas, por fonte. (Apenas Admins)"""
+    return metricas_cache()
+
+
 @app.post(
     "/api/integracoes/processos/consultar",
     response_model=schemas.ProcessoConsultaIntegracaoResponse,
@@ -871,13 +1269,14 @@ def update_user_by_admin_endpoint(
 )
 def consultar_processo_integracoes(
     payload: schemas.ProcessoConsultaIntegracaoRequest,
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     try:
         return consultar_processo_externo(
             numero_processo=payload.numero_processo,
             fontes=payload.fontes,
             tribunal=payload.tribunal,
+            aguardar_todas=payload.aguardar_todas,
         )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
@@ -886,6 +1285,30 @@ def consultar_processo_integracoes(
         raise HTTPException(status_code=500, detail="Falha ao consultar integração externa.")
 
 
+def _stream_consulta_lote(payload: schemas.ProcessoConsultaLoteRequest):
+    for resultado in consultar_processos_em_lote(
+        payload.numeros_processo,
+        fontes=payload.fontes,
+        tribunal=payload.tribunal,
+        aguardar_todas=payload.aguardar_todas,
+    ):
+        yield json.dumps(resultado, ensure_ascii=False, default=str) + "\n"
+
+
+@app.post("/api/integracoes/processos/consultar-lote", tags=["Integrações"])
+def consultar_processos_lote_integracoes(
+    payload: schemas.ProcessoConsultaLoteRequest,
+    current_user: UsuarioAutenticado = Depends(get_current_user)
+):
+    """
+    Consulta vários processos de uma vez. A resposta é NDJSON: uma linha
+    (mesmo formato de /api/integracoes/processos/consultar) por processo,
+    na ordem em que as consultas terminam. Números inválidos voltam com
+    o campo `erro`.
+    """
+    return StreamingResponse(_stream_consulta_lote(payload), media_type="application/x-ndjson")
+
+
 @app.post(
     "/api/integracoes/cpf/consultar",
     response_model=schemas.PessoaConsultaCPFResponse,
@@ -893,7 +1316,7 @@ def consultar_processo_integracoes(
 )
 def consultar_cpf_integracao(
     payload: schemas.PessoaConsultaCPFRequest,
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
     try:
         return consultar_cpf_externo(cpf=payload.cpf)
@@ -0,0 +1,311 @@
+"""
+Métricas da aplicação no formato texto do Prometheus (GET /metrics).
+
+Sem dependência externa: contadores, medidores e histogramas simples, em
+memória e por processo (com vários workers do gunicorn, cada um expõe as
+suas; o Prometheus soma por instância). O que é medido:
+
+- requisições HTTP: latência por método, rota (o template, ex.:
+  /api/presos/{preso_id}) e status, e quantas estão em andamento;
+- banco: quantidade e duração das consultas por engine (sync/async) e tipo
+  de comando, via eventos do SQLAlchemy, e a situação dos pools;
+- integrações externas: latência de cada chamada por fonte e resultado;
+- jobs do scheduler: duração e falhas.
+
+METRICAS_HABILITADAS=false desliga tudo (middleware, eventos e endpoint).
+Com METRICAS_TOKEN, o /metrics exige `Authorization: Bearer <token>`; sem
+ele, exige um admin logado, e em produção o endpoint fica desativado.
+"""
+import functools
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import event
+
+METRICAS_HABILITADAS = os.getenv("METRICAS_HABILITADAS", "true").lower() in {"1", "true", "yes", "on"}
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN", "").strip()
+
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+BALDES_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BALDES_BANCO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BALDES_INTEGRACOES = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BALDES_JOBS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+# Rota que não casou com nenhuma (404): um rótulo só, senão cada URL
+# inventada por um scanner viraria uma série nova
+SEM_ROTA = "(sem rota)"
+COMANDOS_SQL = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(nomes: tuple, valores: tuple, extra: str = "") -> str:
+    partes = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def _chave(self, rotulos: dict) -> tuple:
+        return tuple(rotulos[nome] for nome in self.rotulos)
+
+    def _amostras(self):
+        with self._lock:
+            return [(chave, valor) for chave, valor in self._valores.items()]
+
+    def linhas(self) -> list[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        for chave, valor in self._amostras():
+            linhas.append(f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}")
+        return linhas
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor: float = 1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+
+class Medidor(_Metrica):
+    """Gauge. Com `coletar`, os valores são lidos na hora do scrape."""
+
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, rotulos=(), coletar: Optional[Callable[[], dict]] = None):
+        super().__init__(nome, ajuda, rotulos)
+        self.coletar = coletar
+
+    def inc(self, valor: float = 1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def dec(self, valor: float = 1, **rotulos):
+        self.inc(-valor, **rotulos)
+
+    def _amostras(self):
+        if self.coletar is None:
+            return super()._amostras()
+        return list(self.coletar().items())
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), baldes: tuple = BALDES_HTTP):
+        super().__init__(nome, ajuda, rotulos)
+        self.baldes = tuple(sorted(baldes)) + (float("inf"),)
+
+    def observar(self, valor: float, **rotulos):
+        chave = self._chave(rotulos)
+        indice = next(i for i, limite in enumerate(self.baldes) if valor <= limite)
+        with self._lock:
+            contagens = self._valores.get(chave)
+            if contagens is None:
+                # [contagem por balde..., soma]
+                contagens = self._valores[chave] = [0] * len(self.baldes) + [0.0]
+            contagens[indice] += 1
+            contagens[-1] += valor
+
+    def _amostras(self):
+        with self._lock:
+            return [(chave, list(contagens)) for chave, contagens in self._valores.items()]
+
+    def linhas(self) -> list[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        for chave, contagens in self._amostras():
+            acumulado = 0
+            for limite, quantidade in zip(self.baldes, contagens):
+                acumulado += quantidade
+                rotulos = _rotulos(self.rotulos, chave, f'le="{_numero(float(limite))}"')
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _rotulos(self.rotulos, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_numero(contagens[-1])}")
+            linhas.append(f"{self.nome}_count{rotulos} {acumulado}")
+        return linhas
+
+
+_registro: list[_Metrica] = []
+
+
+def gerar_texto() -> str:
+    """Todas as métricas no formato de exposição texto do Prometheus."""
+    linhas = []
+    for metrica in _registro:
+        linhas.extend(metrica.linhas())
+    return "\n".join(linhas) + "\n"
+
+
+HTTP_DURACAO = Histograma(
+    "http_request_duration_seconds",
+    "Duração das requisições HTTP até o último byte da resposta.",
+    ("method", "route", "status"),
+    BALDES_HTTP,
+)
+HTTP_EM_ANDAMENTO = Medidor(
+    "http_requests_in_progress", "Requisições HTTP sendo atendidas agora.", ("method",)
+)
+BANCO_DURACAO = Histograma(
+    "db_query_duration_seconds",
+    "Duração das consultas SQL (execução no driver).",
+    ("engine", "command"),
+    BALDES_BANCO,
+)
+BANCO_ERROS = Contador("db_query_errors_total", "Consultas SQL que falharam.", ("engine", "command"))
+INTEGRACAO_DURACAO = Histograma(
+    "integration_request_duration_seconds",
+    "Duração das chamadas HTTP às fontes externas.",
+    ("source", "result"),
+    BALDES_INTEGRACOES,
+)
+JOB_DURACAO = Histograma(
+    "scheduler_job_duration_seconds", "Duração das execuções dos jobs agendados.", ("job",), BALDES_JOBS
+)
+JOB_FALHAS = Contador("scheduler_job_failures_total", "Execuções de jobs que terminaram em erro.", ("job",))
+
+
+# --- HTTP ---
+
+
+class MetricasMiddleware:
+    """Middleware ASGI: latência por rota e requisições em andamento."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        codigo = [500]
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                codigo[0] = mensagem["status"]
+            await send(mensagem)
+
+        inicio = time.perf_counter()
+        HTTP_EM_ANDAMENTO.inc(method=metodo)
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            HTTP_EM_ANDAMENTO.dec(method=metodo)
+            # O roteador do Starlette grava a rota casada no próprio scope
+            rota = scope.get("route")
+            HTTP_DURACAO.observar(
+                time.perf_counter() - inicio,
+                method=metodo,
+                route=getattr(rota, "path", SEM_ROTA),
+                status=codigo[0],
+            )
+
+
+# --- Banco ---
+
+
+def _comando(statement: str) -> str:
+    comando = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return comando if comando in COMANDOS_SQL else "OUTRO"
+
+
+def _instrumentar_engine(engine, nome: str):
+    # engine do SQLAlchemy (para o async, passe async_engine.sync_engine)
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info["metricas_inicio"].pop()
+        BANCO_DURACAO.observar(time.perf_counter() - inicio, engine=nome, command=_comando(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _erro(contexto):
+        inicios = contexto.connection.info.get("metricas_inicio") if contexto.connection else None
+        if inicios:
+            inicios.pop()
+        BANCO_ERROS.inc(engine=nome, command=_comando(contexto.statement or ""))
+
+
+def _coletor_pool(engines: dict, atributo: str) -> Callable[[], dict]:
+    def coletar():
+        valores = {}
+        for nome, engine in engines.items():
+            # NullPool/StaticPool não têm contadores
+            metodo = getattr(engine.pool, atributo, None)
+            if callable(metodo):
+                valores[(nome,)] = metodo()
+        return valores
+
+    return coletar
+
+
+def configurar_metricas(engine, async_engine):
+    """Liga os eventos de consulta e os medidores de pool nos dois engines."""
+    if not METRICAS_HABILITADAS:
+        return
+    engines = {"sync": engine, "async": async_engine.sync_engine}
+    for nome, alvo in engines.items():
+        _instrumentar_engine(alvo, nome)
+    for atributo, ajuda in (
+        ("size", "Tamanho configurado do pool de conexões."),
+        ("checkedout", "Conexões do pool em uso."),
+        ("checkedin", "Conexões ociosas no pool."),
+        ("overflow", "Conexões abertas além do tamanho do pool."),
+    ):
+        Medidor(f"db_pool_{atributo}", ajuda, ("engine",), coletar=_coletor_pool(engines, atributo))
+
+
+# --- Integrações e jobs ---
+
+
+def observar_integracao(fonte: str, resultado: str, segundos: float):
+    if METRICAS_HABILITADAS:
+        INTEGRACAO_DURACAO.observar(segundos, source=fonte, result=resultado)
+
+
+def cronometrar_job(nome: str):
+    """Decorator dos jobs do scheduler: mede a duração e conta as exceções."""
+
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def executar(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            except Exception:
+                JOB_FALHAS.inc(job=nome)
+                raise
+            finally:
+                JOB_DURACAO.observar(time.perf_counter() - inicio, job=nome)
+
+        return executar
+
+    return decorar
@@ -1,4 +1,5 @@
 from sqlalchemy import (
+    DDL,
     Boolean,
     Column,
     Integer,
@@ -6,12 +7,18 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Text,
     Enum,
     func,
+    literal_column,
+    event,
+    text,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 import enum
+import re
+import unicodedata
 
 # IMPORTANTE: Importe o 'engine' do database.py
 from .database import Base, engine
@@ -29,6 +36,42 @@ else:
 # ------------------------------------
 
 
+def normalizar_nome_busca(texto):
+    """
+    Normaliza um nome para busca: minúsculas, sem acentos e com
+    espaços colapsados ("  JOSÉ  da Silva" -> "jose da silva").
+    """
+    if texto is None:
+        return None
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", sem_acentos).strip().lower()
+
+
+def _nome_busca_default(context):
+    # Default "contextual": vale também para inserts em lote via Core
+    return normalizar_nome_busca(context.get_current_parameters().get("nome_completo"))
+
+
+def _coluna_versao():
+    # Qualquer UPDATE na linha (ORM ou em lote) incrementa a versão; os pais
+    # são incrementados por app/versoes.py
+    return Column(
+        Integer,
+        nullable=False,
+        default=1,
+        server_default=text("1"),
+        onupdate=literal_column("versao") + 1,
+    )
+
+
+def _coluna_atualizado_em():
+    # server_default: linhas gravadas fora do ORM (COPY da importação) também
+    return Column(
+        TimestampTZ, nullable=True, default=func.now(), server_default=func.now(), onupdate=func.now()
+    )
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -79,17 +122,58 @@ class Preso(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     nome_completo = Column(String(255), nullable=False, index=True)
+    # Cópia normalizada do nome, usada pelo motor de busca (ver app/busca.py)
+    nome_busca = Column(String(255), nullable=True, default=_nome_busca_default)
     cpf = Column(String(11), unique=True, index=True, nullable=True)
     nome_da_mae = Column(String(255), nullable=True)
     data_nascimento = Column(Date, nullable=True)
 
     # Aplicamos nosso tipo de data híbrido aqui
     criado_em = Column(TimestampTZ, server_default=func.now())
+    versao = _coluna_versao()
+    atualizado_em = _coluna_atualizado_em()
 
     processos = relationship(
         "Processo", back_populates="preso", cascade="all, delete-orphan"
     )
 
+    # Só no PostgreSQL. ix_presos_nome_completo_id: ordem da paginação por
+    # cursor (ver app/paginacao.py; no SQLite todo índice já termina no
+    # rowid), bancos existentes o recebem pela migração 0002_indices_keyset.
+    # ix_presos_nome_busca_trgm: busca por nome (ver app/busca.py), bancos
+    # existentes o recebem pela migração 0006_busca_nome.
+    __table_args__ = (
+        Index("ix_presos_nome_completo_id", "nome_completo", "id").ddl_if(dialect="postgresql"),
+        Index(
+            "ix_presos_nome_busca_trgm",
+            "nome_busca",
+            postgresql_using="gin",
+            postgresql_ops={"nome_busca": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    @validates("nome_completo")
+    def _sincronizar_nome_busca(self, key, value):
+        self.nome_busca = normalizar_nome_busca(value)
+        return value
+
+
+# gin_trgm_ops precisa da extensão antes do CREATE INDEX do create_all
+event.listen(
+    Preso.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
+@event.listens_for(Preso.__table__, "after_create")
+def _criar_busca_sqlite(target, connection, **kw):
+    # No SQLite o índice da busca é a tabela FTS5 presos_fts
+    if connection.dialect.name == "sqlite":
+        from .busca import criar_presos_fts  # busca importa este módulo
+
+        criar_presos_fts(connection)
+
 
 class Processo(Base):
     __tablename__ = "processos"
@@ -102,7 +186,9 @@ class Processo(Base):
     local_segregacao = Column(String(255), nullable=True)
     numero_da_guia = Column(String(50), nullable=True)
     tipo_guia = Column(String(50), nullable=True)
-    preso_id = Column(Integer, ForeignKey("presos.id"), nullable=False)
+    preso_id = Column(Integer, ForeignKey("presos.id"), nullable=False, index=True)
+    versao = _coluna_versao()
+    atualizado_em = _coluna_atualizado_em()
 
     preso = relationship("Preso", back_populates="processos")
     eventos = relationship(
@@ -125,6 +211,90 @@ class Evento(Base):
     alerta_status = Column(
         Enum(AlertaStatusEnum), nullable=False, default=AlertaStatusEnum.pendente
     )
-    processo_id = Column(Integer, ForeignKey("processos.id"), nullable=False)
+    processo_id = Column(
+        Integer, ForeignKey("processos.id"), nullable=False, index=True
+    )
+    versao = _coluna_versao()
+    atualizado_em = _coluna_atualizado_em()
 
     processo = relationship("Processo", back_populates="eventos")
+
+    # Índices das consultas de alerta (filtram por status e ordenam por data)
+    # e da paginação por cursor dos alertas ativos (data_evento, id). Bancos
+    # existentes recebem estes índices pelas migrações 0001_indices_alertas
+    # e 0002_indices_keyset (esta só no PostgreSQL, como aqui).
+    __table_args__ = (
+        Index("ix_eventos_alerta_status_data_evento", "alerta_status", "data_evento"),
+        Index(
+            "ix_eventos_pendentes_data_evento",
+            "data_evento",
+            postgresql_where=text("alerta_status = 'pendente'"),
+            sqlite_where=text("alerta_status = 'pendente'"),
+        ),
+        Index(
+            "ix_eventos_ativos_data_evento",
+            "data_evento",
+            postgresql_where=text("alerta_status IN ('pendente', 'disparado')"),
+            sqlite_where=text("alerta_status IN ('pendente', 'disparado')"),
+        ),
+        Index(
+            "ix_eventos_ativos_data_evento_id",
+            "data_evento",
+            "id",
+            postgresql_where=text("alerta_status IN ('pendente', 'disparado')"),
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+class IntegracaoCache(Base):
+    """
+    Cache das consultas às integrações externas (backend "banco" de
+    app/integracoes/cache.py). Compartilhado entre processos/instâncias.
+    """
+
+    __tablename__ = "integracoes_cache"
+
+    chave = Column(String(255), primary_key=True)
+    valor = Column(Text, nullable=False)  # resultado serializado em JSON
+    expira_em = Column(TimestampTZ, nullable=False, index=True)
+
+
+class ProcessoSincronizacao(Base):
+    """
+    Último estado visto nas fontes externas para cada processo (hash do
+    payload), usado pela sincronização para só gravar quando algo mudou.
+    """
+
+    __tablename__ = "processos_sincronizacao"
+
+    processo_id = Column(
+        Integer, ForeignKey("processos.id", ondelete="CASCADE"), primary_key=True
+    )
+    fonte = Column(String(20), nullable=True)
+    # Nulo enquanto nenhuma consulta do processo deu certo
+    hash_dados = Column(String(64), nullable=True)
+    verificado_em = Column(TimestampTZ, nullable=True)
+    alterado_em = Column(TimestampTZ, nullable=True)
+    # Execuções seguidas em que a consulta falhou (zera quando volta a responder)
+    tentativas = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    ultima_falha_em = Column(TimestampTZ, nullable=True)
+
+
+class SincronizacaoExecucao(Base):
+    """Progresso de cada execução da sincronização (permite retomar)."""
+
+    __tablename__ = "sincronizacao_execucoes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default="em_andamento", index=True)
+    iniciada_em = Column(TimestampTZ, nullable=True)
+    atualizada_em = Column(TimestampTZ, nullable=True)
+    finalizada_em = Column(TimestampTZ, nullable=True)
+    # Cursor: maior processos.id já processado nesta execução
+    ultimo_processo_id = Column(Integer, nullable=False, default=0)
+    processados = Column(Integer, nullable=False, default=0)
+    alterados = Column(Integer, nullable=False, default=0)
+    status_atualizados = Column(Integer, nullable=False, default=0)
+    sem_resultado = Column(Integer, nullable=False, default=0)
+    # Processos cuja consulta falhou mesmo depois das novas tentativas
+    falhas = Column(Integer, nullable=False, default=0, server_default=text("0"))
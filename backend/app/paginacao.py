@@ -0,0 +1,104 @@
+"""
+Paginação por cursor (keyset) compartilhada pelas listagens.
+
+Em vez de OFFSET (que lê e descarta todas as linhas anteriores, e pula ou
+repete registros quando há inserções entre uma página e outra), a próxima
+página começa logo depois da última linha da anterior:
+
+    WHERE (data_evento, id) > (:ultima_data, :ultimo_id)
+    ORDER BY data_evento, id
+    LIMIT :limit
+
+O cursor é opaco para o cliente: base64 de um JSON com o nome da listagem
+e os valores das colunas de ordenação da última linha. Cada listagem
+define suas colunas (sempre NOT NULL, em ordem crescente e terminando numa
+coluna única, normalmente o id).
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, Mapping, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+from . import models
+
+# Colunas de ordenação de cada listagem
+COLUNAS_POR_LISTAGEM = {
+    "alertas": (models.Evento.data_evento, models.Evento.id),
+    "presos": (models.Preso.nome_completo, models.Preso.id),
+    "usuarios": (models.User.id,),
+}
+
+
+def _serializar(valor: Any):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def _converter(coluna, valor: Any):
+    tipo = coluna.type.python_type
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        return date.fromisoformat(valor)
+    if not isinstance(valor, tipo):
+        raise ValueError("tipo inesperado")
+    return valor
+
+
+def codificar_cursor(listagem: str, valores: Sequence[Any]) -> str:
+    dados = json.dumps({"l": listagem, "v": [_serializar(v) for v in valores]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def ler_cursor(listagem: str, cursor: Optional[str], skip: int = 0) -> Optional[tuple]:
+    """Valores da última linha da página anterior (ou None na primeira página)."""
+    if not cursor:
+        return None
+    if skip:
+        raise HTTPException(status_code=400, detail="Use `cursor` ou `skip`, não os dois.")
+    colunas = COLUNAS_POR_LISTAGEM[listagem]
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        if dados.get("l") != listagem or len(dados.get("v", [])) != len(colunas):
+            raise ValueError("cursor de outra listagem")
+        return tuple(_converter(coluna, valor) for coluna, valor in zip(colunas, dados["v"]))
+    except (ValueError, TypeError, AttributeError, binascii.Error, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+
+def _depois_de(colunas, valores):
+    # (a, b) > (x, y) escrito como a >= x AND (a > x OR b > y): o primeiro
+    # termo é uma faixa simples no índice de `a`, em qualquer banco
+    if len(colunas) == 1:
+        return colunas[0] > valores[0]
+    return and_(
+        colunas[0] >= valores[0],
+        or_(colunas[0] > valores[0], _depois_de(colunas[1:], valores[1:])),
+    )
+
+
+def aplicar_cursor(query, listagem: str, valores: Optional[tuple]):
+    """Ordena pelas colunas da listagem e, se houver cursor, filtra o que vem depois dele."""
+    colunas = COLUNAS_POR_LISTAGEM[listagem]
+    if valores is not None:
+        query = query.where(_depois_de(colunas, valores))
+    return query.order_by(*colunas)
+
+
+def proximo_cursor(listagem: str, itens: Sequence[Any], limit: Optional[int]) -> Optional[str]:
+    """Cursor da próxima página, ou None se esta página não veio cheia."""
+    if not limit or len(itens) < limit:
+        return None
+    ultimo = itens[-1]
+    # Objetos ORM, linhas do Core ou dicts (app/leitura.py)
+    if isinstance(ultimo, Mapping):
+        valores = [ultimo[coluna.key] for coluna in COLUNAS_POR_LISTAGEM[listagem]]
+    else:
+        valores = [getattr(ultimo, coluna.key) for coluna in COLUNAS_POR_LISTAGEM[listagem]]
+    return codificar_cursor(listagem, valores)
@@ -0,0 +1,218 @@
+"""
+Perfil das consultas SQL por requisição e detector de N+1 (dev/homologação).
+
+Um lazy load esquecido (ex.: `evento.processo.preso` dentro de um loop, ou
+um schema aninhado validado a partir de objetos ORM) não quebra nada: só
+dispara uma consulta por item. Aqui cada consulta da requisição é contada e
+cronometrada, agrupada pela forma do SQL (o texto com os parâmetros, com as
+listas de IN colapsadas), e as formas repetidas pelo menos
+PERFIL_CONSULTAS_REPETICOES vezes são marcadas como suspeitas de N+1.
+
+PERFIL_CONSULTAS:
+- `desligado` (padrão em produção): nada é medido por requisição;
+- `header` (padrão fora de produção): só as requisições com o header
+  `X-Perfil-Consultas: 1`;
+- `sempre`: todas as requisições.
+
+O resumo sai nos headers da resposta (X-Consultas, X-Consultas-Tempo-Ms,
+X-Consultas-Repetidas), no log (warning quando há N+1) e nas últimas
+requisições perfiladas em GET /api/admin/perfil-consultas.
+
+Para testes, `max_consultas(n)` conta tudo que o processo executar dentro
+do bloco (inclusive o que o TestClient roda em outra thread):
+
+    with max_consultas(3):
+        client.get("/api/alertas/proximos")
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_producao = os.getenv("APP_ENV", os.getenv("ENVIRONMENT", "development")).lower() in {"production", "prod"}
+MODOS = ("desligado", "header", "sempre")
+PERFIL_CONSULTAS = os.getenv("PERFIL_CONSULTAS", "desligado" if _producao else "header").strip().lower()
+if PERFIL_CONSULTAS not in MODOS:
+    raise RuntimeError(f"PERFIL_CONSULTAS inválido: '{PERFIL_CONSULTAS}'. Use: {', '.join(MODOS)}")
+PERFIL_CONSULTAS_REPETICOES = int(os.getenv("PERFIL_CONSULTAS_REPETICOES", "5"))
+HEADER_PERFIL = "x-perfil-consultas"
+
+# Últimas requisições perfiladas (para o endpoint de diagnóstico)
+_recentes: deque = deque(maxlen=int(os.getenv("PERFIL_CONSULTAS_HISTORICO", "50")))
+
+_perfil_atual: contextvars.ContextVar[Optional["PerfilConsultas"]] = contextvars.ContextVar(
+    "perfil_consultas", default=None
+)
+# Perfis que recebem as consultas de qualquer thread (max_consultas)
+_perfis_globais: list["PerfilConsultas"] = []
+_perfis_globais_lock = threading.Lock()
+
+# IN (?, ?, ?) / IN ($1, $2) / IN (%(p_1)s, ...) viram uma forma só
+_LISTA_PARAMETROS = re.compile(r"\((?:\s*(?:\?|\$\d+|%\(\w+\)s|%s|:\w+)\s*,?)+\)")
+_ESPACOS = re.compile(r"\s+")
+
+
+def forma_sql(statement: str) -> str:
+    return _LISTA_PARAMETROS.sub("(...)", _ESPACOS.sub(" ", statement).strip())
+
+
+class PerfilConsultas:
+    def __init__(self, descricao: str = ""):
+        self.descricao = descricao
+        self.total = 0
+        self.tempo = 0.0
+        self.formas: dict[str, list] = {}  # forma -> [vezes, segundos]
+        self._lock = threading.Lock()
+
+    def registrar(self, statement: str, segundos: float):
+        forma = forma_sql(statement)
+        with self._lock:
+            self.total += 1
+            self.tempo += segundos
+            dados = self.formas.setdefault(forma, [0, 0.0])
+            dados[0] += 1
+            dados[1] += segundos
+
+    def repetidas(self, minimo: int = PERFIL_CONSULTAS_REPETICOES) -> list[dict]:
+        with self._lock:
+            itens = [(forma, vezes, segundos) for forma, (vezes, segundos) in self.formas.items()]
+        return [
+            {"sql": forma, "vezes": vezes, "tempo_ms": round(segundos * 1000, 2)}
+            for forma, vezes, segundos in sorted(itens, key=lambda item: -item[1])
+            if vezes >= minimo
+        ]
+
+    def resumo(self) -> dict:
+        with self._lock:
+            itens = sorted(self.formas.items(), key=lambda item: -item[1][1])
+        return {
+            "descricao": self.descricao,
+            "consultas": self.total,
+            "tempo_ms": round(self.tempo * 1000, 2),
+            "repetidas": self.repetidas(),
+            "mais_demoradas": [
+                {"sql": forma, "vezes": vezes, "tempo_ms": round(segundos * 1000, 2)}
+                for forma, (vezes, segundos) in itens[:10]
+            ],
+        }
+
+
+def _ativos() -> list:
+    atual = _perfil_atual.get()
+    perfis = [atual] if atual is not None else []
+    if _perfis_globais:
+        perfis.extend(_perfis_globais)
+    return perfis
+
+
+def configurar_perfil(engine, async_engine):
+    """Liga os eventos de consulta nos dois engines (custam quase nada sem perfil ativo)."""
+    for alvo in (engine, async_engine.sync_engine):
+
+        @event.listens_for(alvo, "before_cursor_execute")
+        def _antes(conn, cursor, statement, parameters, context, executemany):
+            if context is not None and (_perfil_atual.get() is not None or _perfis_globais):
+                context._perfil_inicio = time.perf_counter()
+
+        @event.listens_for(alvo, "after_cursor_execute")
+        def _depois(conn, cursor, statement, parameters, context, executemany):
+            inicio = getattr(context, "_perfil_inicio", None)
+            if inicio is None:
+                return
+            segundos = time.perf_counter() - inicio
+            for perfil in _ativos():
+                perfil.registrar(statement, segundos)
+
+
+@contextlib.contextmanager
+def max_consultas(maximo: int, descricao: str = ""):
+    """
+    Falha (AssertionError) se o bloco executar mais de `maximo` consultas.
+    Para testes: conta as consultas de todas as threads enquanto o bloco roda.
+    """
+    perfil = PerfilConsultas(descricao)
+    with _perfis_globais_lock:
+        _perfis_globais.append(perfil)
+    try:
+        yield perfil
+    finally:
+        with _perfis_globais_lock:
+            _perfis_globais.remove(perfil)
+    if perfil.total > maximo:
+        formas = "\n".join(
+            f"  {vezes}x {forma[:200]}"
+            for forma, (vezes, _) in sorted(perfil.formas.items(), key=lambda item: -item[1][0])[:10]
+        )
+        raise AssertionError(
+            f"{descricao or 'bloco'}: {perfil.total} consultas (máximo {maximo}).\n{formas}"
+        )
+
+
+def perfis_recentes() -> dict:
+    return {
+        "modo": PERFIL_CONSULTAS,
+        "repeticoes_para_n1": PERFIL_CONSULTAS_REPETICOES,
+        "requisicoes": list(reversed(_recentes)),
+    }
+
+
+class PerfilConsultasMiddleware:
+    """Middleware ASGI: abre um perfil por requisição e põe o resumo nos headers."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._perfilar(scope):
+            await self.app(scope, receive, send)
+            return
+
+        descricao = f"{scope['method']} {scope['path']}"
+        perfil = PerfilConsultas(descricao)
+        token = _perfil_atual.set(perfil)
+        inicio = time.perf_counter()
+        status = [500]
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status[0] = mensagem["status"]
+                # Consultas feitas depois disso (corpo em streaming) só
+                # aparecem no log e no endpoint de diagnóstico
+                mensagem["headers"] = list(mensagem.get("headers", [])) + [
+                    (b"x-consultas", str(perfil.total).encode()),
+                    (b"x-consultas-tempo-ms", f"{perfil.tempo * 1000:.2f}".encode()),
+                    (b"x-consultas-repetidas", str(len(perfil.repetidas())).encode()),
+                ]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _perfil_atual.reset(token)
+            resumo = perfil.resumo()
+            resumo["status"] = status[0]
+            resumo["duracao_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+            _recentes.append(resumo)
+            for item in resumo["repetidas"]:
+                logger.warning(
+                    "Possível N+1 em %s: %s consultas iguais (%.1f ms): %s",
+                    descricao, item["vezes"], item["tempo_ms"], item["sql"][:300],
+                )
+
+    @staticmethod
+    def _perfilar(scope) -> bool:
+        if PERFIL_CONSULTAS == "sempre":
+            return True
+        for nome, valor in scope["headers"]:
+            if nome == HEADER_PERFIL.encode():
+                return valor.strip().lower() in {b"1", b"true", b"on"}
+        return False
@@ -0,0 +1,50 @@
+"""
+Serialização JSON rápida das respostas.
+
+Com `response_model`, o FastAPI faz três passos para cada resposta:
+valida os objetos ORM no schema, converte o resultado para dicts/listas
+Python (`mode="json"`) e só então o JSONResponse roda `json.dumps`. Nas
+listagens e relatórios (milhares de presos com processos e eventos) os dois
+últimos passos custam mais que o primeiro.
+
+- `JSONRapido`: classe de resposta padrão da aplicação; troca o `json.dumps`
+  pelo encoder em Rust do pydantic-core.
+- `json_rapido(tipo, dados)`: para as respostas grandes. Valida direto no
+  schema e gera os bytes com `TypeAdapter.dump_json`, sem passar pelos
+  dicts intermediários. O endpoint devolve a Response pronta; o
+  `response_model` continua no decorator só para a documentação.
+"""
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+
+class JSONRapido(JSONResponse):
+    """JSONResponse com o encoder do pydantic-core (mesma saída compacta, em UTF-8)."""
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+@lru_cache(maxsize=None)
+def _adaptador(tipo) -> TypeAdapter:
+    # Montar o TypeAdapter (schema + serializador) é caro: um por tipo
+    return TypeAdapter(tipo)
+
+
+def serializar(tipo, dados: Any) -> bytes:
+    """Bytes JSON de `dados` (objetos ORM, dicts...) validados como `tipo`."""
+    adaptador = _adaptador(tipo)
+    return adaptador.dump_json(adaptador.validate_python(dados, from_attributes=True), by_alias=True)
+
+
+def json_rapido(tipo, dados: Any, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    Response JSON de `dados` validados como `tipo` (ex.: List[schemas.PresoDetalhe]).
+    `headers`: normalmente o `response.headers` que o endpoint já preencheu
+    (a Response devolvida substitui a do parâmetro `response`).
+    """
+    return Response(serializar(tipo, dados), headers=headers, media_type="application/json")
@@ -72,10 +72,40 @@ class Evento(EventoBase):
     id: int
     processo_id: int
     alerta_status: AlertaStatusEnum
+    versao: int
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class EventoLoteCriacao(EventoCreate):
+    processo_id: int
+
+
+class EventoLoteAtualizacao(BaseModel):
+    """Só os campos enviados são alterados."""
+
+    id: int
+    data_evento: Optional[datetime] = None
+    tipo_evento: Optional[TipoEventoEnum] = None
+    descricao: Optional[str] = None
+
+
+class EventoLoteStatus(BaseModel):
+    id: int
+    status: AlertaStatusEnum
+
+
+class EventoLoteRequest(BaseModel):
+    criar: List[EventoLoteCriacao] = Field(default_factory=list, max_length=5000)
+    atualizar: List[EventoLoteAtualizacao] = Field(default_factory=list, max_length=5000)
+    status: List[EventoLoteStatus] = Field(default_factory=list, max_length=5000)
+
+
+class EventoLoteResultado(BaseModel):
+    criados: List[Evento]
+    atualizados: List[Evento]
+
+
 # --- Schemas de Processo ---
 
 
@@ -96,6 +126,7 @@ class ProcessoCreate(ProcessoBase):
 class Processo(ProcessoBase):
     id: int
     preso_id: int
+    versao: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -117,6 +148,7 @@ class PresoCreate(PresoBase):
 class Preso(PresoBase):
     id: int
     criado_em: datetime
+    versao: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -136,6 +168,37 @@ class PresoDetalhe(Preso):
     )  # Um preso terá uma lista de seus processos (com eventos)
 
 
+# --- Schemas da listagem resumida (dashboard) ---
+
+
+class ProcessoResumo(BaseModel):
+    id: int
+    numero_processo: str
+    status_processual: Optional[str] = None
+    tipo_prisao: Optional[str] = None
+    data_prisao: Optional[date] = None
+    local_segregacao: Optional[str] = None
+
+
+class PresoResumo(BaseModel):
+    """Uma linha da tabela do dashboard: dados do preso, primeiro processo e agregados."""
+
+    id: int
+    nome_completo: str
+    cpf: Optional[str] = None
+    processo_principal: Optional[ProcessoResumo] = None
+    total_processos: int
+    proximo_evento: Optional[datetime] = None
+
+
+class PresoResumoPagina(BaseModel):
+    total: int
+    skip: int
+    limit: int
+    itens: List[PresoResumo]
+    next_cursor: Optional[str] = None
+
+
 # --- NOVO SCHEMA PARA CADASTRO ---
 
 
@@ -197,6 +260,17 @@ class ProcessoConsultaIntegracaoRequest(BaseModel):
     fontes: List[Literal["datajud", "pje"]] = Field(
         default_factory=lambda: ["datajud", "pje"]
     )
+    # False: responde com o primeiro resultado útil, sem esperar as outras fontes
+    aguardar_todas: bool = False
+
+
+class ProcessoConsultaLoteRequest(BaseModel):
+    numeros_processo: List[str] = Field(min_length=1, max_length=5000)
+    tribunal: Optional[str] = None
+    fontes: List[Literal["datajud", "pje"]] = Field(
+        default_factory=lambda: ["datajud", "pje"]
+    )
+    aguardar_todas: bool = False
 
 
 class ProcessoConsultaIntegracaoResultado(BaseModel):
@@ -1,5 +1,9 @@
 import os
+import asyncio
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
@@ -39,13 +43,96 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 class TokenData(BaseModel):
     cpf: Optional[str] = None
 
+# --- Pool dedicado para o bcrypt ---
+# Cada hash/verificação ocupa um núcleo inteiro por ~0,2s. Rodando direto no
+# threadpool do FastAPI, uma rajada de logins (ou um ataque de força bruta)
+# tomava todas as threads e travava as demais rotas. Aqui o bcrypt roda num
+# executor próprio com poucas threads, e a fila de espera tem limite: acima
+# dele a operação é recusada com SenhaSobrecarregadaError (vira 503).
+SENHA_WORKERS = int(os.getenv("SENHA_WORKERS") or min(4, os.cpu_count() or 1))
+SENHA_FILA_MAX = int(os.getenv("SENHA_FILA_MAX", "32"))
+
+_executor_senhas = ThreadPoolExecutor(max_workers=SENHA_WORKERS, thread_name_prefix="bcrypt")
+_metricas_lock = threading.Lock()
+_metricas_senhas = {
+    "em_execucao": 0,
+    "na_fila": 0,
+    "concluidas": 0,
+    "recusadas": 0,
+    "espera_total_s": 0.0,
+    "espera_max_s": 0.0,
+    "execucao_total_s": 0.0,
+}
+
+
+class SenhaSobrecarregadaError(RuntimeError):
+    """Fila do bcrypt cheia: muitas operações de senha ao mesmo tempo."""
+
+
+def _admitir():
+    with _metricas_lock:
+        if _metricas_senhas["na_fila"] + _metricas_senhas["em_execucao"] >= SENHA_WORKERS + SENHA_FILA_MAX:
+            _metricas_senhas["recusadas"] += 1
+            raise SenhaSobrecarregadaError("Muitas operações de senha simultâneas. Tente novamente.")
+        _metricas_senhas["na_fila"] += 1
+    return time.perf_counter()
+
+
+def _executar_medindo(funcao, enfileirado_em, *args):
+    inicio = time.perf_counter()
+    espera = inicio - enfileirado_em
+    with _metricas_lock:
+        _metricas_senhas["na_fila"] -= 1
+        _metricas_senhas["em_execucao"] += 1
+        _metricas_senhas["espera_total_s"] += espera
+        _metricas_senhas["espera_max_s"] = max(_metricas_senhas["espera_max_s"], espera)
+    try:
+        return funcao(*args)
+    finally:
+        with _metricas_lock:
+            _metricas_senhas["em_execucao"] -= 1
+            _metricas_senhas["concluidas"] += 1
+            _metricas_senhas["execucao_total_s"] += time.perf_counter() - inicio
+
+
+def _no_pool_de_senhas(funcao, *args):
+    enfileirado_em = _admitir()
+    return _executor_senhas.submit(_executar_medindo, funcao, enfileirado_em, *args).result()
+
+
+async def _no_pool_de_senhas_async(funcao, *args):
+    enfileirado_em = _admitir()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor_senhas, _executar_medindo, funcao, enfileirado_em, *args)
+
+
+def metricas_senhas() -> dict:
+    """Ocupação e tempos de espera do pool do bcrypt (para diagnóstico)."""
+    with _metricas_lock:
+        dados = dict(_metricas_senhas)
+    concluidas = dados["concluidas"] or 1
+    dados["workers"] = SENHA_WORKERS
+    dados["fila_max"] = SENHA_FILA_MAX
+    dados["espera_media_s"] = round(dados["espera_total_s"] / concluidas, 4)
+    dados["execucao_media_s"] = round(dados["execucao_total_s"] / concluidas, 4)
+    return dados
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha em texto puro bate com o hash salvo."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return _no_pool_de_senhas(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Gera um hash para a senha em texto puro."""
-    return pwd_context.hash(password)
+    return _no_pool_de_senhas(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password para rotas async (não bloqueia o event loop)."""
+    return await _no_pool_de_senhas_async(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash para rotas async (não bloqueia o event loop)."""
+    return await _no_pool_de_senhas_async(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Cria um novo token JWT."""
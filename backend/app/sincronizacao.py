@@ -0,0 +1,292 @@
+"""
+Sincronização do status dos processos com as fontes externas (DataJud/PJe).
+
+Percorre os processos ativos em lotes (cursor por `processos.id`), consulta
+as fontes com `consultar_processos_em_lote` (concorrência e limites por
+fonte já vêm de lá) e calcula um hash de cada payload. Só grava quando o
+hash muda: atualiza `processos_sincronizacao` e, se o payload trouxer um
+status diferente, `processos.status_processual`.
+
+Cada lote confirma o progresso em `sincronizacao_execucoes`; uma execução
+interrompida (queda do processo, limite de tempo no serverless) é retomada
+do ponto em que parou na próxima chamada.
+
+"Não encontrado" em todas as fontes conta como `sem_resultado` e o processo
+é dado como verificado. Os números cuja consulta falhou (timeout, limite da
+fonte, erro HTTP) são consultados de novo no mesmo lote, até
+SINCRONIZACAO_RETENTATIVAS vezes com espera crescente. Se ainda falharem,
+o processo conta em `falhas`, ganha `tentativas + 1` e `ultima_falha_em` em
+`processos_sincronizacao` e o cursor segue: um número que a fonte sempre
+recusa não trava os demais. Ele volta a ser consultado na próxima execução
+completa, que no scheduler é a do dia seguinte (SINCRONIZACAO_HORA).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .integracoes import consultar_processos_em_lote
+from .integracoes.service import (
+    FONTES_PROCESSO,
+    MENSAGEM_PROCESSO_NAO_ENCONTRADO,
+    _normalizar_numero_processo,
+)
+
+logger = logging.getLogger(__name__)
+
+SINCRONIZACAO_LOTE = int(os.getenv("SINCRONIZACAO_LOTE", "200"))
+# Status que encerram o acompanhamento (comparação sem diferenciar maiúsculas)
+SINCRONIZACAO_STATUS_FINAIS = [
+    status.strip().lower()
+    for status in os.getenv("SINCRONIZACAO_STATUS_FINAIS", "Arquivado,Extinto,Baixado,Encerrado").split(",")
+    if status.strip()
+]
+# Consultas que falharam: novas tentativas no mesmo lote e espera inicial
+# (segundos, dobra a cada tentativa)
+SINCRONIZACAO_RETENTATIVAS = int(os.getenv("SINCRONIZACAO_RETENTATIVAS", "2"))
+SINCRONIZACAO_ESPERA_RETENTATIVA = float(os.getenv("SINCRONIZACAO_ESPERA_RETENTATIVA", "2"))
+# Chaves onde o status costuma vir no payload das fontes
+CHAVES_STATUS = ("status_processual", "statusProcessual", "situacao", "status")
+
+STATUS_RETOMAVEIS = ("em_andamento", "interrompida")
+
+# Evita duas execuções simultâneas no mesmo processo (scheduler + endpoint)
+_execucao_lock = threading.Lock()
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def fontes_configuradas() -> list[str]:
+    return [fonte for fonte, (url_env, _) in FONTES_PROCESSO.items() if os.getenv(url_env)]
+
+
+def hash_dados(dados: Any) -> str:
+    """Hash estável do payload (chaves ordenadas)."""
+    serializado = json.dumps(dados, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+def extrair_status(dados: Any) -> Optional[str]:
+    if not isinstance(dados, dict):
+        return None
+    for chave in CHAVES_STATUS:
+        valor = dados.get(chave)
+        if isinstance(valor, str) and valor.strip():
+            return valor.strip()[:100]
+    return None
+
+
+def _filtro_processos_ativos():
+    return or_(
+        models.Processo.status_processual.is_(None),
+        func.lower(models.Processo.status_processual).not_in(SINCRONIZACAO_STATUS_FINAIS),
+    )
+
+
+def _obter_execucao(db: Session) -> models.SincronizacaoExecucao:
+    execucao = db.execute(
+        select(models.SincronizacaoExecucao)
+        .where(models.SincronizacaoExecucao.status.in_(STATUS_RETOMAVEIS))
+        .order_by(models.SincronizacaoExecucao.id.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+    if execucao is not None:
+        logger.info(
+            "Retomando sincronização #%s a partir do processo %s",
+            execucao.id,
+            execucao.ultimo_processo_id,
+        )
+        execucao.status = "em_andamento"
+        return execucao
+
+    execucao = models.SincronizacaoExecucao(
+        status="em_andamento",
+        iniciada_em=_agora(),
+        atualizada_em=_agora(),
+        ultimo_processo_id=0,
+        processados=0,
+        alterados=0,
+        status_atualizados=0,
+        sem_resultado=0,
+        falhas=0,
+    )
+    db.add(execucao)
+    db.commit()
+    return execucao
+
+
+def _falhou(resultado: Optional[dict]) -> bool:
+    """Sem dados e não por "não encontrado" em todas as fontes: vale tentar de novo."""
+    if resultado is None:
+        return True
+    if resultado.get("melhor_resultado"):
+        return False
+    resultados = resultado.get("resultados") or []
+    return not resultados or any(r.get("mensagem") != MENSAGEM_PROCESSO_NAO_ENCONTRADO for r in resultados)
+
+
+def _consultar_com_retentativas(numeros: list[str], fontes, prazo: Optional[float]) -> dict:
+    """Resultados por número; os que falharam são consultados de novo (com espera)."""
+    resultados: dict[str, dict] = {}
+    pendentes = numeros
+    espera = SINCRONIZACAO_ESPERA_RETENTATIVA
+    for tentativa in range(SINCRONIZACAO_RETENTATIVAS + 1):
+        if tentativa:
+            if prazo is not None and time.monotonic() + espera >= prazo:
+                break
+            time.sleep(espera)
+            espera *= 2
+        for resultado in consultar_processos_em_lote(pendentes, fontes=fontes):
+            resultados[resultado.get("numero_processo")] = resultado
+        pendentes = [numero for numero in pendentes if _falhou(resultados.get(numero))]
+        if not pendentes:
+            break
+    return resultados
+
+
+def _sincronizar_lote(
+    db: Session, execucao: models.SincronizacaoExecucao, processos, fontes, prazo: Optional[float] = None
+):
+    numeros = {}
+    for processo in processos:
+        numero = _normalizar_numero_processo(processo.numero_processo)
+        if len(numero) >= 7:  # número inválido: nem consulta
+            numeros[processo.id] = numero
+
+    resultados = _consultar_com_retentativas(list(dict.fromkeys(numeros.values())), fontes, prazo)
+    estados = {
+        estado.processo_id: estado
+        for estado in db.execute(
+            select(models.ProcessoSincronizacao).where(
+                models.ProcessoSincronizacao.processo_id.in_([p.id for p in processos])
+            )
+        ).scalars()
+    }
+
+    agora = _agora()
+    falhas = 0
+    for processo in processos:
+        estado = estados.get(processo.id)
+        if processo.id not in numeros:
+            execucao.sem_resultado += 1
+            continue
+        resultado = resultados.get(numeros[processo.id])
+        if _falhou(resultado):
+            if estado is None:
+                estado = estados[processo.id] = models.ProcessoSincronizacao(processo_id=processo.id)
+                db.add(estado)
+            estado.tentativas = (estado.tentativas or 0) + 1
+            estado.ultima_falha_em = agora
+            falhas += 1
+            continue
+        if estado is not None and estado.tentativas:
+            estado.tentativas = 0
+
+        dados = resultado.get("melhor_resultado")
+        if not dados:
+            execucao.sem_resultado += 1
+            continue
+
+        novo_hash = hash_dados(dados)
+        if estado is not None and estado.hash_dados == novo_hash:
+            estado.verificado_em = agora  # nada mudou na fonte
+            continue
+        if estado is None:
+            estado = models.ProcessoSincronizacao(processo_id=processo.id)
+            db.add(estado)
+        estado.hash_dados = novo_hash
+        estado.fonte = next(
+            (r["fonte"] for r in resultado.get("resultados", []) if r.get("sucesso") and r.get("dados")),
+            None,
+        )
+        estado.verificado_em = agora
+        estado.alterado_em = agora
+        execucao.alterados += 1
+        novo_status = extrair_status(dados)
+        if novo_status and novo_status != processo.status_processual:
+            processo.status_processual = novo_status
+            execucao.status_atualizados += 1
+
+    if falhas:
+        logger.warning(
+            "Sincronização #%s: %s processo(s) do lote %s-%s sem resposta das fontes",
+            execucao.id,
+            falhas,
+            processos[0].id,
+            processos[-1].id,
+        )
+    execucao.falhas += falhas
+    execucao.processados += len(processos)
+    execucao.ultimo_processo_id = processos[-1].id
+    execucao.atualizada_em = agora
+    db.commit()
+
+
+def sincronizar_processos(db: Session, tempo_maximo: Optional[float] = None) -> dict:
+    """
+    Executa (ou retoma) a sincronização. Com `tempo_maximo` (segundos), para
+    entre lotes quando o tempo acaba e deixa a execução para ser retomada.
+    """
+    fontes = fontes_configuradas()
+    if not fontes:
+        return {"status": "sem_fontes_configuradas"}
+
+    if not _execucao_lock.acquire(blocking=False):
+        return {"status": "ja_em_execucao"}
+    try:
+        inicio = time.monotonic()
+        prazo = None if tempo_maximo is None else inicio + tempo_maximo
+        execucao = _obter_execucao(db)
+        try:
+            while True:
+                if tempo_maximo is not None and time.monotonic() - inicio >= tempo_maximo:
+                    execucao.status = "interrompida"
+                    break
+                processos = (
+                    db.execute(
+                        select(models.Processo)
+                        .where(
+                            models.Processo.id > execucao.ultimo_processo_id,
+                            _filtro_processos_ativos(),
+                        )
+                        .order_by(models.Processo.id.asc())
+                        .limit(SINCRONIZACAO_LOTE)
+                    )
+                    .scalars()
+                    .all()
+                )
+                if not processos:
+                    execucao.status = "concluida"
+                    execucao.finalizada_em = _agora()
+                    break
+                _sincronizar_lote(db, execucao, processos, fontes, prazo)
+        except Exception:
+            db.rollback()
+            execucao.status = "interrompida"
+            execucao.atualizada_em = _agora()
+            db.commit()
+            raise
+        execucao.atualizada_em = _agora()
+        db.commit()
+        return {
+            "status": execucao.status,
+            "execucao_id": execucao.id,
+            "ultimo_processo_id": execucao.ultimo_processo_id,
+            "processados": execucao.processados,
+            "alterados": execucao.alterados,
+            "status_atualizados": execucao.status_atualizados,
+            "sem_resultado": execucao.sem_resultado,
+            "falhas": execucao.falhas,
+        }
+    finally:
+        _execucao_lock.release()
@@ -0,0 +1,168 @@
+"""
+Versão de linha de presos, processos e eventos (ETag e concorrência otimista).
+
+Cada uma dessas tabelas tem `versao` (começa em 1) e `atualizado_em`. A
+própria linha ganha `versao + 1` em qualquer UPDATE, inclusive os em lote,
+pelo `onupdate` da coluna (ver models.py). Além disso a versão "sobe" para
+os pais: mudou um evento, incrementa o processo dele e o preso; mudou um
+processo, incrementa o preso. Assim `presos.versao` muda sempre que qualquer
+coisa da ficha do preso muda, e o ETag do detalhe sai de uma única coluna,
+sem carregar processos e eventos.
+
+- Pelo ORM (flush) isso é automático: listener `after_flush` abaixo.
+- INSERT/UPDATE em lote via `db.execute(...)` não passam pelo flush: quem
+  faz precisa chamar `tocar(db, processos=..., presos=...)`.
+
+Bancos antigos recebem as colunas pela migração 0003 (`alembic upgrade head`).
+"""
+import hashlib
+import re
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event, func, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+_CHAVE_SESSAO = "versoes_incrementadas"
+_ETAG = re.compile(r'^(?:W/)?"(?P<tipo>[a-z]+)-(?P<id>\d+)-v(?P<versao>\d+)"$')
+
+
+# --- ETags ---
+
+
+def etag(tipo: str, registro_id: int, versao: int) -> str:
+    """ETag forte de um registro: "preso-12-v3"."""
+    return f'"{tipo}-{registro_id}-v{versao}"'
+
+
+def etag_lista(tipo: str, pares: Iterable[tuple[int, int]]) -> str:
+    """ETag de uma página: hash dos pares (id, versao) na ordem da resposta."""
+    resumo = hashlib.sha1(",".join(f"{i}:{v}" for i, v in pares).encode("ascii")).hexdigest()
+    return f'"{tipo}-{resumo[:20]}"'
+
+
+def confere_if_none_match(cabecalho: Optional[str], etag_atual: str) -> bool:
+    """True se o cliente já tem esta versão (responder 304). Comparação fraca."""
+    if not cabecalho:
+        return False
+    atual = etag_atual.removeprefix("W/")
+    return any(
+        valor.strip() == "*" or valor.strip().removeprefix("W/") == atual
+        for valor in cabecalho.split(",")
+    )
+
+
+def versao_do_if_match(cabecalho: Optional[str], tipo: str, registro_id: int) -> Optional[int]:
+    """
+    Versão que o cliente diz estar editando (If-Match), ou None se ele não
+    mandou o header (ou mandou "*"). ETag de outro registro ou ilegível vale
+    como versão 0, que nunca confere.
+    """
+    if not cabecalho or cabecalho.strip() == "*":
+        return None
+    casou = _ETAG.match(cabecalho.strip())
+    if not casou or casou["tipo"] != tipo or int(casou["id"]) != registro_id:
+        return 0
+    return int(casou["versao"])
+
+
+def exigir_versao(db: Session, modelo, registro_id: int, versao_esperada: Optional[int]):
+    """
+    Concorrência otimista (If-Match): trava a linha com um UPDATE sem efeito
+    que só casa se ela ainda estiver na versão esperada; senão, 412. Depois
+    disso ninguém mais grava nela até o commit, então a checagem e a
+    alteração valem juntas.
+    """
+    if versao_esperada is None:
+        return
+    resultado = db.execute(
+        update(modelo)
+        .where(modelo.id == registro_id, modelo.versao == versao_esperada)
+        .values(versao=modelo.versao, atualizado_em=modelo.atualizado_em)
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount != 1:
+        raise HTTPException(
+            status_code=412,
+            detail="O registro foi alterado por outra pessoa. Recarregue e tente novamente.",
+        )
+
+
+# --- Propagação para os pais ---
+
+
+def _vazio(ids) -> bool:
+    # ids pode ser uma coleção ou uma subconsulta (select)
+    return isinstance(ids, (list, set, tuple, frozenset)) and not ids
+
+
+def _incrementar(conexao, processos, presos):
+    if not _vazio(processos):
+        conexao.execute(
+            update(models.Processo.__table__)
+            .where(models.Processo.id.in_(processos))
+            .values(atualizado_em=func.now())
+        )
+    condicoes = []
+    if not _vazio(presos):
+        condicoes.append(models.Preso.id.in_(presos))
+    if not _vazio(processos):
+        condicoes.append(
+            models.Preso.id.in_(
+                select(models.Processo.preso_id).where(models.Processo.id.in_(processos))
+            )
+        )
+    if condicoes:
+        conexao.execute(
+            update(models.Preso.__table__).where(or_(*condicoes)).values(atualizado_em=func.now())
+        )
+    return bool(condicoes)
+
+
+def tocar(db: Session, processos=(), presos=()):
+    """
+    Incrementa a versão dos processos informados, dos presos deles e dos
+    presos informados. Para escritas em lote que não passam pelo flush.
+    `processos`/`presos`: ids ou subconsulta que devolve ids, ex.:
+
+        tocar(db, processos=select(Evento.processo_id).where(Evento.id.in_(ids)))
+    """
+    if _incrementar(db.connection(), processos, presos):
+        _expirar_versoes(db)
+
+
+def _expirar_versoes(session):
+    # Objetos já carregados nesta sessão ficaram com a versão antiga
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, (models.Preso, models.Processo)):
+            session.expire(obj, ["versao", "atualizado_em"])
+
+
+def _ids_referenciados(obj, atributo: str) -> set:
+    # Valor atual e, se o filho mudou de pai, o anterior também
+    historico = inspect(obj).attrs[atributo].history
+    valores = (*historico.added, *historico.unchanged, *historico.deleted)
+    return {valor for valor in valores if valor is not None}
+
+
+@event.listens_for(Session, "after_flush")
+def _incrementar_pais(session, flush_context):
+    # Aqui session.new/dirty/deleted ainda mostram o que o flush gravou
+    processos, presos = set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, models.Evento):
+            processos |= _ids_referenciados(obj, "processo_id")
+        elif isinstance(obj, models.Processo):
+            presos |= _ids_referenciados(obj, "preso_id")
+    if _incrementar(session.connection(), processos, presos):
+        session.info[_CHAVE_SESSAO] = True
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _expirar_apos_flush(session, flush_context):
+    if session.info.pop(_CHAVE_SESSAO, False):
+        _expirar_versoes(session)
@@ -0,0 +1,271 @@
+"""
+Benchmark de regressão da busca de presos (crud.search_presos).
+
+Compara a estratégia antiga (OUTER JOIN + joinedload de processos e eventos
++ DISTINCT + OFFSET/LIMIT) com a atual (página de presos filtrada com EXISTS
+e filhos via selectinload). Para cada cenário mede:
+
+- tamanho da página devolvida x esperado (COUNT dos presos que casam);
+- quantidade de consultas, de linhas e de células (linhas x colunas) que o
+  banco devolveu; no joinedload cada linha de evento repete as colunas do
+  preso e do processo;
+- tempo (mediana).
+
+Sai com código 1 se a busca atual devolver uma página de tamanho errado ou
+se as linhas lidas passarem de presos + processos + eventos da página
+(ou seja, se voltar a existir produto cartesiano).
+
+Uso (na pasta backend/):
+    python benchmarks/busca_presos.py
+    python benchmarks/busca_presos.py --presos 20000 --saida busca.json
+    python benchmarks/busca_presos.py --url postgresql://... (banco de teste!)
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATUS = ["Ativo", "Aguardando julgamento", "Cumprindo pena", "Arquivado"]
+
+
+def _popular(engine, models, total_presos, processos_por_preso, eventos_por_processo):
+    from sqlalchemy import func, insert, select
+
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(models.Preso)).scalar():
+            return
+
+    rnd = random.Random(42)
+    agora = datetime.now(timezone.utc)
+    lote = 5000
+    total_processos = total_presos * processos_por_preso
+
+    with engine.begin() as conn:
+        for inicio in range(0, total_presos, lote):
+            conn.execute(
+                insert(models.Preso),
+                [
+                    {"nome_completo": f"Preso Sintetico {rnd.choice('ABCDEFGH')} {i}"}
+                    for i in range(inicio, min(inicio + lote, total_presos))
+                ],
+            )
+        for inicio in range(0, total_processos, lote):
+            conn.execute(
+                insert(models.Processo),
+                [
+                    {
+                        "numero_processo": f"{i:07d}",
+                        "preso_id": (i // processos_por_preso) + 1,
+                        "status_processual": rnd.choice(STATUS),
+                        "data_prisao": date(2024, 1, 1) + timedelta(days=rnd.randint(0, 30)),
+                    }
+                    for i in range(inicio, min(inicio + lote, total_processos))
+                ],
+            )
+        total_eventos = total_processos * eventos_por_processo
+        for inicio in range(0, total_eventos, lote):
+            conn.execute(
+                insert(models.Evento),
+                [
+                    {
+                        "data_evento": agora + timedelta(days=rnd.randint(-700, 90)),
+                        "tipo_evento": models.TipoEventoEnum.audiencia,
+                        "alerta_status": models.AlertaStatusEnum.concluido,
+                        "processo_id": (i // eventos_por_processo) + 1,
+                    }
+                    for i in range(inicio, min(inicio + lote, total_eventos))
+                ],
+            )
+        conn.exec_driver_sql("ANALYZE")
+
+
+def _busca_antiga(db, models, nome=None, status_processual=None, data_prisao=None, skip=0, limit=100):
+    """Reprodução da versão original de crud.search_presos."""
+    from sqlalchemy import func
+    from sqlalchemy.orm import joinedload
+
+    query = (
+        db.query(models.Preso)
+        .outerjoin(models.Processo)
+        .options(joinedload(models.Preso.processos).joinedload(models.Processo.eventos))
+    )
+    if nome:
+        query = query.filter(func.lower(models.Preso.nome_completo).ilike(f"%{nome.lower()}%"))
+    if status_processual:
+        query = query.filter(models.Processo.status_processual == status_processual)
+    if data_prisao:
+        query = query.filter(models.Processo.data_prisao == data_prisao)
+    return query.distinct().order_by(models.Preso.nome_completo.asc()).offset(skip).limit(limit).all()
+
+
+class _Contador:
+    """Guarda as consultas executadas para depois contar as linhas de cada uma."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.engine = engine
+        self.consultas = []
+        self.celulas = 0
+        self._event = event
+        self._event.listen(engine, "before_cursor_execute", self._registrar)
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.consultas.append((statement, parameters))
+
+    def parar(self):
+        self._event.remove(self.engine, "before_cursor_execute", self._registrar)
+
+    def linhas(self):
+        """
+        Reexecuta cada SELECT para saber quantas linhas e células ele
+        devolveu. Retorna (linhas, células).
+        """
+        linhas = celulas = 0
+        conexao = self.engine.raw_connection()
+        try:
+            cursor = conexao.cursor()
+            for statement, parameters in self.consultas:
+                cursor.execute(statement, parameters)
+                quantidade = len(cursor.fetchall())
+                linhas += quantidade
+                celulas += quantidade * len(cursor.description)
+            cursor.close()
+        finally:
+            conexao.close()
+        return linhas, celulas
+
+
+def _esperado(db, crud, models, filtros, skip, limit):
+    from sqlalchemy import func, select
+
+    consulta = crud._filtrar_presos(select(models.Preso.id), db, **filtros)
+    total = db.execute(select(func.count()).select_from(consulta.order_by(None).subquery())).scalar()
+    return max(0, min(limit, total - skip))
+
+
+def _medir(engine, SessionLocal, buscar, filtros, skip, limit, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        with SessionLocal() as db:
+            inicio = time.perf_counter()
+            buscar(db, skip=skip, limit=limit, **filtros)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+    with SessionLocal() as db:
+        contador = _Contador(engine)
+        try:
+            presos = buscar(db, skip=skip, limit=limit, **filtros)
+            filhos = sum(len(p.processos) + sum(len(pr.eventos) for pr in p.processos) for p in presos)
+        finally:
+            contador.parar()
+    linhas, celulas = contador.linhas()
+    return {
+        "pagina": len(presos),
+        "registros_carregados": len(presos) + filhos,
+        "consultas": len(contador.consultas),
+        "linhas_lidas": linhas,
+        "celulas_lidas": celulas,
+        "mediana_ms": round(statistics.median(tempos), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="DATABASE_URL do banco de teste (padrão: SQLite temporário)")
+    parser.add_argument("--presos", type=int, default=2000)
+    parser.add_argument("--processos-por-preso", type=int, default=3)
+    parser.add_argument("--eventos-por-processo", type=int, default=10)
+    parser.add_argument("--limite", type=int, default=100, help="tamanho da página")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_busca.db")
+    os.environ["DATABASE_URL"] = url
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from app import busca, crud, models
+    from app.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    busca.configurar_busca(engine)
+    _popular(engine, models, args.presos, args.processos_por_preso, args.eventos_por_processo)
+
+    cenarios = {
+        "sem_filtro": ({}, 0),
+        "sem_filtro_pagina_10": ({}, args.limite * 10),
+        "status": ({"status_processual": "Ativo"}, 0),
+        "status_e_data": ({"status_processual": "Ativo", "data_prisao": date(2024, 1, 10)}, 0),
+        "nome": ({"nome": "Sintetico A"}, 0),
+    }
+    estrategias = {
+        "antes": lambda db, **kw: _busca_antiga(db, models, **kw),
+        "depois": crud.search_presos,
+    }
+
+    resultado = {}
+    falhas = []
+    for nome_cenario, (filtros, skip) in cenarios.items():
+        with SessionLocal() as db:
+            esperado = _esperado(db, crud, models, filtros, skip, args.limite)
+        resultado[nome_cenario] = {"pagina_esperada": esperado}
+        for nome_estrategia, buscar in estrategias.items():
+            resultado[nome_cenario][nome_estrategia] = _medir(
+                engine, SessionLocal, buscar, filtros, skip, args.limite, args.repeticoes
+            )
+
+        depois = resultado[nome_cenario]["depois"]
+        if depois["pagina"] != esperado:
+            falhas.append(f"{nome_cenario}: página com {depois['pagina']} presos, esperado {esperado}")
+        # Com selectinload cada linha lida vira exatamente um registro da resposta
+        if depois["linhas_lidas"] > depois["registros_carregados"]:
+            falhas.append(
+                f"{nome_cenario}: {depois['linhas_lidas']} linhas lidas para "
+                f"{depois['registros_carregados']} registros"
+            )
+
+    for nome_cenario, medidas in resultado.items():
+        antes, depois = medidas["antes"], medidas["depois"]
+        print(
+            f"{nome_cenario:<22} página {antes['pagina']:>4} -> {depois['pagina']:>4} "
+            f"(esperado {medidas['pagina_esperada']:>4}) | "
+            f"linhas {antes['linhas_lidas']:>7} -> {depois['linhas_lidas']:>6} | "
+            f"células {antes['celulas_lidas']:>8} -> {depois['celulas_lidas']:>7} | "
+            f"consultas {antes['consultas']} -> {depois['consultas']} | "
+            f"{antes['mediana_ms']:>9} ms -> {depois['mediana_ms']:>8} ms"
+        )
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(
+                {
+                    "url": engine.url.render_as_string(),
+                    "presos": args.presos,
+                    "processos_por_preso": args.processos_por_preso,
+                    "eventos_por_processo": args.eventos_por_processo,
+                    "limite": args.limite,
+                    "cenarios": resultado,
+                    "falhas": falhas,
+                },
+                arquivo,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+    if falhas:
+        print("\nFALHAS:\n  " + "\n  ".join(falhas))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
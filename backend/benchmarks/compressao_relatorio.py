@@ -0,0 +1,182 @@
+"""
+Benchmark da compressão das respostas em /api/relatorios/completo.
+
+Sobe a aplicação com uvicorn numa porta local e baixa o relatório (JSON e
+NDJSON em streaming) pedindo `identity`, `gzip` e `br`. Para cada caso mede:
+
+- bytes que passaram pelo socket (corpo como veio, ainda comprimido);
+- tempo até o primeiro byte e até o último byte (mediana);
+- tempo até o último byte estimado num link de --banda-mbps: o medido aqui
+  (localhost, banda praticamente infinita, então só conta o custo de CPU)
+  mais bytes / banda. É a conta que importa para quem baixa pela internet.
+
+Sai com código 1 se alguma resposta comprimida vier sem Content-Encoding
+ou não descomprimir para o mesmo conteúdo da resposta sem compressão.
+
+Uso (na pasta backend/):
+    python benchmarks/compressao_relatorio.py
+    python benchmarks/compressao_relatorio.py --presos 5000 --banda-mbps 10 --saida compressao.json
+"""
+import argparse
+import gzip
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODIFICACOES = ["identity", "gzip", "br"]
+FORMATOS = ["json", "ndjson"]
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _subir_servidor(app, porta):
+    import uvicorn
+
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=porta, log_level="warning"))
+    thread = threading.Thread(target=servidor.run, daemon=True)
+    thread.start()
+    while not servidor.started:
+        time.sleep(0.05)
+    return servidor, thread
+
+
+def _baixar(cliente, url, codificacao):
+    """Retorna (bytes no socket, ttfb ms, ttlb ms, content-encoding, corpo)."""
+    inicio = time.perf_counter()
+    primeiro = None
+    partes = []
+    with cliente.stream("GET", url, headers={"Accept-Encoding": codificacao}) as resposta:
+        resposta.raise_for_status()
+        for parte in resposta.iter_raw():
+            if primeiro is None:
+                primeiro = time.perf_counter()
+            partes.append(parte)
+        fim = time.perf_counter()
+        encoding = resposta.headers.get("content-encoding")
+    corpo = b"".join(partes)
+    return len(corpo), (primeiro - inicio) * 1000, (fim - inicio) * 1000, encoding, corpo
+
+
+def _descomprimir(corpo, encoding):
+    if encoding == "gzip":
+        return gzip.decompress(corpo)
+    if encoding == "br":
+        import brotli
+
+        return brotli.decompress(corpo)
+    return corpo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="DATABASE_URL do banco de teste (padrão: SQLite temporário)")
+    parser.add_argument("--presos", type=int, default=2000)
+    parser.add_argument("--processos-por-preso", type=int, default=2)
+    parser.add_argument("--eventos-por-processo", type=int, default=5)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--banda-mbps", type=float, default=20.0, help="banda do link simulado")
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_compressao.db")
+    os.environ["DATABASE_URL"] = url
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import httpx
+
+    from busca_presos import _popular
+    from app import compressao, models
+    from app.cache_usuarios import UsuarioAutenticado
+    from app.database import engine
+    from app.main import app, get_current_user
+
+    _popular(engine, models, args.presos, args.processos_por_preso, args.eventos_por_processo)
+    # O benchmark mede a resposta, não o login
+    app.dependency_overrides[get_current_user] = lambda: UsuarioAutenticado(
+        id=0, cpf="00000000000", nome_completo="Benchmark", email=None,
+        role="admin", is_active=True, preferencia_tema="light",
+    )
+
+    codificacoes = [c for c in CODIFICACOES if c != "br" or compressao.brotli is not None]
+    porta = _porta_livre()
+    servidor, thread = _subir_servidor(app, porta)
+    resultado = {}
+    falhas = []
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{porta}", timeout=600) as cliente:
+            for formato in FORMATOS:
+                caminho = f"/api/relatorios/completo?formato={formato}"
+                resultado[formato] = {}
+                referencia = None
+                for codificacao in codificacoes:
+                    _baixar(cliente, caminho, codificacao)  # aquecimento
+                    medidas = [_baixar(cliente, caminho, codificacao) for _ in range(args.repeticoes)]
+                    tamanho, _, _, encoding, corpo = medidas[-1]
+                    conteudo = _descomprimir(corpo, encoding)
+                    if codificacao == "identity":
+                        referencia = conteudo
+                    elif encoding != codificacao:
+                        falhas.append(f"{formato}/{codificacao}: Content-Encoding {encoding!r}")
+                    elif conteudo != referencia:
+                        falhas.append(f"{formato}/{codificacao}: conteúdo descomprimido difere")
+
+                    ttlb = statistics.median(m[2] for m in medidas)
+                    resultado[formato][codificacao] = {
+                        "bytes": tamanho,
+                        "ttfb_ms": round(statistics.median(m[1] for m in medidas), 1),
+                        "ttlb_ms": round(ttlb, 1),
+                        "ttlb_estimado_ms": round(ttlb + tamanho * 8 / (args.banda_mbps * 1000), 1),
+                    }
+    finally:
+        servidor.should_exit = True
+        thread.join()
+
+    for formato, medidas in resultado.items():
+        base = medidas["identity"]
+        for codificacao, m in medidas.items():
+            print(
+                f"{formato:<7} {codificacao:<9} {m['bytes']:>11} bytes "
+                f"({m['bytes'] / base['bytes']:>6.1%}) | ttfb {m['ttfb_ms']:>8} ms | "
+                f"ttlb {m['ttlb_ms']:>8} ms | ttlb a {args.banda_mbps:g} Mbps {m['ttlb_estimado_ms']:>9} ms"
+            )
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(
+                {
+                    "url": engine.url.render_as_string(),
+                    "presos": args.presos,
+                    "processos_por_preso": args.processos_por_preso,
+                    "eventos_por_processo": args.eventos_por_processo,
+                    "banda_mbps": args.banda_mbps,
+                    "minimo_bytes": compressao.COMPRESSAO_MINIMO_BYTES,
+                    "nivel_gzip": compressao.COMPRESSAO_NIVEL_GZIP,
+                    "nivel_brotli": compressao.COMPRESSAO_NIVEL_BROTLI,
+                    "formatos": resultado,
+                    "falhas": falhas,
+                },
+                arquivo,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+    if falhas:
+        print("\nFALHAS:\n  " + "\n  ".join(falhas))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
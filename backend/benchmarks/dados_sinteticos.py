@@ -0,0 +1,242 @@
+"""
+Gerador de dados sintéticos (e reproduzíveis) para os benchmarks.
+
+Gera presos, processos e eventos com cara de dado real, sempre iguais para a
+mesma semente:
+
+- presos com nome e nome da mãe compostos de listas de nomes comuns, CPF
+  válido (dígitos verificadores corretos, sem repetição; ~5% sem CPF) e
+  nascimento entre 1960 e 2006;
+- processos com número no padrão CNJ (com o dígito verificador mod 97),
+  status, tipo de prisão, data da prisão e unidade; todo preso tem pelo
+  menos um processo e o resto é sorteado (uns presos acumulam vários);
+- eventos espalhados entre dois anos atrás e quatro meses à frente, com o
+  status de alerta coerente com a data (passados concluídos ou disparados,
+  os da próxima semana pendentes ou disparados, os futuros pendentes).
+  As datas dos eventos são relativas ao momento da geração.
+
+Os inserts são em lote pelo Core com ids explícitos (no PostgreSQL as
+sequences são acertadas no fim). Se o banco já tiver presos, nada é gerado:
+o mesmo arquivo/banco pode ser reaproveitado entre execuções e commits.
+
+Uso (na pasta backend/):
+    python benchmarks/dados_sinteticos.py --url sqlite:///./bench.db
+    python benchmarks/dados_sinteticos.py --url postgresql://... --presos 100000 --processos 300000 --eventos 2000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRIMEIROS_NOMES = [
+    "José", "João", "Antônio", "Francisco", "Carlos", "Paulo", "Pedro", "Lucas", "Luiz", "Marcos",
+    "Luís", "Gabriel", "Rafael", "Daniel", "Marcelo", "Bruno", "Eduardo", "Felipe", "Raimundo", "Rodrigo",
+    "Manoel", "Mateus", "André", "Fernando", "Fábio", "Leonardo", "Gustavo", "Guilherme", "Leandro", "Tiago",
+    "Anderson", "Ricardo", "Márcio", "Jorge", "Sebastião", "Alexandre", "Roberto", "Edson", "Diego", "Vitor",
+]
+NOMES_FEMININOS = [
+    "Maria", "Ana", "Francisca", "Antônia", "Adriana", "Juliana", "Márcia", "Fernanda", "Patrícia", "Aline",
+    "Sandra", "Camila", "Amanda", "Bruna", "Jéssica", "Letícia", "Júlia", "Luciana", "Vanessa", "Mariana",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa",
+    "Rocha", "Dias", "Nascimento", "Andrade", "Moreira", "Nunes", "Marques", "Machado", "Mendes", "Freitas",
+    "Cardoso", "Ramos", "Gonçalves", "Santana", "Teixeira", "Araújo", "Cavalcanti", "Monteiro", "Moura", "Correia",
+]
+STATUS_PROCESSUAIS = [
+    ("Aguardando julgamento", 40), ("Ativo", 25), ("Cumprindo pena", 20),
+    ("Em recurso", 8), ("Arquivado", 5), ("Extinto", 2),
+]
+TIPOS_PRISAO = ["Preventiva", "Temporária", "Definitiva", "Flagrante"]
+UNIDADES = ["CDP I", "CDP II", "Penitenciária Estadual", "Cadeia Pública", "Presídio Regional", "CPP"]
+TIPOS_GUIA = ["Recolhimento", "Internamento", "Execução provisória"]
+DESCRICOES = {
+    "audiencia": "Audiência de instrução e julgamento",
+    "reavaliacao_preventiva": "Reavaliação da prisão preventiva (art. 316 CPP)",
+    "prazo_recurso": "Fim do prazo para recurso",
+    "remessa_tribunal": "Remessa dos autos ao tribunal",
+    "outro": "Diligência",
+}
+
+# Multiplicador coprimo com 10^9: i -> base do CPF sem repetição
+_PASSO_CPF = 387_420_489
+LOTE = 10_000
+
+
+def cpf_valido(base: int) -> str:
+    """CPF de 11 dígitos a partir de uma base de 9 dígitos (calcula os verificadores)."""
+    digitos = [int(c) for c in f"{base:09d}"]
+    for tamanho in (9, 10):
+        soma = sum(d * peso for d, peso in zip(digitos, range(tamanho + 1, 1, -1)))
+        resto = soma * 10 % 11
+        digitos.append(0 if resto == 10 else resto)
+    return "".join(map(str, digitos))
+
+
+def numero_cnj(sequencial: int, ano: int, segmento: int = 8, tribunal: int = 26, origem: int = 1) -> str:
+    """Número de processo no padrão CNJ (NNNNNNN-DD.AAAA.J.TR.OOOO), dígito mod 97."""
+    n = f"{sequencial % 10_000_000:07d}"
+    resto = int(f"{n}{ano:04d}{segmento}{tribunal:02d}{origem:04d}00") % 97
+    return f"{n}-{98 - resto:02d}.{ano:04d}.{segmento}.{tribunal:02d}.{origem:04d}"
+
+
+def _nome(rnd, primeiros) -> str:
+    return f"{rnd.choice(primeiros)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+
+
+def _status_alerta(models, data_evento, agora, rnd):
+    if data_evento < agora:
+        return models.AlertaStatusEnum.concluido if rnd.random() < 0.8 else models.AlertaStatusEnum.disparado
+    if data_evento <= agora + timedelta(days=7):
+        return models.AlertaStatusEnum.pendente if rnd.random() < 0.5 else models.AlertaStatusEnum.disparado
+    return models.AlertaStatusEnum.pendente
+
+
+def _inserir_em_lotes(conn, tabela, linhas, progresso):
+    lote = []
+    inseridos = 0
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) == LOTE:
+            conn.execute(tabela.insert(), lote)
+            inseridos += len(lote)
+            lote = []
+            progresso(inseridos)
+    if lote:
+        conn.execute(tabela.insert(), lote)
+        inseridos += len(lote)
+    progresso(inseridos)
+
+
+def gerar(engine, models, presos: int, processos: int, eventos: int, semente: int = 42, verboso: bool = True) -> dict:
+    """
+    Popula o banco (tabelas já criadas) com os volumes pedidos. Retorna as
+    quantidades existentes; não gera nada se já houver presos.
+    """
+    from sqlalchemy import func, select, text
+
+    def contar():
+        with engine.connect() as conn:
+            return {
+                tabela.name: conn.execute(select(func.count()).select_from(tabela)).scalar()
+                for tabela in (models.Preso.__table__, models.Processo.__table__, models.Evento.__table__)
+            }
+
+    existentes = contar()
+    if existentes["presos"]:
+        return {**existentes, "gerado": False, "segundos": 0.0}
+
+    processos = max(processos, presos)
+    rnd = random.Random(semente)
+    agora = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    inicio = time.perf_counter()
+
+    no_terminal = sys.stdout.isatty()
+
+    def progresso(nome, total):
+        def mostrar(feitos):
+            # Fora do terminal (CI, arquivo de log) só a linha final
+            if verboso and (no_terminal or feitos >= total):
+                print(f"\r  {nome}: {feitos}/{total}", end="" if feitos < total else "\n", flush=True)
+        return mostrar
+
+    def linhas_presos():
+        for i in range(1, presos + 1):
+            nome = _nome(rnd, PRIMEIROS_NOMES)
+            yield {
+                "id": i,
+                "nome_completo": nome,
+                "nome_busca": models.normalizar_nome_busca(nome),
+                "cpf": cpf_valido(i * _PASSO_CPF % 1_000_000_000) if rnd.random() >= 0.05 else None,
+                "nome_da_mae": _nome(rnd, NOMES_FEMININOS),
+                "data_nascimento": date(1960, 1, 1) + timedelta(days=rnd.randint(0, 46 * 365)),
+            }
+
+    status, pesos = zip(*STATUS_PROCESSUAIS)
+
+    def linhas_processos():
+        for i in range(1, processos + 1):
+            data_prisao = date(2015, 1, 1) + timedelta(days=rnd.randint(0, 10 * 365))
+            yield {
+                "id": i,
+                # Todo preso tem ao menos um processo; os demais são sorteados
+                "preso_id": i if i <= presos else rnd.randint(1, presos),
+                "numero_processo": numero_cnj(i, data_prisao.year, tribunal=rnd.choice((5, 13, 19, 26))),
+                "status_processual": rnd.choices(status, pesos)[0],
+                "tipo_prisao": rnd.choice(TIPOS_PRISAO),
+                "data_prisao": data_prisao,
+                "local_segregacao": rnd.choice(UNIDADES),
+                "numero_da_guia": f"{rnd.randint(1, 999999):06d}/{data_prisao.year}" if rnd.random() < 0.6 else None,
+                "tipo_guia": rnd.choice(TIPOS_GUIA) if rnd.random() < 0.6 else None,
+            }
+
+    tipos = list(models.TipoEventoEnum)
+
+    def linhas_eventos():
+        for i in range(1, eventos + 1):
+            data_evento = agora + timedelta(hours=rnd.randint(-730 * 24, 120 * 24))
+            tipo = rnd.choice(tipos)
+            yield {
+                "id": i,
+                "processo_id": rnd.randint(1, processos),
+                "data_evento": data_evento,
+                "tipo_evento": tipo,
+                "descricao": DESCRICOES[tipo.value],
+                "alerta_status": _status_alerta(models, data_evento, agora, rnd),
+            }
+
+    with engine.begin() as conn:
+        _inserir_em_lotes(conn, models.Preso.__table__, linhas_presos(), progresso("presos", presos))
+        _inserir_em_lotes(conn, models.Processo.__table__, linhas_processos(), progresso("processos", processos))
+        _inserir_em_lotes(conn, models.Evento.__table__, linhas_eventos(), progresso("eventos", eventos))
+        if engine.dialect.name == "postgresql":
+            # Os ids foram explícitos: a sequence continua de onde os dados pararam
+            for tabela in ("presos", "processos", "eventos"):
+                conn.execute(
+                    text(f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT MAX(id) FROM {tabela}))")
+                )
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    return {**contar(), "gerado": True, "segundos": round(time.perf_counter() - inicio, 1)}
+
+
+def preparar_banco(engine, models, busca):
+    """Mesmo preparo do startup da API (tabelas e índices de busca)."""
+    models.Base.metadata.create_all(bind=engine)
+    busca.configurar_busca(engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="DATABASE_URL do banco de teste (será populado!)")
+    parser.add_argument("--presos", type=int, default=100_000)
+    parser.add_argument("--processos", type=int, default=300_000)
+    parser.add_argument("--eventos", type=int, default=2_000_000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.url
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from app import busca, models
+    from app.database import engine
+
+    preparar_banco(engine, models, busca)
+    resultado = gerar(engine, models, args.presos, args.processos, args.eventos, args.semente)
+    if not resultado["gerado"]:
+        print("O banco já tem presos; nada foi gerado.")
+    print(
+        f"presos {resultado['presos']} | processos {resultado['processos']} | "
+        f"eventos {resultado['eventos']} | {resultado['segundos']} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
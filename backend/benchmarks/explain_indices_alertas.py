@@ -0,0 +1,196 @@
+"""
+Benchmark antes/depois da migração 0001_indices_alertas.
+
+Cria (ou reaproveita) um banco com dados sintéticos, remove os índices da
+migração, mede as consultas de alerta com EXPLAIN e tempo de execução,
+roda `alembic upgrade head` e mede de novo.
+
+Uso (na pasta backend/):
+    python benchmarks/explain_indices_alertas.py
+    python benchmarks/explain_indices_alertas.py --url postgresql://... --eventos 500000
+
+Sem --url usa um SQLite temporário. ATENÇÃO: o script remove e recria os
+índices no banco informado; não aponte para produção.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONSULTAS = {
+    # Mesmo formato gerado por alertas.filtro_alerta_disparado
+    "alertas_ativos": (
+        "SELECT id FROM eventos "
+        "WHERE alerta_status IN ('pendente', 'disparado') "
+        "AND (alerta_status = 'disparado' "
+        "OR (alerta_status = 'pendente' AND data_evento <= :limite)) "
+        "ORDER BY data_evento LIMIT 20"
+    ),
+    "contadores_alertas": (
+        "SELECT count(id) FROM eventos "
+        "WHERE alerta_status IN ('pendente', 'disparado') "
+        "AND (alerta_status = 'disparado' "
+        "OR (alerta_status = 'pendente' AND data_evento <= :limite))"
+    ),
+    "alertas_proximos": (
+        "SELECT id FROM eventos "
+        "WHERE alerta_status IN ('pendente', 'disparado') "
+        "ORDER BY data_evento LIMIT 50"
+    ),
+    "transicao_pendentes": (
+        "SELECT id FROM eventos "
+        "WHERE data_evento <= :limite AND alerta_status = 'pendente'"
+    ),
+    "eventos_do_processo": "SELECT id FROM eventos WHERE processo_id = :processo_id",
+    "processos_do_preso": "SELECT id FROM processos WHERE preso_id = :preso_id",
+}
+
+
+def _popular(engine, models, total_eventos):
+    from sqlalchemy import func, insert, select
+
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(models.Evento)).scalar():
+            return
+
+    rnd = random.Random(42)
+    agora = datetime.now(timezone.utc)
+    total_presos = max(1, total_eventos // 20)
+    lote = 5000
+
+    with engine.begin() as conn:
+        for inicio in range(0, total_presos, lote):
+            conn.execute(
+                insert(models.Preso),
+                [{"nome_completo": f"Preso Sintetico {i}"} for i in range(inicio, min(inicio + lote, total_presos))],
+            )
+        conn.execute(
+            insert(models.Processo),
+            [
+                {"numero_processo": f"{i:07d}", "preso_id": (i % total_presos) + 1}
+                for i in range(total_presos * 3)
+            ],
+        )
+        for inicio in range(0, total_eventos, lote):
+            linhas = []
+            for _ in range(inicio, min(inicio + lote, total_eventos)):
+                sorteio = rnd.random()
+                if sorteio < 0.80:  # histórico já concluído
+                    status, dias = models.AlertaStatusEnum.concluido, -rnd.randint(1, 1500)
+                elif sorteio < 0.95:  # futuro, ainda fora da janela
+                    status, dias = models.AlertaStatusEnum.pendente, rnd.randint(1, 365)
+                else:
+                    status, dias = models.AlertaStatusEnum.disparado, rnd.randint(-3, 7)
+                linhas.append(
+                    {
+                        "data_evento": agora + timedelta(days=dias),
+                        "tipo_evento": models.TipoEventoEnum.audiencia,
+                        "alerta_status": status,
+                        "processo_id": rnd.randint(1, total_presos * 3),
+                    }
+                )
+            conn.execute(insert(models.Evento), linhas)
+
+
+def _explain(conn, sql, params):
+    from sqlalchemy import text
+
+    if conn.dialect.name == "postgresql":
+        linhas = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql), params).all()
+        return [linha[0] for linha in linhas]
+    linhas = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+    return [linha[-1] for linha in linhas]
+
+
+def _medir(engine, repeticoes):
+    from sqlalchemy import text
+
+    params = {
+        "limite": datetime.now(timezone.utc) + timedelta(days=7),
+        "processo_id": 1,
+        "preso_id": 1,
+    }
+    resultado = {}
+    with engine.connect() as conn:
+        for nome, sql in CONSULTAS.items():
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            resultado[nome] = {
+                "mediana_ms": round(statistics.median(tempos), 3),
+                "plano": _explain(conn, sql, params),
+            }
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="DATABASE_URL do banco de teste (padrão: SQLite temporário)")
+    parser.add_argument("--eventos", type=int, default=100000, help="quantidade de eventos sintéticos")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_indices.db")
+    os.environ["DATABASE_URL"] = url
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+
+    from app import models
+    from app.database import engine
+
+    spec = importlib.util.spec_from_file_location(
+        "migracao_indices", os.path.join(BACKEND_DIR, "migrations", "versions", "0001_indices_alertas.py")
+    )
+    migracao = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migracao)
+
+    models.Base.metadata.create_all(bind=engine)
+    _popular(engine, models, args.eventos)
+
+    # "Antes": remove os índices da migração
+    with engine.begin() as conn:
+        for nome in migracao.INDICES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {nome}"))
+        conn.execute(text("ANALYZE"))
+    antes = _medir(engine, args.repeticoes)
+
+    # "Depois": aplica a migração de verdade
+    cfg = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    command.stamp(cfg, "base")
+    command.upgrade(cfg, "head")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    depois = _medir(engine, args.repeticoes)
+
+    for nome in CONSULTAS:
+        print(f"\n=== {nome}: {antes[nome]['mediana_ms']} ms -> {depois[nome]['mediana_ms']} ms")
+        print("  antes:  " + "\n          ".join(antes[nome]["plano"]))
+        print("  depois: " + "\n          ".join(depois[nome]["plano"]))
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(
+                {"url": engine.url.render_as_string(), "eventos": args.eventos, "antes": antes, "depois": depois},
+                arquivo,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+
+if __name__ == "__main__":
+    main()
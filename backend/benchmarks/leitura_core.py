@@ -0,0 +1,142 @@
+"""
+Benchmark da leitura das fichas completas (List[PresoDetalhe]): ORM x Core.
+
+Para a mesma página de presos (com processos e eventos) compara:
+
+- orm: `crud.search_presos` (objetos ORM + selectinload) validados com
+  `from_attributes` e serializados por `respostas.serializar`;
+- core: `leitura.presos_detalhados` (três SELECTs só com as colunas dos
+  schemas, linhas agrupadas em dicts) serializado do mesmo jeito.
+
+Mede o tempo da consulta + montagem e o da serialização separadamente
+(mediana) e o pico de memória alocada (tracemalloc). Sai com código 1 se os
+dois caminhos não gerarem exatamente os mesmos bytes.
+
+Uso (na pasta backend/):
+    python benchmarks/leitura_core.py
+    python benchmarks/leitura_core.py --presos 20000 --limit 10000 --saida leitura.json
+    python benchmarks/leitura_core.py --url postgresql://... (banco de teste!)
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _medir(carregar, serializar, repeticoes):
+    tempos_carga, tempos_json = [], []
+    corpo = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        dados = carregar()
+        meio = time.perf_counter()
+        corpo = serializar(dados)
+        tempos_carga.append((meio - inicio) * 1000)
+        tempos_json.append((time.perf_counter() - meio) * 1000)
+
+    tracemalloc.start()
+    serializar(carregar())
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return corpo, statistics.median(tempos_carga), statistics.median(tempos_json), pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="DATABASE_URL do banco de teste (padrão: SQLite temporário)")
+    parser.add_argument("--presos", type=int, default=10000)
+    parser.add_argument("--processos-por-preso", type=int, default=2)
+    parser.add_argument("--eventos-por-processo", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=10000, help="tamanho da página lida")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_leitura.db")
+    os.environ["DATABASE_URL"] = url
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from typing import List
+
+    from busca_presos import _popular
+    from app import crud, leitura, models, respostas, schemas
+    from app.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    _popular(engine, models, args.presos, args.processos_por_preso, args.eventos_por_processo)
+    tipo = List[schemas.PresoDetalhe]
+
+    def com_sessao(funcao):
+        def carregar():
+            # Sessão nova a cada rodada: o ORM não reaproveita o identity map
+            with SessionLocal() as db:
+                return funcao(db)
+        return carregar
+
+    caminhos = {
+        "orm": com_sessao(lambda db: crud.search_presos(db, limit=args.limit)),
+        "core": com_sessao(lambda db: leitura.presos_detalhados(db, limit=args.limit)),
+    }
+
+    def serializar(dados):
+        # Os objetos ORM ficam destacados depois que a sessão fecha, mas
+        # tudo já veio carregado (selectinload), então a validação não consulta
+        return respostas.serializar(tipo, dados)
+
+    resultado = {}
+    corpos = {}
+    for nome, carregar in caminhos.items():
+        serializar(carregar())  # aquecimento
+        corpos[nome], carga, tempo_json, pico = _medir(carregar, serializar, args.repeticoes)
+        resultado[nome] = {
+            "carga_ms": round(carga, 1),
+            "serializacao_ms": round(tempo_json, 1),
+            "total_ms": round(carga + tempo_json, 1),
+            "pico_memoria_mb": round(pico / 1024 / 1024, 1),
+            "bytes": len(corpos[nome]),
+        }
+
+    falhas = []
+    if corpos["core"] != corpos["orm"]:
+        falhas.append("core: JSON diferente do caminho ORM")
+
+    base = resultado["orm"]["total_ms"]
+    for nome, m in resultado.items():
+        print(
+            f"{nome:<5} carga {m['carga_ms']:>9} ms | json {m['serializacao_ms']:>8} ms | "
+            f"total {m['total_ms']:>9} ms ({base / m['total_ms']:>5.2f}x) | "
+            f"pico {m['pico_memoria_mb']:>7} MB | {m['bytes']} bytes"
+        )
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(
+                {
+                    "url": engine.url.render_as_string(),
+                    "presos": args.presos,
+                    "processos_por_preso": args.processos_por_preso,
+                    "eventos_por_processo": args.eventos_por_processo,
+                    "limit": args.limit,
+                    "caminhos": resultado,
+                    "falhas": falhas,
+                },
+                arquivo,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+    if falhas:
+        print("\nFALHAS:\n  " + "\n  ".join(falhas))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
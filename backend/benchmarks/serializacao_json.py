@@ -0,0 +1,176 @@
+"""
+Microbenchmark da serialização JSON das respostas grandes (List[PresoDetalhe]).
+
+Monta presos com processos e eventos em memória (objetos ORM, sem banco) e
+mede o tempo para transformá-los nos bytes da resposta de três jeitos:
+
+- padrao: o caminho do FastAPI com `response_model` (valida, converte para
+  dicts com `mode="json"`) + `json.dumps` do JSONResponse;
+- pydantic_core: o mesmo, mas renderizado pelo `respostas.JSONRapido`
+  (classe padrão da aplicação);
+- dump_json: `respostas.serializar`, que valida e gera os bytes direto com
+  `TypeAdapter.dump_json` (usado nas listagens e relatórios).
+
+Mostra a mediana e o tempo por 10 mil presos. Sai com código 1 se os três
+não gerarem o mesmo JSON.
+
+Uso (na pasta backend/):
+    python benchmarks/serializacao_json.py
+    python benchmarks/serializacao_json.py --presos 20000 --saida serializacao.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _montar_presos(models, total_presos, processos_por_preso, eventos_por_processo):
+    inicio = datetime(2025, 1, 1, 8, 0)
+    presos = []
+    processo_id = evento_id = 0
+    for i in range(1, total_presos + 1):
+        processos = []
+        for _ in range(processos_por_preso):
+            processo_id += 1
+            eventos = []
+            for k in range(eventos_por_processo):
+                evento_id += 1
+                eventos.append(
+                    models.Evento(
+                        id=evento_id,
+                        processo_id=processo_id,
+                        data_evento=inicio + timedelta(days=k, hours=i % 24),
+                        descricao=f"Audiência de instrução {k}",
+                        tipo_evento=models.TipoEventoEnum.audiencia,
+                        alerta_status=models.AlertaStatusEnum.pendente,
+                        versao=1,
+                    )
+                )
+            processos.append(
+                models.Processo(
+                    id=processo_id,
+                    preso_id=i,
+                    numero_processo=f"{processo_id:07d}-55.2024.8.26.0001",
+                    status_processual="Aguardando julgamento",
+                    tipo_prisao="Preventiva",
+                    data_prisao=date(2024, 1, 1) + timedelta(days=i % 300),
+                    local_segregacao="CDP I",
+                    versao=1,
+                    eventos=eventos,
+                )
+            )
+        presos.append(
+            models.Preso(
+                id=i,
+                nome_completo=f"Preso Sintético {i}",
+                cpf=f"{i:011d}",
+                nome_da_mae="Maria da Silva",
+                data_nascimento=date(1990, 1, 1) + timedelta(days=i % 5000),
+                criado_em=inicio,
+                versao=1,
+                processos=processos,
+            )
+        )
+    return presos
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        corpo = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return corpo, statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--presos", type=int, default=10000)
+    parser.add_argument("--processos-por-preso", type=int, default=2)
+    parser.add_argument("--eventos-por-processo", type=int, default=5)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    # Os modelos importam o engine; o banco em si não é usado
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from typing import List
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+
+    from app import models, respostas, schemas
+
+    tipo = List[schemas.PresoDetalhe]
+    campo = create_model_field(name="Response_relatorio", type_=tipo, mode="serialization")
+    presos = _montar_presos(models, args.presos, args.processos_por_preso, args.eventos_por_processo)
+
+    def caminho_fastapi(classe):
+        conteudo = asyncio.run(serialize_response(field=campo, response_content=presos))
+        return classe(conteudo).body
+
+    estrategias = {
+        "padrao": lambda: caminho_fastapi(JSONResponse),
+        "pydantic_core": lambda: caminho_fastapi(respostas.JSONRapido),
+        "dump_json": lambda: respostas.serializar(tipo, presos),
+    }
+
+    resultado = {}
+    corpos = {}
+    for nome, funcao in estrategias.items():
+        funcao()  # aquecimento (schemas, caches)
+        corpos[nome], mediana = _medir(funcao, args.repeticoes)
+        resultado[nome] = {
+            "mediana_ms": round(mediana, 1),
+            "ms_por_10k_presos": round(mediana * 10000 / args.presos, 1),
+            "bytes": len(corpos[nome]),
+        }
+
+    referencia = json.loads(corpos["padrao"])
+    falhas = [
+        f"{nome}: JSON diferente do caminho padrão"
+        for nome, corpo in corpos.items()
+        if nome != "padrao" and json.loads(corpo) != referencia
+    ]
+
+    base = resultado["padrao"]["mediana_ms"]
+    for nome, medidas in resultado.items():
+        print(
+            f"{nome:<14} {medidas['mediana_ms']:>9} ms | "
+            f"{medidas['ms_por_10k_presos']:>9} ms / 10k presos | "
+            f"{base / medidas['mediana_ms']:>5.2f}x | {medidas['bytes']} bytes"
+        )
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(
+                {
+                    "presos": args.presos,
+                    "processos_por_preso": args.processos_por_preso,
+                    "eventos_por_processo": args.eventos_por_processo,
+                    "estrategias": resultado,
+                    "falhas": falhas,
+                },
+                arquivo,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+    if falhas:
+        print("\nFALHAS:\n  " + "\n  ".join(falhas))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
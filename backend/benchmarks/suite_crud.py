@@ -0,0 +1,411 @@
+"""
+Suíte de benchmarks da camada de dados (crud, crud_async, leitura, alertas).
+
+Popula um banco com dados sintéticos (benchmarks/dados_sinteticos.py; por
+padrão 100 mil presos, 300 mil processos e 2 milhões de eventos) e roda um
+cenário cronometrado por função, medindo mediana, p95, mínimo, tempo por
+operação e quantas consultas SQL cada execução fez.
+
+Os cenários que escrevem (create_preso_completo, disparar_alertas_pendentes,
+aplicar_lote_eventos) rodam dentro de uma transação externa desfeita no fim
+(os commits viram SAVEPOINTs), então o banco continua igual e pode ser
+reaproveitado: sem --url, o SQLite fica em um arquivo temporário com os
+volumes e a semente no nome e só é gerado na primeira execução. Como os
+eventos são datados em relação ao dia da geração, compare execuções feitas
+sobre o mesmo banco, no mesmo dia (ou apague o arquivo para gerar de novo).
+
+O resultado (JSON, com o commit do git) serve de base para comparar com
+outro commit: `--comparar anterior.json` mostra a razão entre as medianas e
+sai com código 1 se algum cenário ficou mais lento que --tolerancia ou
+passou a fazer mais consultas. Também sai com 1 se algum cenário falhar.
+
+Uso (na pasta backend/):
+    python benchmarks/suite_crud.py --escala 0.1
+    python benchmarks/suite_crud.py --saida base.json
+    python benchmarks/suite_crud.py --comparar base.json --saida atual.json
+    python benchmarks/suite_crud.py --url postgresql://... (banco de teste!)
+    python benchmarks/suite_crud.py --cenarios search_presos,alertas
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SYNC, ASYNC, ESCRITA = "sync", "async", "escrita"
+
+
+def _commit_git() -> dict:
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD") or None, "alteracoes_locais": bool(git("status", "--porcelain"))}
+    except (OSError, subprocess.SubprocessError):
+        return {"commit": None, "alteracoes_locais": None}
+
+
+class _ContadorConsultas:
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.total = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._contar)
+
+    def _contar(self, conn, cursor, statement, *args):
+        # O BEGIN explícito do SQLite (ver _Executor) não é consulta da função
+        if statement != "BEGIN":
+            self.total += 1
+
+
+def _cenarios(ctx) -> dict:
+    """nome -> (tipo, função). A função recebe a sessão e devolve quantas operações fez."""
+    from app import alertas, crud, crud_async, leitura, schemas
+
+    limit = ctx.limit
+
+    def varios(funcao, ids):
+        def executar(db):
+            for preso_id in ids:
+                funcao(db, preso_id)
+            return len(ids)
+        return executar
+
+    async def varios_async(funcao, ids, db):
+        for preso_id in ids:
+            await funcao(db, preso_id)
+        return len(ids)
+
+    def cadastros(db):
+        for i in range(ctx.cadastros):
+            crud.create_preso_completo(
+                db,
+                schemas.PresoCadastroCompleto(
+                    preso=schemas.PresoCreate(nome_completo=f"Cadastro Benchmark {i}", nome_da_mae="Maria Benchmark"),
+                    processos=[
+                        schemas.ProcessoCreate(numero_processo=f"9{i:06d}-{k:02d}.2025.8.26.0001", status_processual="Ativo")
+                        for k in range(3)
+                    ],
+                ),
+            )
+        return ctx.cadastros
+
+    def lote_eventos(db):
+        agora = datetime.now(timezone.utc)
+        lote = schemas.EventoLoteRequest(
+            criar=[
+                schemas.EventoLoteCriacao(
+                    processo_id=processo_id,
+                    data_evento=agora + timedelta(days=1 + i % 30),
+                    tipo_evento="audiencia",
+                    descricao="Evento em lote (benchmark)",
+                )
+                for i, processo_id in enumerate(ctx.processo_ids)
+            ]
+        )
+        _, faltando = crud.aplicar_lote_eventos(db, lote)
+        if faltando:
+            raise RuntimeError(f"processos inexistentes no lote: {faltando}")
+        return len(lote.criar)
+
+    def contar_alertas(db):
+        alertas.invalidar_contadores()  # sem cache, senão mede só o dict
+        alertas.contar_alertas(db)
+        return 1
+
+    def uma(funcao, **kwargs):
+        def executar(db):
+            funcao(db, **kwargs)
+            return 1
+        return executar
+
+    def uma_async(funcao, **kwargs):
+        async def executar(db):
+            await funcao(db, **kwargs)
+            return 1
+        return executar
+
+    return {
+        "crud.search_presos[sem_filtro]": (SYNC, uma(crud.search_presos, limit=limit)),
+        "crud.search_presos[nome_comum]": (SYNC, uma(crud.search_presos, nome=ctx.nome_comum, limit=limit)),
+        "crud.search_presos[nome_raro]": (SYNC, uma(crud.search_presos, nome=ctx.nome_raro, limit=limit)),
+        "crud.search_presos[status]": (SYNC, uma(crud.search_presos, status_processual="Em recurso", limit=limit)),
+        "crud.search_presos[offset_profundo]": (SYNC, uma(crud.search_presos, skip=ctx.presos // 2, limit=limit)),
+        "crud.search_presos[cursor_profundo]": (SYNC, uma(crud.search_presos, apos=ctx.cursor_meio, limit=limit)),
+        "leitura.presos_detalhados[sem_filtro]": (SYNC, uma(leitura.presos_detalhados, limit=limit)),
+        "leitura.presos_detalhados[nome_comum]": (
+            SYNC, uma(leitura.presos_detalhados, nome=ctx.nome_comum, limit=limit)
+        ),
+        "leitura.iterar_presos[relatorio]": (
+            SYNC, lambda db: sum(1 for _ in itertools.islice(leitura.iterar_presos(db), ctx.relatorio))
+        ),
+        "crud.get_preso": (SYNC, varios(crud.get_preso, ctx.preso_ids)),
+        "leitura.preso_detalhado": (SYNC, varios(leitura.preso_detalhado, ctx.preso_ids)),
+        "alertas.contar_alertas": (SYNC, contar_alertas),
+        "crud_async.resumo_presos[sem_filtro]": (ASYNC, uma_async(crud_async.resumo_presos, limit=limit)),
+        "crud_async.resumo_presos[nome_comum]": (
+            ASYNC, uma_async(crud_async.resumo_presos, nome=ctx.nome_comum, limit=limit)
+        ),
+        "crud_async.presos_detalhados[sem_filtro]": (ASYNC, uma_async(crud_async.presos_detalhados, limit=limit)),
+        "crud_async.preso_detalhado": (ASYNC, lambda db: varios_async(crud_async.preso_detalhado, ctx.preso_ids, db)),
+        "crud_async.listar_alertas_ativos": (
+            ASYNC, uma_async(crud_async.listar_alertas_ativos, limite=alertas.limite_janela(), limit=limit)
+        ),
+        "crud_async.listar_proximos_alertas": (ASYNC, uma_async(crud_async.listar_proximos_alertas, limit=50)),
+        "crud.create_preso_completo": (ESCRITA, cadastros),
+        "crud.aplicar_lote_eventos[criar]": (ESCRITA, lote_eventos),
+        "alertas.disparar_alertas_pendentes": (ESCRITA, lambda db: len(alertas.disparar_alertas_pendentes(db))),
+    }
+
+
+class _Executor:
+    def __init__(self, engine, SessionLocal, AsyncSessionLocal):
+        self.engine = engine
+        self.SessionLocal = SessionLocal
+        self.AsyncSessionLocal = AsyncSessionLocal
+        self.loop = asyncio.new_event_loop()
+        if engine.dialect.name == "sqlite":
+            self._savepoints_no_sqlite(engine)
+
+    @staticmethod
+    def _savepoints_no_sqlite(engine):
+        # O pysqlite abre a transação por conta própria e o SAVEPOINT do
+        # SQLAlchemy fica fora dela (o ROLLBACK final não desfaz nada). Receita
+        # da documentação do SQLAlchemy: o driver em autocommit e BEGIN explícito.
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "connect")
+        def _conectar(conexao_dbapi, registro):
+            conexao_dbapi.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN")
+
+        engine.dispose()
+
+    def rodar(self, tipo, funcao) -> int:
+        if tipo == SYNC:
+            with self.SessionLocal() as db:
+                return funcao(db)
+        if tipo == ASYNC:
+            return self.loop.run_until_complete(self._rodar_async(funcao))
+        return self._rodar_desfazendo(funcao)
+
+    async def _rodar_async(self, funcao):
+        async with self.AsyncSessionLocal() as db:
+            return await funcao(db)
+
+    def _rodar_desfazendo(self, funcao):
+        from sqlalchemy.orm import Session
+
+        with self.engine.connect() as conn:
+            transacao = conn.begin()
+            db = Session(bind=conn, autoflush=False, join_transaction_mode="create_savepoint")
+            try:
+                return funcao(db)
+            finally:
+                db.close()
+                transacao.rollback()
+
+    def fechar(self, async_engine):
+        self.loop.run_until_complete(async_engine.dispose())
+        self.loop.close()
+
+
+def _medir(executor, contador, tipo, funcao, repeticoes) -> dict:
+    executor.rodar(tipo, funcao)  # aquecimento (caches do SQLAlchemy, páginas do banco)
+    tempos = []
+    operacoes = 0
+    consultas_antes = contador.total
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        operacoes = executor.rodar(tipo, funcao)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    mediana = statistics.median(tempos)
+    return {
+        "repeticoes": repeticoes,
+        "operacoes": operacoes,
+        "mediana_ms": round(mediana, 3),
+        "p95_ms": round(tempos[min(len(tempos) - 1, int(round(0.95 * (len(tempos) - 1))))], 3),
+        "min_ms": round(tempos[0], 3),
+        "ms_por_operacao": round(mediana / max(operacoes, 1), 3),
+        "consultas": (contador.total - consultas_antes) // repeticoes,
+    }
+
+
+def _preparar_contexto(args, SessionLocal, models, paginacao, volumes):
+    from sqlalchemy import func, select
+
+    class Contexto:
+        pass
+
+    ctx = Contexto()
+    ctx.limit = args.limite
+    ctx.presos = volumes["presos"]
+    ctx.cadastros = args.cadastros
+    ctx.relatorio = min(args.relatorio, volumes["presos"])
+    rnd = random.Random(args.semente)
+    with SessionLocal() as db:
+        maior_id = db.execute(select(func.max(models.Preso.id))).scalar()
+        maior_processo = db.execute(select(func.max(models.Processo.id))).scalar()
+        ctx.preso_ids = [rnd.randint(1, maior_id) for _ in range(args.amostra)]
+        ctx.processo_ids = [rnd.randint(1, maior_processo) for _ in range(args.lote_eventos)]
+        # Sobrenome mais frequente (muitos resultados) e um nome completo (poucos)
+        ctx.nome_comum = "silva"
+        ctx.nome_raro = db.execute(select(models.Preso.nome_completo).where(models.Preso.id == ctx.preso_ids[0])).scalar()
+        colunas = paginacao.COLUNAS_POR_LISTAGEM["presos"]
+        meio = db.execute(
+            select(*colunas).order_by(*colunas).offset(volumes["presos"] // 2).limit(1)
+        ).first()
+        ctx.cursor_meio = tuple(meio)
+    return ctx
+
+
+def _comparar(resultado, anterior, tolerancia, folga_ms) -> list[str]:
+    falhas = []
+    print(f"\nComparação com {anterior.get('git', {}).get('commit') or 'execução anterior'}:")
+    for nome, atual in resultado.items():
+        base = anterior.get("cenarios", {}).get(nome)
+        if not base or "mediana_ms" not in base or "mediana_ms" not in atual:
+            continue
+        razao = atual["mediana_ms"] / base["mediana_ms"] if base["mediana_ms"] else float("inf")
+        print(
+            f"  {nome:<45} {base['mediana_ms']:>10} -> {atual['mediana_ms']:>10} ms ({razao:>5.2f}x) | "
+            f"consultas {base['consultas']} -> {atual['consultas']}"
+        )
+        if razao > tolerancia and atual["mediana_ms"] - base["mediana_ms"] > folga_ms:
+            falhas.append(f"{nome}: {razao:.2f}x mais lento ({base['mediana_ms']} -> {atual['mediana_ms']} ms)")
+        if atual["consultas"] > base["consultas"]:
+            falhas.append(f"{nome}: {base['consultas']} -> {atual['consultas']} consultas")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="DATABASE_URL do banco de teste (padrão: SQLite em arquivo temporário)")
+    parser.add_argument("--presos", type=int, default=100_000)
+    parser.add_argument("--processos", type=int, default=300_000)
+    parser.add_argument("--eventos", type=int, default=2_000_000)
+    parser.add_argument("--escala", type=float, default=1.0, help="multiplica os três volumes (ex.: 0.1)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--cenarios", help="só os cenários que contêm algum destes trechos (separados por vírgula)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--limite", type=int, default=100, help="tamanho das páginas")
+    parser.add_argument("--amostra", type=int, default=50, help="presos lidos nos cenários de detalhe")
+    parser.add_argument("--cadastros", type=int, default=20, help="cadastros completos por execução")
+    parser.add_argument("--lote-eventos", type=int, default=500, help="eventos criados por lote")
+    parser.add_argument("--relatorio", type=int, default=2000, help="presos lidos no relatório em streaming")
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=1.5, help="razão máxima da mediana no --comparar")
+    parser.add_argument("--folga-ms", type=float, default=2.0, help="diferença mínima (ms) para contar como regressão")
+    args = parser.parse_args()
+
+    volumes = {
+        nome: max(1, int(valor * args.escala))
+        for nome, valor in (("presos", args.presos), ("processos", args.processos), ("eventos", args.eventos))
+    }
+    url = args.url or "sqlite:///" + os.path.join(
+        tempfile.gettempdir(),
+        f"controle_presos_bench_{volumes['presos']}_{volumes['processos']}_{volumes['eventos']}_{args.semente}.db",
+    )
+    os.environ["DATABASE_URL"] = url
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import sqlalchemy
+
+    from dados_sinteticos import gerar, preparar_banco
+    from app import busca, models, paginacao
+    from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+
+    preparar_banco(engine, models, busca)
+    dados = gerar(engine, models, volumes["presos"], volumes["processos"], volumes["eventos"], args.semente)
+    print(
+        f"{'Gerados' if dados['gerado'] else 'Reaproveitados'}: {dados['presos']} presos, "
+        f"{dados['processos']} processos, {dados['eventos']} eventos ({engine.dialect.name})"
+    )
+
+    ctx = _preparar_contexto(args, SessionLocal, models, paginacao, dados)
+    cenarios = _cenarios(ctx)
+    if args.cenarios:
+        trechos = [trecho.strip() for trecho in args.cenarios.split(",") if trecho.strip()]
+        cenarios = {nome: c for nome, c in cenarios.items() if any(t in nome for t in trechos)}
+
+    contador = _ContadorConsultas([engine, async_engine.sync_engine])
+    executor = _Executor(engine, SessionLocal, AsyncSessionLocal)
+    resultado = {}
+    falhas = []
+    try:
+        for nome, (tipo, funcao) in cenarios.items():
+            try:
+                resultado[nome] = {"tipo": tipo, **_medir(executor, contador, tipo, funcao, args.repeticoes)}
+            except Exception as exc:
+                traceback.print_exc()
+                resultado[nome] = {"tipo": tipo, "erro": repr(exc)}
+                falhas.append(f"{nome}: {exc!r}")
+                continue
+            m = resultado[nome]
+            print(
+                f"{nome:<45} {m['mediana_ms']:>10} ms | p95 {m['p95_ms']:>10} ms | "
+                f"{m['ms_por_operacao']:>9} ms/op ({m['operacoes']} op) | {m['consultas']:>4} consultas"
+            )
+    finally:
+        executor.fechar(async_engine)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            falhas += _comparar(resultado, json.load(arquivo), args.tolerancia, args.folga_ms)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(
+                {
+                    "git": _commit_git(),
+                    "executado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "sqlalchemy": sqlalchemy.__version__,
+                    "dialeto": engine.dialect.name,
+                    "url": engine.url.render_as_string(),
+                    "volumes": {nome: dados[nome] for nome in ("presos", "processos", "eventos")},
+                    "semente": args.semente,
+                    "parametros": {
+                        "repeticoes": args.repeticoes,
+                        "limite": args.limite,
+                        "amostra": args.amostra,
+                        "cadastros": args.cadastros,
+                        "lote_eventos": args.lote_eventos,
+                        "relatorio": ctx.relatorio,
+                    },
+                    "cenarios": resultado,
+                    "falhas": falhas,
+                },
+                arquivo,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+    if falhas:
+        print("\nFALHAS:\n  " + "\n  ".join(falhas))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
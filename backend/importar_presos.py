@@ -0,0 +1,71 @@
+# backend/importar_presos.py
+"""
+Importação em massa de presos/processos pela linha de comando.
+
+Uso (da pasta 'backend/'):
+    python importar_presos.py dados.csv
+    python importar_presos.py dados.ndjson --lote 5000 --relatorio erros.json
+
+Usa a mesma DATABASE_URL da aplicação (.env). Veja app/importacao.py
+para o formato dos arquivos.
+"""
+import argparse
+import json
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import importacao
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa presos e processos de um arquivo CSV ou NDJSON.")
+    parser.add_argument("arquivo", help="Caminho do arquivo (.csv, .ndjson ou .jsonl)")
+    parser.add_argument("--formato", choices=["csv", "ndjson"], help="Força o formato (padrão: pela extensão)")
+    parser.add_argument("--lote", type=int, default=importacao.IMPORTACAO_LOTE, help="Registros por transação")
+    parser.add_argument("--relatorio", help="Grava o relatório completo (JSON) neste caminho")
+    args = parser.parse_args()
+
+    formato = args.formato or importacao.detectar_formato(args.arquivo, None)
+    if formato is None:
+        print("Erro: não foi possível deduzir o formato pela extensão. Use --formato.")
+        sys.exit(1)
+
+    print(f"--- Importando {args.arquivo} ({formato}, lotes de {args.lote}) ---")
+    inicio = time.monotonic()
+    db = SessionLocal()
+    try:
+        with open(args.arquivo, encoding="utf-8-sig", newline="") as arquivo:
+            relatorio = importacao.importar(db, arquivo, formato, tamanho_lote=args.lote)
+    except Exception as e:
+        print(f"\n[ERRO] Importação interrompida: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+    resumo = relatorio.como_dict()
+    print(f"Linhas lidas:          {resumo['linhas']}")
+    print(f"Presos criados:        {resumo['presos_criados']}")
+    print(f"Presos já existentes:  {resumo['presos_existentes']}")
+    print(f"Processos criados:     {resumo['processos_criados']}")
+    print(f"Processos duplicados:  {resumo['processos_duplicados']}")
+    print(f"Linhas com erro:       {resumo['linhas_com_erro']}")
+    print(f"Tempo:                 {time.monotonic() - inicio:.1f}s")
+    for erro in resumo["erros"][:20]:
+        print(f"  linha {erro['linha']}: {erro['erro']}")
+    if resumo["linhas_com_erro"] > 20 and not args.relatorio:
+        print("  ... (use --relatorio para gravar a lista completa)")
+
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as saida:
+            json.dump(resumo, saida, ensure_ascii=False, indent=2)
+        print(f"Relatório gravado em {args.relatorio}")
+
+
+if __name__ == "__main__":
+    main()
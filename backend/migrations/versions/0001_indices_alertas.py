@@ -0,0 +1,88 @@
+"""Índices compostos/parciais para as consultas de alerta e índices de FK
+
+Revision ID: 0001_indices_alertas
+Revises:
+Create Date: 2026-10-17
+
+O schema base continua sendo criado pelo `create_all` do startup; esta
+migração só acrescenta índices e é idempotente (IF NOT EXISTS), então roda
+tanto em bancos antigos quanto em bancos recém-criados.
+
+No PostgreSQL os índices são criados com CREATE INDEX CONCURRENTLY, fora de
+transação, para não bloquear escritas em `eventos`/`processos` durante a
+criação. Se um build concorrente falhar, o índice fica INVALID: remova-o
+(DROP INDEX CONCURRENTLY) e rode a migração de novo.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_indices_alertas"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# nome -> (tabela, colunas, condição do índice parcial)
+INDICES = {
+    "ix_eventos_alerta_status_data_evento": ("eventos", ["alerta_status", "data_evento"], None),
+    "ix_eventos_pendentes_data_evento": ("eventos", ["data_evento"], "alerta_status = 'pendente'"),
+    "ix_eventos_ativos_data_evento": (
+        "eventos",
+        ["data_evento"],
+        "alerta_status IN ('pendente', 'disparado')",
+    ),
+    "ix_eventos_processo_id": ("eventos", ["processo_id"], None),
+    "ix_processos_preso_id": ("processos", ["preso_id"], None),
+}
+
+
+def _postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    concorrente = _postgresql()
+
+    def _criar():
+        for nome, (tabela, colunas, condicao) in INDICES.items():
+            onde = sa.text(condicao) if condicao else None
+            op.create_index(
+                nome,
+                tabela,
+                colunas,
+                if_not_exists=True,
+                postgresql_concurrently=concorrente,
+                postgresql_where=onde,
+                sqlite_where=onde,
+            )
+
+    if concorrente:
+        # CONCURRENTLY não pode rodar dentro de transação
+        with op.get_context().autocommit_block():
+            _criar()
+    else:
+        _criar()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    concorrente = _postgresql()
+
+    def _remover():
+        for nome, (tabela, _colunas, _condicao) in INDICES.items():
+            op.drop_index(
+                nome,
+                table_name=tabela,
+                if_exists=True,
+                postgresql_concurrently=concorrente,
+            )
+
+    if concorrente:
+        with op.get_context().autocommit_block():
+            _remover()
+    else:
+        _remover()
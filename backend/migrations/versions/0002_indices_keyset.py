@@ -0,0 +1,70 @@
+"""Índices (coluna de ordenação, id) para a paginação por cursor
+
+Revision ID: 0002_indices_keyset
+Revises: 0001_indices_alertas
+Create Date: 2026-10-17
+
+A paginação por cursor (app/paginacao.py) ordena por (data_evento, id) nos
+alertas e por (nome_completo, id) nos presos. No PostgreSQL o índice
+precisa terminar no id para a página sair direto do índice, sem ordenar.
+
+No SQLite não há o que criar: todo índice já termina no rowid, que é o id.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_indices_keyset"
+down_revision: Union[str, Sequence[str], None] = "0001_indices_alertas"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# nome -> (tabela, colunas, condição do índice parcial)
+INDICES = {
+    "ix_eventos_ativos_data_evento_id": (
+        "eventos",
+        ["data_evento", "id"],
+        "alerta_status IN ('pendente', 'disparado')",
+    ),
+    "ix_presos_nome_completo_id": ("presos", ["nome_completo", "id"], None),
+}
+
+
+def _postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _postgresql():
+        return
+
+    # CONCURRENTLY não pode rodar dentro de transação
+    with op.get_context().autocommit_block():
+        for nome, (tabela, colunas, condicao) in INDICES.items():
+            op.create_index(
+                nome,
+                tabela,
+                colunas,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(condicao) if condicao else None,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not _postgresql():
+        return
+
+    with op.get_context().autocommit_block():
+        for nome, (tabela, _colunas, _condicao) in INDICES.items():
+            op.drop_index(
+                nome,
+                table_name=tabela,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,59 @@
+"""Colunas versao/atualizado_em (ETag e If-Match) em presos, processos e eventos
+
+Revision ID: 0003_versoes_linhas
+Revises: 0002_indices_keyset
+Create Date: 2026-10-17
+
+Bancos criados depois desta versão já recebem as colunas pelo `create_all`;
+esta migração acrescenta as que faltarem em bancos antigos e é idempotente
+(IF NOT EXISTS no PostgreSQL, inspeção no SQLite).
+
+`atualizado_em` ganha DEFAULT now() no banco: linhas gravadas fora do ORM
+(COPY da importação, SQL manual) também saem preenchidas. No PostgreSQL o
+ADD COLUMN com now() não reescreve a tabela (o valor é calculado uma vez);
+o SQLite não aceita default não constante em ADD COLUMN, então lá a coluna
+nova fica sem default no banco (só o do ORM).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_versoes_linhas"
+down_revision: Union[str, Sequence[str], None] = "0002_indices_keyset"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABELAS = ("presos", "processos", "eventos")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for tabela in TABELAS:
+            op.execute(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS versao INTEGER NOT NULL DEFAULT 1")
+            op.execute(
+                f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP WITH TIME ZONE DEFAULT now()"
+            )
+            # Colunas criadas pelo startup das versões anteriores não tinham o default
+            op.execute(f"ALTER TABLE {tabela} ALTER COLUMN atualizado_em SET DEFAULT now()")
+        return
+
+    inspetor = sa.inspect(bind)
+    for tabela in TABELAS:
+        colunas = {c["name"] for c in inspetor.get_columns(tabela)}
+        if "versao" not in colunas:
+            op.add_column(tabela, sa.Column("versao", sa.Integer(), nullable=False, server_default=sa.text("1")))
+        if "atualizado_em" not in colunas:
+            op.add_column(tabela, sa.Column("atualizado_em", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabela in TABELAS:
+        with op.batch_alter_table(tabela) as batch:
+            batch.drop_column("atualizado_em")
+            batch.drop_column("versao")
@@ -0,0 +1,45 @@
+"""Contador de falhas transitórias nas execuções da sincronização
+
+Revision ID: 0004_sincronizacao_falhas
+Revises: 0003_versoes_linhas
+Create Date: 2026-10-17
+
+`sincronizacao_execucoes.falhas` separa as consultas que falharam (timeout,
+limite da fonte, erro HTTP) das que não encontraram o processo
+(`sem_resultado`). Idempotente, como as anteriores: bancos novos já recebem
+a coluna pelo `create_all`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_sincronizacao_falhas"
+down_revision: Union[str, Sequence[str], None] = "0003_versoes_linhas"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            "ALTER TABLE sincronizacao_execucoes ADD COLUMN IF NOT EXISTS falhas INTEGER NOT NULL DEFAULT 0"
+        )
+        return
+
+    colunas = {c["name"] for c in sa.inspect(bind).get_columns("sincronizacao_execucoes")}
+    if "falhas" not in colunas:
+        op.add_column(
+            "sincronizacao_execucoes",
+            sa.Column("falhas", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("sincronizacao_execucoes") as batch:
+        batch.drop_column("falhas")
@@ -0,0 +1,52 @@
+"""Tentativas por processo na sincronização
+
+Revision ID: 0005_sincronizacao_tentativas
+Revises: 0004_sincronizacao_falhas
+Create Date: 2026-10-17
+
+`processos_sincronizacao` passa a registrar as falhas de cada processo
+(`tentativas`, `ultima_falha_em`). Um processo que nunca respondeu também
+ganha linha, então `hash_dados` deixa de ser obrigatório. Idempotente, como
+as anteriores: bancos novos já recebem as colunas pelo `create_all`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_sincronizacao_tentativas"
+down_revision: Union[str, Sequence[str], None] = "0004_sincronizacao_falhas"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABELA = "processos_sincronizacao"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(f"ALTER TABLE {TABELA} ADD COLUMN IF NOT EXISTS tentativas INTEGER NOT NULL DEFAULT 0")
+        op.execute(f"ALTER TABLE {TABELA} ADD COLUMN IF NOT EXISTS ultima_falha_em TIMESTAMP WITH TIME ZONE")
+        op.execute(f"ALTER TABLE {TABELA} ALTER COLUMN hash_dados DROP NOT NULL")
+        return
+
+    colunas = {c["name"]: c for c in sa.inspect(bind).get_columns(TABELA)}
+    with op.batch_alter_table(TABELA) as batch:
+        if "tentativas" not in colunas:
+            batch.add_column(sa.Column("tentativas", sa.Integer(), nullable=False, server_default=sa.text("0")))
+        if "ultima_falha_em" not in colunas:
+            batch.add_column(sa.Column("ultima_falha_em", sa.DateTime(), nullable=True))
+        if not colunas["hash_dados"]["nullable"]:
+            batch.alter_column("hash_dados", existing_type=sa.String(64), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f"DELETE FROM {TABELA} WHERE hash_dados IS NULL")
+    with op.batch_alter_table(TABELA) as batch:
+        batch.alter_column("hash_dados", existing_type=sa.String(64), nullable=False)
+        batch.drop_column("ultima_falha_em")
+        batch.drop_column("tentativas")
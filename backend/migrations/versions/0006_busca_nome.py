@@ -0,0 +1,111 @@
+"""Coluna presos.nome_busca e índice da busca por nome
+
+Revision ID: 0006_busca_nome
+Revises: 0005_sincronizacao_tentativas
+Create Date: 2026-10-17
+
+Antes o startup da API criava a coluna, varria `presos` atrás de nomes sem
+`nome_busca` e montava o índice trigram numa transação comum, em todo
+worker. Agora isso acontece uma vez, aqui:
+
+- `nome_busca` é acrescentada (nula, sem reescrever a tabela) e preenchida
+  em lotes por id, cada lote confirmado separadamente. A normalização é a
+  de app/models.py, então o preenchimento não roda em `alembic upgrade
+  --sql` (offline): rode online.
+- PostgreSQL: `pg_trgm` e o índice GIN com CREATE INDEX CONCURRENTLY, sem
+  bloquear escritas em `presos`.
+- SQLite: tabela FTS5 `presos_fts` e triggers (ver app/busca.py).
+
+Idempotente, como as anteriores: bancos novos já recebem tudo pelo
+`create_all`.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.busca import INDICE_TRIGRAM, criar_presos_fts
+from app.models import normalizar_nome_busca
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_busca_nome"
+down_revision: Union[str, Sequence[str], None] = "0005_sincronizacao_tentativas"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TAMANHO_LOTE = 1000
+
+
+def _preencher_nome_busca(bind) -> None:
+    # Avança pelo id: cada lote lê só a faixa seguinte, sem varrer de novo
+    # as linhas já preenchidas
+    ultimo_id = 0
+    while True:
+        pendentes = bind.execute(
+            sa.text(
+                "SELECT id, nome_completo FROM presos "
+                "WHERE id > :ultimo_id AND nome_busca IS NULL ORDER BY id LIMIT :limite"
+            ),
+            {"ultimo_id": ultimo_id, "limite": TAMANHO_LOTE},
+        ).all()
+        if not pendentes:
+            return
+        bind.execute(
+            sa.text("UPDATE presos SET nome_busca = :nome_busca WHERE id = :id"),
+            [
+                {"id": preso_id, "nome_busca": normalizar_nome_busca(nome) or ""}
+                for preso_id, nome in pendentes
+            ],
+        )
+        ultimo_id = pendentes[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    postgresql = bind.dialect.name == "postgresql"
+    if postgresql:
+        op.execute("ALTER TABLE presos ADD COLUMN IF NOT EXISTS nome_busca VARCHAR(255)")
+    elif "nome_busca" not in {c["name"] for c in sa.inspect(bind).get_columns("presos")}:
+        op.add_column("presos", sa.Column("nome_busca", sa.String(255), nullable=True))
+
+    # Fora da transação da migração: cada lote (e o CONCURRENTLY) confirma sozinho
+    with op.get_context().autocommit_block():
+        if not context.is_offline_mode():
+            _preencher_nome_busca(bind)
+
+        if postgresql:
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            op.create_index(
+                INDICE_TRIGRAM,
+                "presos",
+                ["nome_busca"],
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_using="gin",
+                postgresql_ops={"nome_busca": "gin_trgm_ops"},
+            )
+
+    if bind.dialect.name == "sqlite" and not context.is_offline_mode():
+        criar_presos_fts(bind)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(
+                INDICE_TRIGRAM,
+                table_name="presos",
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
+    elif bind.dialect.name == "sqlite":
+        for trigger in ("presos_fts_ai", "presos_fts_ad", "presos_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS presos_fts")
+
+    with op.batch_alter_table("presos") as batch:
+        batch.drop_column("nome_busca")
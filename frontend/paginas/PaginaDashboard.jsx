@@ -31,6 +31,7 @@ const getStatusColor = (status) => {
 
 export function PaginaDashboard() {
   const [presos, setPresos] = useState([]); // Onde os dados da API ficarão
+  const [total, setTotal] = useState(0); // Total de presos (para a paginação no servidor)
   const [isLoading, setIsLoading] = useState(true); // Estado de carregamento
   
   const [page, setPage] = useState(0);
@@ -42,11 +43,17 @@ export function PaginaDashboard() {
     data_prisao: '',
   });
   // --- FUNÇÃO PARA BUSCAR DADOS ---
-  const fetchPresos = useCallback(async () => {
+  // A paginação é feita no servidor: a API devolve só a página pedida
+  // (modo=resumo traz apenas as colunas da tabela) e o total de presos.
+  const fetchPresos = useCallback(async (pagina = 0, porPagina = rowsPerPage) => {
     setIsLoading(true);
     try {
       // Constrói os parâmetros de consulta dinamicamente
-      const params = new URLSearchParams();
+      const params = new URLSearchParams({
+        modo: 'resumo',
+        skip: String(pagina * porPagina),
+        limit: String(porPagina),
+      });
       if (filtros.nome) {
         params.append('nome', filtros.nome);
       }
@@ -61,14 +68,15 @@ export function PaginaDashboard() {
       const queryString = params.toString();
       
       const response = await api.get(`/api/presos/search/?${queryString}`);
-      setPresos(response.data);
-      setPage(0); // Reseta a paginação
+      setPresos(response.data.itens);
+      setTotal(response.data.total);
+      setPage(pagina);
     } catch (error) {
       console.error("Erro ao buscar presos:", error);
     } finally {
       setIsLoading(false);
     }
-  }, [filtros]); // Re-cria a função se os 'filtros' mudarem
+  }, [filtros, rowsPerPage]); // Re-cria a função se os 'filtros' mudarem
 
   // --- useEffect ---
   // Roda a função fetchPresos() assim que o componente é montado
@@ -79,7 +87,7 @@ export function PaginaDashboard() {
   // Handler para o botão "Buscar"
   const handleSearchSubmit = (e) => {
     e.preventDefault();
-    fetchPresos();
+    fetchPresos(0); // Nova busca volta para a primeira página
   };
   
   // Handler para atualizar os filtros
@@ -92,10 +100,11 @@ export function PaginaDashboard() {
   };
 
   // Funções de paginação (iguais)
-  const handleChangePage = (event, newPage) => setPage(newPage);
+  const handleChangePage = (event, newPage) => fetchPresos(newPage);
   const handleChangeRowsPerPage = (event) => {
-    setRowsPerPage(parseInt(event.target.value, 10));
-    setPage(0);
+    const porPagina = parseInt(event.target.value, 10);
+    setRowsPerPage(porPagina);
+    fetchPresos(0, porPagina);
   };
 
   return (
@@ -207,10 +216,9 @@ export function PaginaDashboard() {
               ) : (
                 // --- Dados Reais ---
                 presos
-                  .slice(page * rowsPerPage, page * rowsPerPage + rowsPerPage)
                   .map((preso) => {
-                    // Pega o *primeiro* processo da lista (ou um objeto vazio)
-                    const processo = preso.processos?.[0] || {};
+                    // Primeiro processo do preso (ou um objeto vazio)
+                    const processo = preso.processo_principal || {};
                     
                     return (
                       <TableRow hover key={preso.id}>
@@ -263,7 +271,7 @@ export function PaginaDashboard() {
         <TablePagination
           rowsPerPageOptions={[5, 10, 25]}
           component="div"
-          count={presos.length} // Total de itens
+          count={total} // Total de itens (vem do servidor)
           rowsPerPage={rowsPerPage}
           page={page}
           onPageChange={handleChangePage}